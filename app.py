@@ -8,12 +8,16 @@ import base64
 # Assurez-vous que config.py, firestore_connector.py, gemini_oracle.py, utils.py sont dans le même dossier
 from config import (
     # SHEET_NAME, # Non utilisé avec Firestore
-    WORKSHEET_NAMES, ASSETS_DIR, AUDIO_CLIPS_DIR, SONG_COVERS_DIR, ALBUM_COVERS_DIR, GENERATED_TEXTS_DIR, GEMINI_API_KEY_NAME
+    WORKSHEET_NAMES, ASSETS_DIR, AUDIO_CLIPS_DIR, SONG_COVERS_DIR, ALBUM_COVERS_DIR, GENERATED_TEXTS_DIR, GEMINI_API_KEY_NAME,
+    DEFAULT_PAGE_SIZE, STATUTS_PRODUCTION, HISTORIQUE_RETENTION_DAYS, HISTORIQUE_ARCHIVE_RATED,
+    FIRESTORE_METRICS_ENABLED, FIRESTORE_METRICS_BYTES, FIRESTORE_DEBUG_PANEL, FIRESTORE_METRICS_ADMIN
 )
 # CHANGEMENT MAJEUR ICI : Remplacer sheets_connector par firestore_connector
 import firestore_connector as fsc # Renommage en 'fsc' pour la concision
 import gemini_oracle as go
 import utils as ut
+import historique_archive as ha
+import firestore_metrics as fsm
 
 # --- Configuration Générale de l'Application Streamlit ---
 st.set_page_config(
@@ -23,6 +27,11 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Création du client Firestore et ouverture du canal gRPC en arrière-plan pendant le premier rendu
+fsc.start_client_warmup()
+# Compteurs Firestore de cette exécution du script (panneau de débogage en fin de page)
+fsm.begin_rerun()
+
 # --- Initialisation de st.session_state ---
 if 'app_initialized' not in st.session_state:
     st.session_state['app_initialized'] = True
@@ -88,6 +97,36 @@ def display_dataframe(df: pd.DataFrame, title: str = "", key: str = ""):
     else:
         st.info("Aucune donnée à afficher pour le moment.")
 
+def display_paginated_collection(collection_name: str, key: str, order_by: str = None, descending: bool = False, fields: list = None, page_size: int = DEFAULT_PAGE_SIZE):
+    """
+    Affiche une collection page par page (curseurs Firestore start_after) au lieu de la charger en entier.
+    La page suivante est préchargée en arrière-plan et le nombre total de lignes vient d'une requête d'agrégation.
+    """
+    cursors_key = f"{key}_page_cursors"
+    if cursors_key not in st.session_state:
+        st.session_state[cursors_key] = [None] # Curseur de début de chaque page visitée
+    page_cursors = st.session_state[cursors_key]
+
+    page_df, next_cursor = fsc.get_collection_page(collection_name, page_size, order_by, descending, page_cursors[-1], fields)
+    if next_cursor is not None:
+        fsc.prefetch_collection_page(collection_name, page_size, order_by, descending, next_cursor, fields)
+    total_rows = fsc.count_collection(collection_name)
+
+    display_dataframe(ut.format_dataframe_for_display(page_df), key=f"{key}_table")
+
+    total_pages = max(1, -(-total_rows // page_size))
+    col_prev, col_info, col_next = st.columns([0.2, 0.6, 0.2])
+    with col_prev:
+        if st.button("◀ Précédent", key=f"{key}_prev_page", disabled=len(page_cursors) <= 1):
+            page_cursors.pop()
+            st.rerun()
+    with col_info:
+        st.caption(f"Page {len(page_cursors)} / {total_pages} — {total_rows} lignes au total")
+    with col_next:
+        if st.button("Suivant ▶", key=f"{key}_next_page", disabled=next_cursor is None):
+            page_cursors.append(next_cursor)
+            st.rerun()
+
 def get_base64_image(image_path: str):
     """Encode une image en base64 pour l'intégration directe dans Streamlit (si besoin) ou CSS."""
     if os.path.exists(image_path):
@@ -191,6 +230,32 @@ def render_sidebar_menu(options_dict):
 # Appel de la nouvelle fonction d'affichage du menu
 render_sidebar_menu(menu_options)
 
+# --- Collections de référence nécessaires à chaque page ---
+# Elles sont chargées en parallèle au début de l'exécution ; les appels fsc.get_all_* de la page
+# trouvent ensuite leurs données en cache au lieu d'enchaîner les lectures Firestore.
+PAGE_COLLECTIONS = {
+    'Accueil': ["STYLES_MUSICAUX_GALACTIQUES"],
+    'Générateur de Contenu': [
+        "STYLES_MUSICAUX_GALACTIQUES", "MOODS_ET_EMOTIONS", "THEMES_CONSTELLES", "STYLES_LYRIQUES_UNIVERS",
+        "STRUCTURES_SONG_UNIVERSELLES", "ARTISTES_IA_COSMIQUES", "VOIX_ET_STYLES_VOCAUX", "PUBLIC_CIBLE_DEMOGRAPHIQUE"
+    ],
+    'Co-pilote Créatif': ["STYLES_MUSICAUX_GALACTIQUES", "MOODS_ET_EMOTIONS", "THEMES_CONSTELLES"],
+    'Création Multimodale': ["THEMES_CONSTELLES", "STYLES_MUSICAUX_GALACTIQUES", "MOODS_ET_EMOTIONS", "ARTISTES_IA_COSMIQUES"],
+    "Générateur d'Harmonies": ["STYLES_MUSICAUX_GALACTIQUES", "MOODS_ET_EMOTIONS", "INSTRUMENTS_ORCHESTRAUX"],
+    'Mes Morceaux': [
+        "ARTISTES_IA_COSMIQUES", "ALBUMS_PLANETAIRES", "STYLES_MUSICAUX_GALACTIQUES", "MOODS_ET_EMOTIONS",
+        "THEMES_CONSTELLES", "STYLES_LYRIQUES_UNIVERS", "STRUCTURES_SONG_UNIVERSELLES", "VOIX_ET_STYLES_VOCAUX"
+    ],
+    'Mes Albums': ["ALBUMS_PLANETAIRES", "ARTISTES_IA_COSMIQUES", "STYLES_MUSICAUX_GALACTIQUES"],
+    'Mes Artistes IA': ["ARTISTES_IA_COSMIQUES", "STYLES_MUSICAUX_GALACTIQUES"],
+    'Directives Stratégiques': ["ARTISTES_IA_COSMIQUES", "STYLES_MUSICAUX_GALACTIQUES", "CONSEILS_STRATEGIQUES_ORACLE"],
+    'Potentiel Viral & Niches': ["PUBLIC_CIBLE_DEMOGRAPHIQUE", "MOODS_ET_EMOTIONS", "THEMES_CONSTELLES", "STYLES_MUSICAUX_GALACTIQUES"],
+    'Instruments & Voix': ["INSTRUMENTS_ORCHESTRAUX", "VOIX_ET_STYLES_VOCAUX"]
+}
+page_collections = fsc.prefetch_collections(
+    [WORKSHEET_NAMES[key] for key in PAGE_COLLECTIONS.get(st.session_state['current_page'], [])]
+)
+
 # --- Contenu principal de la page (le reste de ton app.py commence ici) ---
 st.title(f"Page : {st.session_state['current_page']}")
 
@@ -207,11 +272,35 @@ if st.session_state['current_page'] == 'Accueil':
     st.subheader("État des Connexions Base de Données")
     try:
         # Tente de récupérer une petite collection pour tester la connexion Firestore
+        firestore_client = fsc.get_db()
         fsc.get_all_styles_musicaux()
-        st.success(f"Connexion à Firestore réussie pour le projet '{st.secrets['GCP_PROJECT_ID']}'.")
+        st.success(f"Connexion à Firestore réussie pour le projet '{firestore_client.project}'.")
     except Exception as e:
         st.error(f"Échec de la connexion à Firestore : {e}. Vérifiez vos secrets GCP et les permissions de votre compte de service.")
 
+    # --- Tableau de bord : métriques calculées par requêtes d'agrégation (aucun document n'est lu) ---
+    st.markdown("---")
+    st.subheader("Tableau de Bord de l'Empire")
+    morceaux_collection = WORKSHEET_NAMES["MORCEAUX_GENERES"]
+    stats_collection = WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"]
+    historique_collection = WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"]
+    stats_totaux = fsc.aggregate_collection(stats_collection, [
+        ('sum', 'Ecoutes_Totales', 'ecoutes'),
+        ('sum', 'Revenus_Simules_Streaming', 'revenus'),
+        ('avg', 'Revenus_Simules_Streaming', 'revenus_moyens')
+    ])
+    col_dash1, col_dash2, col_dash3, col_dash4 = st.columns(4)
+    col_dash1.metric("Morceaux", fsc.count_collection(morceaux_collection))
+    col_dash2.metric("Écoutes Simulées", f"{int(stats_totaux['ecoutes'] or 0):,}".replace(",", " "))
+    col_dash3.metric("Revenus Simulés", f"{float(stats_totaux['revenus'] or 0):.2f} €")
+    col_dash4.metric("Générations à Évaluer", fsc.count_collection(historique_collection, [('Evaluation_Manuelle', '==', '')]))
+    if stats_totaux['revenus_moyens'] is not None:
+        st.caption(f"Revenu moyen par relevé de statistiques : {float(stats_totaux['revenus_moyens']):.2f} €")
+
+    st.markdown("**Morceaux par Statut de Production**")
+    morceaux_par_statut = fsc.count_collection_by_values(morceaux_collection, 'Statut_Production', STATUTS_PRODUCTION)
+    st.bar_chart(pd.Series(morceaux_par_statut, name="Morceaux"))
+
 # --- Page : Générateur de Contenu (Création Musicale IA) ---
 if st.session_state['current_page'] == 'Générateur de Contenu':
     st.header("✍️ Générateur de Contenu Musical par l'Oracle")
@@ -335,13 +424,14 @@ if st.session_state['current_page'] == 'Générateur de Contenu':
                             st.error("Échec de la sauvegarde des paroles.")
             
             elif save_lyrics_option == "Dans un Morceau Existant (Base de Données)":
-                # MAJ : Utilise fsc.
-                morceaux_df_all = fsc.get_all_morceaux()
+                # MAJ : Utilise fsc. (projection : seuls l'ID et le titre sont lus)
+                morceaux_df_all = fsc.get_all_morceaux(fields=['ID_Morceau', 'Titre_Morceau'])
                 if not morceaux_df_all.empty:
+                    titres_morceaux = dict(zip(morceaux_df_all['ID_Morceau'], morceaux_df_all['Titre_Morceau'])) # Index ID -> titre
                     morceau_to_update_id = st.selectbox(
                         "Sélectionnez le morceau à mettre à jour",
                         morceaux_df_all['ID_Morceau'].tolist(),
-                        format_func=lambda x: f"{x} - {morceaux_df_all[morceaux_df_all['ID_Morceau'] == x]['Titre_Morceau'].iloc[0]}",
+                        format_func=lambda x: f"{x} - {titres_morceaux.get(x, '')}",
                         key="update_existing_morceau_lyrics_id"
                     )
                     if st.button("Mettre à jour les Paroles du Morceau Existant", key="update_lyrics_existing_btn"):
@@ -424,13 +514,14 @@ if st.session_state['current_page'] == 'Générateur de Contenu':
             st.subheader("Prompt Audio Généré (pour SUNO ou autre)")
             st.text_area("Copiez ce prompt pour votre générateur audio :", st.session_state.generated_audio_prompt, height=200, key="displayed_generated_audio_prompt")
 
-            # MAJ : Utilise fsc.
-            morceaux_df_all = fsc.get_all_morceaux()
+            # MAJ : Utilise fsc. (projection : seuls l'ID et le titre sont lus)
+            morceaux_df_all = fsc.get_all_morceaux(fields=['ID_Morceau', 'Titre_Morceau'])
             if not morceaux_df_all.empty:
+                titres_morceaux = dict(zip(morceaux_df_all['ID_Morceau'], morceaux_df_all['Titre_Morceau'])) # Index ID -> titre
                 morceau_to_update_audio_id = st.selectbox(
                     "Liez ce prompt à un morceau existant (Base de Données) :",
                     morceaux_df_all['ID_Morceau'].tolist(),
-                    format_func=lambda x: f"{x} - {morceaux_df_all[morceaux_df_all['ID_Morceau'] == x]['Titre_Morceau'].iloc[0]}",
+                    format_func=lambda x: f"{x} - {titres_morceaux.get(x, '')}",
                     key="update_existing_morceau_audio_prompt_id"
                 )
                 if st.button("Mettre à jour le Prompt Audio du Morceau Existant", key="update_audio_prompt_existing_btn"):
@@ -800,7 +891,8 @@ if st.session_state['current_page'] == 'Mes Morceaux':
     st.header("🎶 Mes Morceaux Générés")
     st.write("Gérez et consultez toutes vos créations musicales, qu'elles soient entièrement générées par l'IA ou co-créées.")
 
-    morceaux_df = fsc.get_all_morceaux() # MAJ : Utilise fsc.
+    # Vue liste sans les prompts volumineux ; le morceau complet est relu par ID pour la modification
+    morceaux_df = fsc.get_all_morceaux(fields=fsc.list_view_fields(WORKSHEET_NAMES["MORCEAUX_GENERES"])) # MAJ : Utilise fsc.
     
     tab1, tab2, tab3 = st.tabs(["Voir/Rechercher Morceaux", "Ajouter un Nouveau Morceau", "Mettre à Jour/Supprimer Morceau"])
 
@@ -822,15 +914,15 @@ if st.session_state['current_page'] == 'Mes Morceaux':
     with tab2:
         st.subheader("Ajouter un Nouveau Morceau")
         
-        # Récupération des données pour les selectbox (MAJ : Utilise fsc.)
-        artistes_ia_list = [''] + fsc.get_all_artistes_ia()['ID_Artiste_IA'].tolist()
-        albums_list = [''] + fsc.get_all_albums()['ID_Album'].tolist()
-        genres_musicaux = [''] + fsc.get_all_styles_musicaux()['ID_Style_Musical'].tolist()
-        moods = [''] + fsc.get_all_moods()['ID_Mood'].tolist()
-        themes = [''] + fsc.get_all_themes()['ID_Theme'].tolist()
-        styles_lyriques = [''] + fsc.get_all_styles_lyriques()['ID_Style_Lyrique'].tolist()
-        structures_song = [''] + fsc.get_all_structures_song()['ID_Structure'].tolist()
-        types_voix = [''] + fsc.get_all_voix_styles()['Type_Vocal_General'].unique().tolist()
+        # Récupération des données pour les selectbox (préchargées en parallèle via PAGE_COLLECTIONS)
+        artistes_ia_list = [''] + page_collections[WORKSHEET_NAMES["ARTISTES_IA_COSMIQUES"]]['ID_Artiste_IA'].tolist()
+        albums_list = [''] + page_collections[WORKSHEET_NAMES["ALBUMS_PLANETAIRES"]]['ID_Album'].tolist()
+        genres_musicaux = [''] + page_collections[WORKSHEET_NAMES["STYLES_MUSICAUX_GALACTIQUES"]]['ID_Style_Musical'].tolist()
+        moods = [''] + page_collections[WORKSHEET_NAMES["MOODS_ET_EMOTIONS"]]['ID_Mood'].tolist()
+        themes = [''] + page_collections[WORKSHEET_NAMES["THEMES_CONSTELLES"]]['ID_Theme'].tolist()
+        styles_lyriques = [''] + page_collections[WORKSHEET_NAMES["STYLES_LYRIQUES_UNIVERS"]]['ID_Style_Lyrique'].tolist()
+        structures_song = [''] + page_collections[WORKSHEET_NAMES["STRUCTURES_SONG_UNIVERSELLES"]]['ID_Structure'].tolist()
+        types_voix = [''] + page_collections[WORKSHEET_NAMES["VOIX_ET_STYLES_VOCAUX"]]['Type_Vocal_General'].unique().tolist()
 
         with st.form("add_morceau_form"):
             col_add1, col_add2 = st.columns(2)
@@ -927,8 +1019,8 @@ if st.session_state['current_page'] == 'Mes Morceaux':
             )
             morceau_to_select = morceaux_df[morceaux_df.apply(lambda row: f"{row['ID_Morceau']} - {row['Titre_Morceau']}" == morceau_to_select_display, axis=1)]['ID_Morceau'].iloc[0]
             
-            if morceau_to_select:
-                selected_morceau = morceaux_df[morceaux_df['ID_Morceau'] == morceau_to_select].iloc[0]
+            selected_morceau = fsc.get_document_by_id(WORKSHEET_NAMES["MORCEAUX_GENERES"], morceau_to_select) if morceau_to_select else None
+            if selected_morceau is not None:
 
                 st.markdown("---")
                 st.write(f"**Modification de :** {selected_morceau['Titre_Morceau']}")
@@ -1050,9 +1142,15 @@ if st.session_state['current_page'] == 'Mes Morceaux':
         st.error(f"Confirmez-vous la suppression définitive du morceau '{st.session_state.confirm_delete_morceau_name}' ?")
         col_confirm_buttons = st.columns(2)
         with col_confirm_buttons[0]:
+            delete_morceau_history = st.checkbox("Supprimer aussi l'historique de l'Oracle lié (sinon il est seulement délié)", key="cascade_delete_morceau_history")
             if st.button("Oui, Supprimer Définitivement", key="final_confirm_delete_morceau"):
-                if fsc.delete_morceau_generes(st.session_state.confirm_delete_morceau_id): # MAJ : Utilise fsc.
-                    st.success(f"Morceau '{st.session_state.confirm_delete_morceau_name}' supprimé avec succès !")
+                # Suppression en cascade : statistiques, paroles, liens d'historique et fichiers locaux
+                cascade_report = fsc.delete_morceau_cascade(st.session_state.confirm_delete_morceau_id, delete_history=delete_morceau_history)
+                if cascade_report is not None:
+                    st.success(f"Morceau '{st.session_state.confirm_delete_morceau_name}' supprimé avec succès ! "
+                               f"Statistiques : {cascade_report['statistiques']}, paroles : {cascade_report['paroles']}, "
+                               f"historique : {cascade_report.get('historique_supprime', cascade_report.get('historique_delie', 0))}, "
+                               f"fichiers : {len(cascade_report['fichiers'])}.")
                     st.session_state['confirm_delete_morceau_id'] = None # Nettoyer l'état
                     st.rerun()
                 else:
@@ -1069,26 +1167,30 @@ if st.session_state['current_page'] == 'Lecteur Audios':
     st.header("🎵 Lecteur Audios de l'Architecte Ω")
     st.write("Écoutez vos morceaux générés par l'IA, visualisez leurs paroles et marquez vos favoris. Une expérience immersive pour vos créations.")
 
-    morceaux_df_player = fsc.get_all_morceaux() # MAJ : Utilise fsc.
-    paroles_existantes_df_player = fsc.get_all_paroles_existantes() # MAJ : Utilise fsc.
+    # Options de filtre précalculées (valeurs distinctes partagées, recalculées après une écriture) ; la liste des morceaux est filtrée par Firestore
+    player_filter_options = fsc.get_distinct_values(
+        WORKSHEET_NAMES["MORCEAUX_GENERES"],
+        ['ID_Style_Musical_Principal', 'ID_Artiste_IA', 'Statut_Production']
+    )
 
-    if not morceaux_df_player.empty:
+    if any(player_filter_options.values()):
         # Filtrage et sélection du morceau
         col_select_track, col_filter_track = st.columns([0.7, 0.3])
         
         with col_filter_track:
             st.subheader("Filtres")
-            filter_genre = st.selectbox("Filtrer par Genre", ['Tous'] + morceaux_df_player['ID_Style_Musical_Principal'].unique().tolist(), key="player_filter_genre")
-            filter_artist = st.selectbox("Filtrer par Artiste IA", ['Tous'] + morceaux_df_player['ID_Artiste_IA'].unique().tolist(), key="player_filter_artist")
-            filter_status = st.selectbox("Filtrer par Statut", ['Tous'] + morceaux_df_player['Statut_Production'].unique().tolist(), key="player_filter_status")
+            filter_genre = st.selectbox("Filtrer par Genre", ['Tous'] + player_filter_options['ID_Style_Musical_Principal'], key="player_filter_genre")
+            filter_artist = st.selectbox("Filtrer par Artiste IA", ['Tous'] + player_filter_options['ID_Artiste_IA'], key="player_filter_artist")
+            filter_status = st.selectbox("Filtrer par Statut", ['Tous'] + player_filter_options['Statut_Production'], key="player_filter_status")
 
-        filtered_morceaux_player = morceaux_df_player.copy()
+        player_filters = []
         if filter_genre != 'Tous':
-            filtered_morceaux_player = filtered_morceaux_player[filtered_morceaux_player['ID_Style_Musical_Principal'] == filter_genre]
+            player_filters.append(('ID_Style_Musical_Principal', '==', filter_genre))
         if filter_artist != 'Tous':
-            filtered_morceaux_player = filtered_morceaux_player[filtered_morceaux_player['ID_Artiste_IA'] == filter_artist]
+            player_filters.append(('ID_Artiste_IA', '==', filter_artist))
         if filter_status != 'Tous':
-            filtered_morceaux_player = filtered_morceaux_player[filtered_morceaux_player['Statut_Production'] == filter_status]
+            player_filters.append(('Statut_Production', '==', filter_status))
+        filtered_morceaux_player = fsc.query_collection(WORKSHEET_NAMES["MORCEAUX_GENERES"], where=player_filters)
 
         with col_select_track:
             st.subheader("Sélection du Morceau")
@@ -1128,7 +1230,7 @@ if st.session_state['current_page'] == 'Lecteur Audios':
                 # --- Fonctionnalité "Favori" ---
                 # Vérifier si la colonne 'Favori' existe dans le DataFrame chargé
                 # Note: Firestore ne force pas les schémas, donc 'Favori' peut manquer si aucun document ne l'a.
-                if 'Favori' in morceaux_df_player.columns:
+                if 'Favori' in filtered_morceaux_player.columns:
                     current_favorite_status = current_morceau.get('Favori', 'FAUX')
                     is_favorite_bool = ut.parse_boolean_string(str(current_favorite_status))
 
@@ -1163,8 +1265,12 @@ if st.session_state['current_page'] == 'Lecteur Audios':
                 lyrics_from_morceau = current_morceau.get('Prompt_Generation_Paroles', '')
                 
                 lyrics_from_existing = ''
-                if not paroles_existantes_df_player.empty:
-                    matching_paroles = paroles_existantes_df_player[paroles_existantes_df_player['ID_Morceau'] == current_morceau['ID_Morceau']]
+                if not lyrics_from_morceau:
+                    matching_paroles = fsc.query_collection(
+                        WORKSHEET_NAMES["PAROLES_EXISTANTES"],
+                        where=[('ID_Morceau', '==', current_morceau['ID_Morceau'])],
+                        limit=1
+                    )
                     if not matching_paroles.empty:
                         lyrics_from_existing = matching_paroles['Paroles_Existantes'].iloc[0]
 
@@ -1486,7 +1592,8 @@ if st.session_state['current_page'] == 'Paroles Existantes':
     st.header("📜 Paroles Existantes (Manuelles)")
     st.write("Consultez et gérez vos propres paroles de chansons que l'Oracle peut utiliser comme référence.")
 
-    paroles_existantes_df = fsc.get_all_paroles_existantes() # MAJ : Utilise fsc.
+    # Vue liste sans le texte des paroles ; les paroles complètes sont relues par ID (ou pour une recherche dans le contenu)
+    paroles_existantes_df = fsc.get_all_paroles_existantes(fields=fsc.list_view_fields(WORKSHEET_NAMES["PAROLES_EXISTANTES"])) # MAJ : Utilise fsc.
 
     tab_paroles_view, tab_paroles_add, tab_paroles_edit = st.tabs(["Voir/Rechercher Paroles", "Ajouter de Nouvelles Paroles", "Mettre à Jour/Supprimer Paroles"])
 
@@ -1495,7 +1602,8 @@ if st.session_state['current_page'] == 'Paroles Existantes':
         if not paroles_existantes_df.empty:
             search_paroles_query = st.text_input("Rechercher par titre ou contenu", key="search_paroles_existantes")
             if search_paroles_query:
-                filtered_paroles_df = paroles_existantes_df[paroles_existantes_df.apply(lambda row: search_paroles_query.lower() in row.astype(str).str.lower().to_string(), axis=1)]
+                paroles_existantes_full_df = fsc.get_all_paroles_existantes()
+                filtered_paroles_df = paroles_existantes_full_df[paroles_existantes_full_df.apply(lambda row: search_paroles_query.lower() in row.astype(str).str.lower().to_string(), axis=1)]
             else:
                 filtered_paroles_df = paroles_existantes_df
             display_dataframe(ut.format_dataframe_for_display(filtered_paroles_df), key="paroles_existantes_display")
@@ -1540,8 +1648,8 @@ if st.session_state['current_page'] == 'Paroles Existantes':
             )
             paroles_to_select = paroles_existantes_df[paroles_existantes_df.apply(lambda row: f"{row['ID_Morceau']} - {row['Titre_Morceau']}" == paroles_to_select_display, axis=1)]['ID_Morceau'].iloc[0]
 
-            if paroles_to_select:
-                selected_paroles = paroles_existantes_df[paroles_existantes_df['ID_Morceau'] == paroles_to_select].iloc[0]
+            selected_paroles = fsc.get_document_by_id(WORKSHEET_NAMES["PAROLES_EXISTANTES"], paroles_to_select) if paroles_to_select else None
+            if selected_paroles is not None:
 
                 st.markdown("---")
                 st.write(f"**Modification de :** {selected_paroles['Titre_Morceau']}")
@@ -1606,7 +1714,7 @@ if st.session_state['current_page'] == 'Stats & Tendances Sim.':
     st.header("📊 Stats & Tendances d'Écoute Simulées")
     st.write("Visualisez des statistiques d'écoute simulées pour vos morceaux, identifiez les tendances et suivez les performances virtuelles.")
 
-    morceaux_pour_stats_df = fsc.get_all_morceaux() # MAJ : Utilise fsc.
+    morceaux_pour_stats_df = fsc.get_all_morceaux(fields=['ID_Morceau', 'Titre_Morceau']) # MAJ : Utilise fsc.
     
     with st.form("stats_simulation_form"):
         st.subheader("Paramètres de Simulation")
@@ -1659,6 +1767,25 @@ if st.session_state['current_page'] == 'Stats & Tendances Sim.':
         else:
             st.info("Données insuffisantes ou format incorrect pour la visualisation.")
 
+    # --- Cumuls matérialisés (STATS_ROLLUPS) : un document par morceau, album et artiste ---
+    st.markdown("---")
+    st.subheader("Cumuls des Statistiques Simulées")
+    niveaux_cumuls = {"Morceau": "MORCEAU", "Album": "ALBUM", "Artiste IA": "ARTISTE"}
+    niveau_cumul = st.radio("Niveau", list(niveaux_cumuls.keys()), horizontal=True, key="stats_rollup_level")
+    cumuls_df = fsc.get_stats_rollups(niveaux_cumuls[niveau_cumul])
+    if not cumuls_df.empty:
+        display_dataframe(ut.format_dataframe_for_display(cumuls_df.drop(columns=['ID_Rollup', 'Niveau'])), key="stats_rollups_display")
+        st.bar_chart(cumuls_df.head(10).set_index('ID_Entite')['Ecoutes_Totales'])
+    else:
+        st.info("Aucun cumul pour ce niveau. Utilisez « Recalculer les cumuls » pour les initialiser depuis les statistiques existantes.")
+    if st.button("Recalculer les cumuls", key="rebuild_stats_rollups"):
+        with st.spinner("Recalcul des cumuls depuis les statistiques..."):
+            try:
+                nb_cumuls = fsc.rebuild_stats_rollups()
+                st.success(f"{nb_cumuls} cumuls recalculés.")
+            except Exception as e:
+                st.error(f"Erreur lors du recalcul des cumuls : {e}")
+
     # --- Section pour la gestion des STATISTIQUES_ORBITALES_SIMULEES (AJOUTER/METTRE A JOUR/SUPPRIMER) ---
     st.markdown("---")
     st.subheader("Gestion des Statistiques Simulées")
@@ -1680,7 +1807,7 @@ if st.session_state['current_page'] == 'Stats & Tendances Sim.':
 
     with tab_stats_sim_add:
         st.subheader("Ajouter une Nouvelle Statistique Simulée")
-        morceaux_list_for_stats = [''] + fsc.get_all_morceaux()['ID_Morceau'].tolist() # MAJ : Utilise fsc.
+        morceaux_list_for_stats = [''] + fsc.get_all_morceaux(fields=['ID_Morceau'])['ID_Morceau'].tolist() # MAJ : Utilise fsc.
         with st.form("add_stat_sim_form"):
             new_stat_morceau_id = st.selectbox("Morceau Associé", morceaux_list_for_stats, key="add_stat_morceau_id")
             new_stat_mois_annee = st.text_input("Mois-Année (MM-AAAA)", value=datetime.now().strftime('%m-%Y'), key="add_stat_mois_annee")
@@ -1781,7 +1908,7 @@ if st.session_state['current_page'] == 'Directives Stratégiques':
     # MAJ : Utilise fsc.
     artistes_ia_list = [''] + fsc.get_all_artistes_ia()['Nom_Artiste_IA'].tolist()
     genres_musicaux_list = [''] + fsc.get_all_styles_musicaux()['ID_Style_Musical'].tolist()
-    morceaux_all = fsc.get_all_morceaux() # MAJ : Utilise fsc.
+    morceaux_all = fsc.get_all_morceaux(fields=['ID_Morceau', 'Titre_Morceau']) # MAJ : Utilise fsc.
     morceaux_options_directive = morceaux_all.apply(lambda row: f"{row['ID_Morceau']} - {row['Titre_Morceau']}", axis=1).tolist() if not morceaux_all.empty else []
 
     with st.form("strategic_directive_form"):
@@ -1918,7 +2045,7 @@ if st.session_state['current_page'] == 'Potentiel Viral & Niches':
     st.header("📈 Analyse du Potentiel Viral et des Niches")
     st.write("Identifiez les éléments de vos morceaux qui pourraient attirer un large public et explorez les niches musicales potentielles.")
     
-    morceaux_all_viral = fsc.get_all_morceaux() # MAJ : Utilise fsc.
+    morceaux_all_viral = fsc.get_all_morceaux(fields=['ID_Morceau', 'Titre_Morceau']) # MAJ : Utilise fsc.
     public_cible_list = [''] + fsc.get_all_public_cible()['ID_Public'].tolist() # MAJ : Utilise fsc.
 
     with st.form("viral_potential_form"):
@@ -1937,7 +2064,7 @@ if st.session_state['current_page'] == 'Potentiel Viral & Niches':
 
         if submit_viral_analysis:
             if morceau_to_analyze_id and st.session_state.viral_public_cible_selected: # Check changed key
-                selected_morceau_data = morceaux_all_viral[morceaux_all_viral['ID_Morceau'] == morceau_to_analyze_id].iloc[0].to_dict()
+                selected_morceau_data = fsc.get_document_by_id(WORKSHEET_NAMES["MORCEAUX_GENERES"], morceau_to_analyze_id).to_dict()
                 with st.spinner("L'Oracle analyse le potentiel viral..."):
                     viral_analysis_result = go.analyze_viral_potential_and_niche_recommendations(
                         morceau_data=selected_morceau_data,
@@ -3194,6 +3321,10 @@ if st.session_state['current_page'] == 'Projets en Cours':
                     upd_projet_date_debut = st.date_input("Date de Début", value=pd.to_datetime(selected_projet['Date_Debut']), key="upd_projet_date_debut")
                     upd_projet_date_cible_fin = st.date_input("Date Cible de Fin", value=pd.to_datetime(selected_projet['Date_Cible_Fin']), key="upd_projet_date_cible_fin")
                     upd_projet_morceaux_lies = st.text_input("IDs Morceaux Liés (séparés par des virgules)", value=selected_projet['ID_Morceaux_Lies'], key="upd_projet_morceaux_lies")
+                    # Titres des morceaux liés, lus par un get_all multi-documents
+                    morceaux_lies = fsc.get_many_by_ids(WORKSHEET_NAMES["MORCEAUX_GENERES"], selected_projet['ID_Morceaux_Lies'])
+                    if morceaux_lies:
+                        st.caption("Morceaux liés : " + ", ".join(f"{morceau_id} ({morceau['Titre_Morceau']})" for morceau_id, morceau in morceaux_lies.items()))
                     upd_projet_notes = st.text_area("Notes de Production", value=selected_projet['Notes_Production'], key="upd_projet_notes")
                     upd_projet_budget = st.number_input("Budget Estimé (€)", min_value=0.0, value=ut.safe_cast_to_float(selected_projet['Budget_Estime']) if ut.safe_cast_to_float(selected_projet['Budget_Estime']) is not None else 0.0, step=10.0, key="upd_projet_budget")
 
@@ -3506,27 +3637,36 @@ if st.session_state['current_page'] == "Historique de l'Oracle":
     st.header("📚 Historique de l'Oracle")
     st.write("Consultez l'historique de toutes vos interactions avec l'Oracle Architecte et évaluez ses générations.")
 
-    historique_df = fsc.get_all_historique_generations() # MAJ : Utilise fsc.
+    # Comptage par agrégation : l'historique complet n'est chargé que pour une recherche plein texte
+    historique_count = fsc.count_collection(WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"])
 
-    tab_historique_view, tab_historique_feedback = st.tabs(["Voir Historique", "Donner du Feedback"])
+    tab_historique_view, tab_historique_feedback, tab_historique_archives = st.tabs(["Voir Historique", "Donner du Feedback", "Archives"])
 
     with tab_historique_view:
         st.subheader("Historique des Générations")
-        if not historique_df.empty:
+        if historique_count > 0:
             search_hist_query = st.text_input("Rechercher dans l'historique", key="search_historique")
             if search_hist_query:
+                historique_df = fsc.get_all_historique_generations() # MAJ : Utilise fsc.
                 filtered_hist_df = historique_df[historique_df.apply(lambda row: search_hist_query.lower() in row.astype(str).str.lower().to_string(), axis=1)]
+                display_dataframe(ut.format_dataframe_for_display(filtered_hist_df), key="historique_display")
             else:
-                filtered_hist_df = historique_df
-            display_dataframe(ut.format_dataframe_for_display(filtered_hist_df), key="historique_display")
+                display_paginated_collection(
+                    WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"], key="historique_display", order_by='Date_Heure', descending=True,
+                    fields=fsc.list_view_fields(WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"])
+                )
         else:
             st.info("Aucun historique de génération pour le moment.")
 
     with tab_historique_feedback:
         st.subheader("Donner du Feedback à l'Oracle")
-        if not historique_df.empty:
-            # Filtrer les entrées sans évaluation
-            unrated_generations = historique_df[historique_df['Evaluation_Manuelle'] == '']
+        if historique_count > 0:
+            # Filtrer les entrées sans évaluation (filtre exécuté par Firestore)
+            unrated_generations = fsc.query_collection(
+                WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"],
+                where=[('Evaluation_Manuelle', '==', '')],
+                fields=['ID_GenLog', 'Type_Generation', 'Date_Heure']
+            )
             if not unrated_generations.empty:
                 gen_options_feedback = unrated_generations.apply(lambda row: f"{row['ID_GenLog']} - {row['Type_Generation']} ({row['Date_Heure']})", axis=1).tolist()
                 gen_to_feedback_id_display = st.selectbox(
@@ -3536,8 +3676,12 @@ if st.session_state['current_page'] == "Historique de l'Oracle":
                 )
                 gen_to_feedback_id = unrated_generations[unrated_generations.apply(lambda row: f"{row['ID_GenLog']} - {row['Type_Generation']} ({row['Date_Heure']})" == gen_to_feedback_id_display, axis=1)]['ID_GenLog'].iloc[0]
 
-                if gen_to_feedback_id:
-                    selected_gen = unrated_generations[unrated_generations['ID_GenLog'] == gen_to_feedback_id].iloc[0]
+                # Le prompt et la réponse complets ne sont lus que pour la génération sélectionnée
+                selected_gen = fsc.get_document_by_id(WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"], gen_to_feedback_id) if gen_to_feedback_id else None
+                if selected_gen is not None:
+                    selected_gen = selected_gen.to_dict()
+                    selected_gen['Prompt_Envoye_Full'] = fsc.rebuild_historique_prompt(selected_gen) # Prompt reconstruit depuis son modèle
+                    selected_gen = ha.with_archived_full_texts(selected_gen) # Entrée ancienne : textes complets lus dans l'archive
 
                     st.markdown("---")
                     st.write(f"**Génération sélectionnée :** {selected_gen['Type_Generation']} du {selected_gen['Date_Heure']}")
@@ -3565,4 +3709,82 @@ if st.session_state['current_page'] == "Historique de l'Oracle":
             else:
                 st.info("Toutes les générations ont été évaluées, ou il n'y a pas encore d'historique.")
         else:
-            st.info("Aucun historique de génération pour le moment.")
\ No newline at end of file
+            st.info("Aucun historique de génération pour le moment.")
+
+    with tab_historique_archives:
+        st.subheader("Archives de l'Historique")
+        st.write(f"Les générations de plus de {HISTORIQUE_RETENTION_DAYS} jours"
+                 f"{' ou déjà évaluées' if HISTORIQUE_ARCHIVE_RATED else ''} sont archivées localement ; Firestore n'en garde qu'un résumé.")
+        if st.button("Archiver maintenant", key="run_historique_retention"):
+            with st.spinner("Archivage de l'historique en cours..."):
+                try:
+                    retention_report = ha.run_retention()
+                    st.success(f"{retention_report['archivees']} génération(s) archivée(s) dans {len(retention_report['segments'])} segment(s).")
+                except Exception as e:
+                    st.error(f"Erreur lors de l'archivage de l'historique : {e}")
+
+        col_archive_search, col_archive_type = st.columns(2)
+        with col_archive_search:
+            archive_search_query = st.text_input("Rechercher dans le prompt ou la réponse", key="search_historique_archive")
+        with col_archive_type:
+            archive_type_filter = st.text_input("Type de génération (exact)", key="type_historique_archive")
+        col_archive_from, col_archive_to = st.columns(2)
+        with col_archive_from:
+            archive_date_from = st.date_input("Du", value=None, key="archive_date_from")
+        with col_archive_to:
+            archive_date_to = st.date_input("Au", value=None, key="archive_date_to")
+
+        archives_df = ha.query_archive(
+            search=archive_search_query,
+            type_generation=archive_type_filter,
+            date_from=archive_date_from.strftime('%Y-%m-%d') if archive_date_from else None,
+            date_to=archive_date_to.strftime('%Y-%m-%d') if archive_date_to else None
+        )
+        if not archives_df.empty:
+            st.caption(f"{len(archives_df)} génération(s) archivée(s) trouvée(s).")
+            display_dataframe(ut.format_dataframe_for_display(archives_df.drop(columns=['Prompt_Envoye_Full', 'Reponse_Recue_Full'])), key="historique_archive_display")
+            archive_selected_id = st.selectbox("Afficher une génération archivée", [''] + archives_df['ID_GenLog'].tolist(), key="select_archived_gen")
+            if archive_selected_id:
+                archived_gen = archives_df[archives_df['ID_GenLog'] == archive_selected_id].iloc[0]
+                st.text_area("Prompt envoyé :", value=archived_gen['Prompt_Envoye_Full'], height=150, disabled=True, key="archived_prompt")
+                st.text_area("Réponse reçue :", value=archived_gen['Reponse_Recue_Full'], height=200, disabled=True, key="archived_response")
+        else:
+            st.info("Aucune génération archivée ne correspond à ces critères.")
+
+
+# --- Panneau de débogage : coût Firestore ---
+# Affiché en fin de script pour inclure toutes les lectures et écritures de l'exécution en cours.
+if FIRESTORE_METRICS_ENABLED and FIRESTORE_DEBUG_PANEL:
+    with st.sidebar.expander("🔍 Coût Firestore", expanded=False):
+        rerun_metrics = fsm.get_metrics('rerun')
+        rerun_started_at = fsm.get_rerun_started_at()
+        st.caption(f"Exécution du {rerun_started_at.strftime('%H:%M:%S') if rerun_started_at else '-'}")
+        st.write(
+            f"**Cette exécution :** {int(rerun_metrics['documents'].sum())} documents lus, "
+            + (f"{int(rerun_metrics['octets'].sum()) / 1024:.1f} Ko, " if FIRESTORE_METRICS_BYTES else "")
+            + f"{int(rerun_metrics['ecritures'].sum())} écritures, "
+            f"cache {int(rerun_metrics['cache_hits'].sum())} succès / {int(rerun_metrics['cache_misses'].sum())} échecs"
+        )
+        metrics_scope = st.radio(
+            "Portée", ['rerun', 'session', 'processus'] if FIRESTORE_METRICS_ADMIN else ['rerun', 'session'], horizontal=True, key="firestore_metrics_scope",
+            format_func=lambda scope: {'rerun': "Exécution", 'session': "Session", 'processus': "Processus"}[scope]
+        )
+        scope_metrics = rerun_metrics if metrics_scope == 'rerun' else fsm.get_metrics(metrics_scope)
+        if scope_metrics.empty:
+            st.info("Aucun accès Firestore mesuré.")
+        else:
+            st.dataframe(scope_metrics, hide_index=True, use_container_width=True)
+        st.download_button(
+            "Exporter (JSON)", data=fsm.export_metrics(include_process=FIRESTORE_METRICS_ADMIN), file_name=f"firestore_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json", key="export_firestore_metrics_json"
+        )
+        st.download_button(
+            "Exporter la portée (CSV)", data=scope_metrics.to_csv(index=False), file_name=f"firestore_metrics_{metrics_scope}.csv",
+            mime="text/csv", key="export_firestore_metrics_csv"
+        )
+        if st.button("Remettre mes compteurs à zéro", key="reset_firestore_metrics"):
+            fsm.reset_session_metrics()
+            st.rerun()
+        if FIRESTORE_METRICS_ADMIN and st.button("Remettre à zéro les compteurs de tout le processus", key="reset_firestore_process_metrics"):
+            fsm.reset_metrics()
+            st.rerun()
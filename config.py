@@ -28,7 +28,9 @@ WORKSHEET_NAMES = {
     "OUTILS_IA_REFERENCEMENT": "OUTILS_IA_REFERENCEMENT",
     "TIMELINE_EVENEMENTS_CULTURELS": "TIMELINE_EVENEMENTS_CULTURELS",
     "PAROLES_EXISTANTES": "PAROLES_EXISTANTES",
-    "HISTORIQUE_GENERATIONS": "HISTORIQUE_GENERATIONS"
+    "HISTORIQUE_GENERATIONS": "HISTORIQUE_GENERATIONS",
+    "PROMPT_TEMPLATES": "PROMPT_TEMPLATES", # Modèles de prompts adressés par contenu (ID = empreinte SHA-256 du corps)
+    "STATS_ROLLUPS": "STATS_ROLLUPS" # Cumuls des statistiques simulées par morceau, album et artiste (maintenus à l'écriture)
 }
 
 # Dossier local pour les assets (covers, audios, textes générés)
@@ -42,6 +44,136 @@ GENERATED_TEXTS_DIR = os.path.join(ASSETS_DIR, "texts_generated") # Pour les par
 # Clé API Gemini (nom de la variable dans secrets.toml)
 GEMINI_API_KEY_NAME = "GEMINI_API_KEY"
 
+# --- Backend de données ---
+# "firestore" : Google Cloud Firestore (secrets Streamlit). "memory" : backend en mémoire sans réseau
+# (memory_firestore.py), pour les tests hors ligne et les mesures de performance. Surchargeable via la variable d'environnement.
+FIRESTORE_BACKEND = os.environ.get("FIRESTORE_BACKEND", "firestore").lower()
+# Fichier JSON {collection: {doc_id: données}} chargé au démarrage du backend mémoire (optionnel)
+MEMORY_BACKEND_SEED_FILE = os.environ.get("FIRESTORE_MEMORY_SEED_FILE", "")
+# Jeu synthétique généré au démarrage du backend mémoire : nombre de documents par collection (ex. "MORCEAUX_GENERES=5000,HISTORIQUE_GENERATIONS=20000")
+MEMORY_BACKEND_SYNTHETIC_ROWS = os.environ.get("FIRESTORE_MEMORY_SYNTHETIC_ROWS", "")
+
+# --- Instrumentation Firestore (firestore_metrics.py) ---
+# Compteurs de lectures, d'écritures et de latence par collection et par opération
+FIRESTORE_METRICS_ENABLED = os.environ.get("FIRESTORE_METRICS_ENABLED", "1") == "1"
+# Les compteurs d'une session inactive depuis METRICS_SESSION_TTL_SECONDS sont oubliés ; au-delà de
+# METRICS_MAX_SESSIONS sessions suivies, les moins récemment actives sont oubliées en premier
+METRICS_SESSION_TTL_SECONDS = 3600
+METRICS_MAX_SESSIONS = 500
+# Estimation des octets lus et écrits : sérialise chaque document mesuré, y compris lors des lectures
+# complètes de collections ; désactivée par défaut (les compteurs de documents restent exacts)
+FIRESTORE_METRICS_BYTES = os.environ.get("FIRESTORE_METRICS_BYTES", "0") == "1"
+# Panneau de la barre latérale affichant le coût Firestore de l'exécution en cours et de la session (outil de développement)
+FIRESTORE_DEBUG_PANEL = os.environ.get("FIRESTORE_DEBUG_PANEL", "0") == "1"
+# Donne aussi accès, dans le panneau, à la portée 'processus' (toutes les sessions) et à sa remise à zéro
+FIRESTORE_METRICS_ADMIN = os.environ.get("FIRESTORE_METRICS_ADMIN", "0") == "1"
+
+# --- Canal gRPC du client Firestore ---
+# Options passées au canal partagé par toutes les sessions : keepalive (évite les reconnexions après
+# une période d'inactivité derrière un proxy/NAT) et taille maximale des messages (grosses collections).
+FIRESTORE_GRPC_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.max_receive_message_length", 64 * 1024 * 1024),
+    ("grpc.max_send_message_length", 16 * 1024 * 1024)
+]
+# Délai maximal d'attente de la connexion du canal lors de l'initialisation (en secondes)
+FIRESTORE_CONNECT_TIMEOUT_SECONDS = 10
+
+# --- Synchronisation incrémentale des collections Firestore ---
+# Si activée, seuls les documents modifiés depuis la dernière lecture sont relus à l'expiration du cache.
+FIRESTORE_INCREMENTAL_SYNC = True
+# Champ horodaté par le serveur (SERVER_TIMESTAMP) à chaque écriture, utilisé comme watermark.
+# 'Date_Mise_A_Jour' n'est pas utilisable seul : il n'existe que sur MORCEAUX_GENERES et n'a qu'une précision au jour.
+SYNC_TIMESTAMP_FIELD = "Horodatage_Sync"
+# Intervalle entre deux scans d'IDs pour détecter les documents supprimés ailleurs (en secondes)
+DELETE_RECONCILE_INTERVAL_SECONDS = 900
+# Snapshots persistés sur disque (Parquet) pour un démarrage à froid rapide après un redémarrage
+# (désactivés avec le backend mémoire, dont les données ne survivent pas au processus)
+PERSISTENT_SNAPSHOT_CACHE = FIRESTORE_BACKEND == "firestore"
+SNAPSHOT_CACHE_DIR = os.path.join(".cache", "firestore_snapshots")
+# Durée de fraîcheur des DataFrames de collections partagés (en secondes). Au-delà, l'ancien DataFrame
+# reste servi pendant qu'une seule relecture tourne en arrière-plan ; après un échec, nouvel essai dans
+# COLLECTION_REFRESH_RETRY_SECONDS secondes.
+COLLECTION_CACHE_TTL_SECONDS = 600
+COLLECTION_REFRESH_RETRY_SECONDS = 30
+
+# --- Invalidation des caches entre réplicas (journal des changements) ---
+# Chaque écriture ajoute un petit enregistrement (collection, version, IDs supprimés) à la collection
+# CACHE_CHANGE_LOG_COLLECTION ; chaque réplica suit ce journal par un listener on_snapshot et
+# n'invalide que les caches des collections modifiées ailleurs. Actif par défaut avec Firestore,
+# désactivable via la variable d'environnement (instance unique, backend mémoire).
+CACHE_CHANGE_LOG_ENABLED = os.environ.get("FIRESTORE_CACHE_CHANGE_LOG", "1" if FIRESTORE_BACKEND == "firestore" else "0") == "1"
+CACHE_CHANGE_LOG_COLLECTION = "CACHE_CHANGE_LOG"
+# Durée de conservation des enregistrements : champ 'Expire_Le' pour une politique TTL Firestore
+# (gcloud firestore fields ttls update Expire_Le --collection-group=CACHE_CHANGE_LOG)
+CACHE_CHANGE_LOG_TTL_HOURS = 24
+# Au-delà de ce nombre d'IDs supprimés dans une écriture, les réplicas réconcilient par un scan d'IDs
+CACHE_CHANGE_LOG_MAX_DELETED_IDS = 100
+
+# --- Miroir temps réel (listeners Firestore on_snapshot) ---
+# Mode optionnel : les collections listées sont tenues à jour en mémoire par des listeners,
+# partagés par toutes les sessions Streamlit du processus. Activable via la variable d'environnement.
+FIRESTORE_REALTIME_MIRROR = os.environ.get("FIRESTORE_REALTIME_MIRROR", "").lower() in ("1", "true", "vrai")
+REALTIME_MIRROR_COLLECTIONS = [
+    WORKSHEET_NAMES["MORCEAUX_GENERES"],
+    WORKSHEET_NAMES["ALBUMS_PLANETAIRES"],
+    # Bibliothèques de l'Oracle
+    WORKSHEET_NAMES["ARTISTES_IA_COSMIQUES"],
+    WORKSHEET_NAMES["STYLES_MUSICAUX_GALACTIQUES"],
+    WORKSHEET_NAMES["STYLES_LYRIQUES_UNIVERS"],
+    WORKSHEET_NAMES["THEMES_CONSTELLES"],
+    WORKSHEET_NAMES["MOODS_ET_EMOTIONS"],
+    WORKSHEET_NAMES["INSTRUMENTS_ORCHESTRAUX"],
+    WORKSHEET_NAMES["VOIX_ET_STYLES_VOCAUX"],
+    WORKSHEET_NAMES["STRUCTURES_SONG_UNIVERSELLES"],
+    WORKSHEET_NAMES["REGLES_DE_GENERATION_ORACLE"],
+    WORKSHEET_NAMES["PUBLIC_CIBLE_DEMOGRAPHIQUE"],
+    WORKSHEET_NAMES["PROMPTS_TYPES_ET_GUIDES"],
+    WORKSHEET_NAMES["REFERENCES_SONORES_DETAILLES"]
+]
+# Délai maximal d'attente du premier snapshot d'un listener avant de repasser par la lecture classique (en secondes)
+REALTIME_MIRROR_READY_TIMEOUT_SECONDS = 10
+
+# --- Écritures groupées (WriteBatch) ---
+# Limites Firestore : 500 opérations et 10 Mio par requête de commit (on garde une marge sur la taille).
+FIRESTORE_BATCH_MAX_OPERATIONS = 500
+FIRESTORE_BATCH_MAX_BYTES = 9 * 1024 * 1024
+# Nombre maximal de batches envoyés en parallèle
+FIRESTORE_BATCH_MAX_WORKERS = 4
+# Statuts de production possibles d'un morceau (formulaires et tableau de bord de l'Accueil)
+STATUTS_PRODUCTION = ["Idée", "Paroles Générées", "Prompt Audio Généré", "Audio Généré", "Mix/Master", "Finalisé", "Publié"]
+
+# Journalisation différée de l'historique des générations (file bornée, écritures groupées, fichier de secours JSONL)
+HISTORIQUE_QUEUE_MAX_SIZE = 1000
+HISTORIQUE_FLUSH_INTERVAL_SECONDS = 2
+HISTORIQUE_FLUSH_BATCH_SIZE = 200
+HISTORIQUE_SPILL_FILE = os.path.join(".cache", "historique_spill.jsonl")
+# Rétention de l'historique (historique_archive.py) : au-delà de HISTORIQUE_RETENTION_DAYS jours (ou dès l'évaluation
+# si HISTORIQUE_ARCHIVE_RATED), l'entrée complète part dans un segment Parquet local et Firestore ne garde qu'un résumé
+HISTORIQUE_RETENTION_DAYS = 30
+HISTORIQUE_ARCHIVE_RATED = True
+HISTORIQUE_ARCHIVE_DIR = os.path.join("archives", "historique_generations")
+HISTORIQUE_ARCHIVE_SEGMENT_MAX_ROWS = 5000
+HISTORIQUE_SUMMARY_PREVIEW_CHARS = 300
+# Marqueur booléen posé sur chaque entrée d'historique (False à l'écriture, True une fois réduite à un résumé) :
+# la sélection des entrées à archiver filtre dessus côté serveur
+HISTORIQUE_ARCHIVE_MARKER_FIELD = 'Archive'
+# Nombre maximal de collections chargées en parallèle par prefetch_collections
+PREFETCH_MAX_WORKERS = 8
+
+# --- Requêtes côté serveur ---
+# Taille des pages projetées lues pour calculer les valeurs distinctes d'un champ (options des filtres)
+DISTINCT_VALUES_PAGE_SIZE = 1000
+
+# --- Pagination des grandes collections ---
+# Nombre de pages gardées en mémoire (pages consultées et pages préchargées) et leur durée de vie (en secondes)
+PAGE_CACHE_MAX_ENTRIES = 64
+PAGE_CACHE_TTL_SECONDS = 600
+# Taille de page par défaut des tableaux paginés
+DEFAULT_PAGE_SIZE = 25
+
 # --- Colonnes attendues pour chaque collection Firestore (pour la validation des données) ---
 # Ceci est crucial pour firestore_connector.py pour s'assurer que les données sont bien structurées
 EXPECTED_COLUMNS = {
@@ -143,6 +275,56 @@ EXPECTED_COLUMNS = {
         'ID_GenLog', 'Date_Heure', 'ID_Utilisateur', 'Type_Generation',
         'Prompt_Envoye_Full', 'Reponse_Recue_Full', 'ID_Morceau_Associe',
         'Evaluation_Manuelle', 'Commentaire_Qualitatif', 'Tags_Feedback',
-        'ID_Regle_Appliquee_Auto'
+        'ID_Regle_Appliquee_Auto', 'Prompt_Template_Hash', 'Prompt_Variables'
+    ],
+    WORKSHEET_NAMES["PROMPT_TEMPLATES"]: [
+        'ID_Template', 'Corps_Template', 'Date_Creation'
+    ],
+    WORKSHEET_NAMES["STATS_ROLLUPS"]: [
+        'ID_Rollup', 'Niveau', 'ID_Entite', 'Nb_Stats', 'Ecoutes_Totales', 'J_aimes_Recus',
+        'Partages_Simules', 'Revenus_Simules_Streaming', 'Date_Mise_A_Jour'
     ]
-}
\ No newline at end of file
+}
+
+# --- Champs texte volumineux exclus des vues liste (projection Firestore) ---
+# Les tableaux et selectbox ne lisent pas ces champs ; le document complet est relu par ID à l'ouverture d'une ligne.
+LARGE_TEXT_FIELDS = {
+    WORKSHEET_NAMES["MORCEAUX_GENERES"]: ['Prompt_Generation_Audio', 'Prompt_Generation_Paroles'],
+    WORKSHEET_NAMES["PAROLES_EXISTANTES"]: ['Paroles_Existantes'],
+    WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"]: ['Prompt_Envoye_Full', 'Reponse_Recue_Full', 'Prompt_Variables'],
+    WORKSHEET_NAMES["PROMPT_TEMPLATES"]: ['Corps_Template']
+}
+
+# --- Types des champs (normalisation vectorisée des DataFrames) ---
+# 'int' : entiers nullables (Int64), 'float' : float64, 'bool' : booléen ('VRAI' en texte),
+# 'category' : champs énumérés à faible cardinalité, en lecture seule dans l'interface (dtype category),
+# 'string' : identifiants (clés de jointure, de regroupement et de pivot) et champs modifiés par
+# l'utilisateur (dtype string : affectation de nouvelles valeurs et groupby sans groupes fantômes),
+# 'text' : texte libre volumineux (string[pyarrow], stocké hors des objets Python).
+# Les champs non listés restent tels que stockés dans Firestore.
+COLUMN_TYPES = {
+    WORKSHEET_NAMES["MORCEAUX_GENERES"]: {
+        'Statut_Production': 'string', 'ID_Artiste_IA': 'string', 'ID_Style_Musical_Principal': 'string',
+        'ID_Style_Lyrique_Principal': 'string', 'Langue_Paroles': 'string', 'ID_Album_Associe': 'string',
+        'Prompt_Generation_Audio': 'text', 'Prompt_Generation_Paroles': 'text'
+    },
+    WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"]: {
+        'ID_Morceau': 'string', 'Mois_Annee_Stat': 'string', 'Plateforme_Simulee': 'string',
+        'Ecoutes_Totales': 'int', 'J_aimes_Recus': 'int', 'Partages_Simules': 'int', 'Revenus_Simules_Streaming': 'float'
+    },
+    WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"]: {
+        'ID_Utilisateur': 'category', 'Type_Generation': 'category', 'Evaluation_Manuelle': 'string',
+        'Prompt_Envoye_Full': 'text', 'Reponse_Recue_Full': 'text',
+        'Prompt_Template_Hash': 'string', 'Prompt_Variables': 'text'
+    },
+    WORKSHEET_NAMES["PROMPT_TEMPLATES"]: {'Corps_Template': 'text'},
+    WORKSHEET_NAMES["STATS_ROLLUPS"]: {
+        'Niveau': 'category', 'Nb_Stats': 'int', 'Ecoutes_Totales': 'int', 'J_aimes_Recus': 'int',
+        'Partages_Simules': 'int', 'Revenus_Simules_Streaming': 'float'
+    },
+    WORKSHEET_NAMES["PAROLES_EXISTANTES"]: {'Genre_Musical': 'string', 'Paroles_Existantes': 'text'},
+    WORKSHEET_NAMES["MOODS_ET_EMOTIONS"]: {'Niveau_Intensite': 'int'},
+    WORKSHEET_NAMES["PROJETS_EN_COURS"]: {'Budget_Estime': 'float'},
+    WORKSHEET_NAMES["OUTILS_IA_REFERENCEMENT"]: {'Evaluation_Gardien': 'int'},
+    WORKSHEET_NAMES["REGLES_DE_GENERATION_ORACLE"]: {'Statut_Actif': 'bool'}
+}
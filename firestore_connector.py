@@ -1,11 +1,25 @@
 # firestore_connector.py
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import google.cloud.firestore
+from google.cloud.firestore_v1.field_path import FieldPath
 import base64
+import hashlib
 import json
+import os
+import threading
+import time
+import queue
+import atexit
+import socket
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 # Importation des configurations. Assure-toi que ces noms d'onglets correspondent à tes FUTURES collections Firestore
 # Pour la conversion, nous allons "mapper" les noms d'onglets aux noms de collection.
@@ -14,99 +28,1171 @@ import json
 # que dans Firestore, ces noms peuvent être "morceaux_generes", "albums_planetaires", etc.
 # Pour l'instant, on garde les noms d'origine du config.py pour faciliter le mapping.
 # CORRECTION ICI : WORKSHEET_NAMES au lieu de FIRESTORE_COLLECTIONS
-from config import WORKSHEET_NAMES, EXPECTED_COLUMNS 
-from utils import generate_unique_id, parse_boolean_string, safe_cast_to_int, safe_cast_to_float
+from config import (
+    WORKSHEET_NAMES, EXPECTED_COLUMNS, COLUMN_TYPES,
+    FIRESTORE_INCREMENTAL_SYNC, SYNC_TIMESTAMP_FIELD, DELETE_RECONCILE_INTERVAL_SECONDS,
+    FIRESTORE_REALTIME_MIRROR, REALTIME_MIRROR_COLLECTIONS, REALTIME_MIRROR_READY_TIMEOUT_SECONDS,
+    FIRESTORE_BATCH_MAX_OPERATIONS, FIRESTORE_BATCH_MAX_BYTES, FIRESTORE_BATCH_MAX_WORKERS,
+    PAGE_CACHE_MAX_ENTRIES, PAGE_CACHE_TTL_SECONDS, DISTINCT_VALUES_PAGE_SIZE, LARGE_TEXT_FIELDS,
+    PERSISTENT_SNAPSHOT_CACHE, SNAPSHOT_CACHE_DIR, PREFETCH_MAX_WORKERS,
+    AUDIO_CLIPS_DIR, SONG_COVERS_DIR,
+    FIRESTORE_BACKEND, MEMORY_BACKEND_SEED_FILE, MEMORY_BACKEND_SYNTHETIC_ROWS,
+    FIRESTORE_GRPC_CHANNEL_OPTIONS, FIRESTORE_CONNECT_TIMEOUT_SECONDS,
+    HISTORIQUE_QUEUE_MAX_SIZE, HISTORIQUE_FLUSH_INTERVAL_SECONDS, HISTORIQUE_FLUSH_BATCH_SIZE, HISTORIQUE_SPILL_FILE,
+    HISTORIQUE_ARCHIVE_MARKER_FIELD,
+    COLLECTION_CACHE_TTL_SECONDS, COLLECTION_REFRESH_RETRY_SECONDS,
+    CACHE_CHANGE_LOG_ENABLED, CACHE_CHANGE_LOG_COLLECTION, CACHE_CHANGE_LOG_TTL_HOURS, CACHE_CHANGE_LOG_MAX_DELETED_IDS
+)
+from memory_firestore import MemoryFirestoreClient, build_synthetic_dataset, transactional as memory_transactional
+import firestore_metrics as fsm
+from utils import (
+    generate_unique_id, parse_boolean_series, cast_series_to_int, cast_series_to_float,
+    cast_series_to_category, cast_series_to_string, cast_series_to_text, estimate_document_size
+)
+
+# --- Initialisation paresseuse de la Connexion à Firestore ---
+# Le client n'est pas créé à l'import du module : il l'est au premier appel de get_db(), ou en
+# avance par start_client_warmup() sur un thread d'arrière-plan pendant que l'interface se dessine.
+# Un seul client (et un seul canal gRPC) est partagé par toutes les sessions et tous les threads
+# du processus. En cas d'échec, FirestoreConnectionError est levée au lieu d'appeler st.stop(),
+# ce qui permet aussi un usage hors Streamlit (scripts, mesures de performance).
+
+class FirestoreConnectionError(Exception):
+    """Échec de création du client Firestore (secrets manquants, identifiants invalides, canal indisponible)."""
+
+_db_client = None
+_db_client_error = None
+_db_client_lock = threading.Lock()
+_db_warmup_thread = None
+
+def _get_memory_client():
+    """
+    Crée le client du backend en mémoire (FIRESTORE_BACKEND = "memory"), amorcé depuis
+    MEMORY_BACKEND_SEED_FILE et/ou un jeu synthétique (MEMORY_BACKEND_SYNTHETIC_ROWS).
+    """
+    client = MemoryFirestoreClient(project="memory")
+    if MEMORY_BACKEND_SEED_FILE:
+        client.seed_from_file(MEMORY_BACKEND_SEED_FILE)
+    if MEMORY_BACKEND_SYNTHETIC_ROWS:
+        row_counts = {}
+        for entry in MEMORY_BACKEND_SYNTHETIC_ROWS.split(","):
+            key, _, count = entry.partition("=")
+            row_counts[WORKSHEET_NAMES.get(key.strip(), key.strip())] = int(count)
+        client.seed(build_synthetic_dataset(EXPECTED_COLUMNS, row_counts, sync_field=SYNC_TIMESTAMP_FIELD))
+    print(f"DEBUG_FIRESTORE: Backend mémoire actif ({len(client.collection_names())} collections amorcées).")
+    return client
+
+def _install_grpc_channel(client, credentials):
+    """
+    Remplace le canal gRPC par défaut du client par un canal créé avec FIRESTORE_GRPC_CHANNEL_OPTIONS
+    (keepalive, taille maximale des messages) et attend qu'il soit connecté (poignée de main TLS).
+    En cas d'incompatibilité avec la version de la bibliothèque, le canal par défaut est conservé.
+    """
+    try:
+        import grpc
+        from google.cloud.firestore_v1.services.firestore import client as firestore_client
+        from google.cloud.firestore_v1.services.firestore.transports import grpc as firestore_grpc_transport
+        channel = firestore_grpc_transport.FirestoreGrpcTransport.create_channel(
+            client._target, credentials=credentials, options=FIRESTORE_GRPC_CHANNEL_OPTIONS
+        )
+        transport = firestore_grpc_transport.FirestoreGrpcTransport(host=client._target, channel=channel)
+        client._firestore_api_internal = firestore_client.FirestoreClient(transport=transport, client_info=client._client_info)
+        grpc.channel_ready_future(channel).result(timeout=FIRESTORE_CONNECT_TIMEOUT_SECONDS)
+    except Exception as e:
+        print(f"DEBUG_FIRESTORE: Options de canal gRPC non appliquées, canal par défaut utilisé : {e}")
 
-# --- Initialisation de la Connexion à Firestore ---
-@st.cache_resource(ttl=3600) # Mise en cache de la connexion pendant 1 heure
-def get_firestore_client():
+def _create_firestore_client():
     """
-    Initialise et retourne un client Firestore authentifié.
+    Crée un client Firestore authentifié.
     Utilise les secrets Streamlit pour l'authentification du compte de service (clé JSON encodée en Base64).
+    Avec FIRESTORE_BACKEND = "memory", retourne un client en mémoire de même interface, sans réseau ni secrets.
     """
+    if FIRESTORE_BACKEND == "memory":
+        return _get_memory_client()
     try:
         service_account_info_b64 = st.secrets["GCP_SERVICE_ACCOUNT_B64"]
         project_id = st.secrets["GCP_PROJECT_ID"]
-        
+    except KeyError:
+        raise FirestoreConnectionError("Les clés 'GCP_SERVICE_ACCOUNT_B64' ou 'GCP_PROJECT_ID' sont manquantes dans votre fichier .streamlit/secrets.toml. Veuillez les configurer.")
+    try:
         service_account_info_json_str = base64.b64decode(service_account_info_b64).decode('utf-8')
         creds = json.loads(service_account_info_json_str)
-        
+
         from google.oauth2 import service_account
         credentials = service_account.Credentials.from_service_account_info(creds)
-        db = google.cloud.firestore.Client(project=project_id, credentials=credentials)
-
-        st.session_state['firestore_initialized'] = True
-        st.session_state['firestore_error'] = None
-        return db
-    except KeyError:
-        st.error("Les clés 'GCP_SERVICE_ACCOUNT_B64' ou 'GCP_PROJECT_ID' sont manquantes dans votre fichier .streamlit/secrets.toml. Veuillez les configurer.")
-        st.stop()
+        client = google.cloud.firestore.Client(project=project_id, credentials=credentials)
     except Exception as e:
-        st.error(f"Erreur d'authentification Firestore. Assurez-vous que la clé GCP_SERVICE_ACCOUNT_B64 est correctement encodée et configurée, et que le Project ID est correct: {e}")
-        st.stop()
+        raise FirestoreConnectionError(f"Erreur d'authentification Firestore. Assurez-vous que la clé GCP_SERVICE_ACCOUNT_B64 est correctement encodée et configurée, et que le Project ID est correct: {e}")
+    _install_grpc_channel(client, credentials)
+    return client
 
-db = get_firestore_client()
+def get_db():
+    """
+    Retourne le client Firestore partagé du processus, créé au premier appel (thread-safe).
+    Lève FirestoreConnectionError si la création échoue ; un nouvel essai est fait à l'appel suivant.
+    """
+    global _db_client, _db_client_error
+    if _db_client is not None:
+        return _db_client
+    created = False
+    with _db_client_lock:
+        if _db_client is None:
+            try:
+                _db_client = _create_firestore_client()
+                _db_client_error = None
+                created = True
+            except FirestoreConnectionError as e:
+                _db_client_error = str(e)
+                raise
+    if created:
+        start_change_log_listener() # Tout processus qui crée le client suit le journal des changements
+    return _db_client
 
-# --- Fonctions d'interaction avec Firestore ---
+def get_firestore_client():
+    """Compatibilité : retourne le client partagé (voir get_db)."""
+    return get_db()
+
+def get_db_error():
+    """Retourne le message de la dernière erreur de connexion, ou None."""
+    return _db_client_error
 
-@st.cache_data(ttl=600) # Mise en cache des données lues pendant 10 minutes
-def get_dataframe_from_collection(collection_name: str) -> pd.DataFrame:
+def start_client_warmup():
     """
-    Lit une collection Firestore et la retourne sous forme de DataFrame Pandas.
-    Vérifie la présence des colonnes attendues (qui sont maintenant des champs de document).
+    Lance (une seule fois par processus) la création du client et l'ouverture du canal gRPC
+    sur un thread d'arrière-plan, pour que la première lecture n'en paie pas la latence.
     """
-    try:
-        docs = db.collection(collection_name).stream()
-        data = []
-        for doc in docs:
+    global _db_warmup_thread
+    with _db_client_lock:
+        if _db_client is not None or _db_warmup_thread is not None:
+            return
+        def warmup():
+            try:
+                get_db()
+                print("DEBUG_FIRESTORE: Client Firestore initialisé en arrière-plan.")
+            except FirestoreConnectionError as e:
+                print(f"DEBUG_FIRESTORE: Échec de l'initialisation en arrière-plan : {e}")
+        _db_warmup_thread = threading.Thread(target=warmup, name="firestore_client_warmup", daemon=True)
+        _db_warmup_thread.start()
+
+# --- Versions de cache par collection ---
+# Chaque collection possède un compteur de version partagé par toutes les sessions du processus.
+# Les fonctions mises en cache reçoivent cette version en argument : incrémenter le compteur
+# d'une collection rend obsolètes uniquement ses entrées (et celles de tout cache dérivé qui
+# inclut la version dans sa clé), au lieu de vider tout st.cache_data à chaque écriture.
+_collection_versions = {}
+_collection_versions_lock = threading.Lock()
+
+def get_collection_version(collection_name: str) -> int:
+    """Retourne la version de cache courante d'une collection (0 si jamais invalidée)."""
+    with _collection_versions_lock:
+        return _collection_versions.get(collection_name, 0)
+
+def invalidate_collection_cache(collection_name: str) -> int:
+    """
+    Invalide le cache d'une seule collection après une écriture.
+    Incrémente son compteur de version (les caches dérivés la voient à leur prochain appel)
+    et évince immédiatement l'entrée DataFrame de la version précédente, puis publie
+    l'invalidation dans le journal des changements pour les autres réplicas.
+    Retourne la nouvelle version.
+    """
+    new_version = _invalidate_local_collection_cache(collection_name)
+    _publish_cache_invalidation(collection_name, new_version)
+    return new_version
+
+def _invalidate_local_collection_cache(collection_name: str) -> int:
+    """Invalide le cache de la collection dans ce processus seulement (changement venu d'ailleurs)."""
+    with _collection_versions_lock:
+        old_version = _collection_versions.get(collection_name, 0)
+        new_version = old_version + 1
+        _collection_versions[collection_name] = new_version
+    with _collection_frames_lock:
+        entry = _collection_frames.get(collection_name)
+        if entry is not None and entry['version'] == old_version:
+            del _collection_frames[collection_name]
+    return new_version
+
+# --- Synchronisation incrémentale des collections ---
+# Le dernier snapshot de chaque collection est conservé en mémoire (partagé entre les sessions)
+# avec une ligne de flottaison ("watermark") : la plus grande valeur de SYNC_TIMESTAMP_FIELD vue.
+# Quand le TTL du cache expire, seuls les documents modifiés depuis ce watermark sont relus.
+# Les suppressions faites ailleurs sont réconciliées par un scan périodique des seuls IDs.
+_EPOCH = datetime.fromtimestamp(0, tz=timezone.utc)
+_collection_snapshots = {}
+_collection_snapshot_locks = {}
+_collection_snapshots_lock = threading.Lock()
+
+def _get_snapshot_lock(collection_name: str) -> threading.Lock:
+    """Retourne le verrou dédié à la synchronisation d'une collection."""
+    with _collection_snapshots_lock:
+        if collection_name not in _collection_snapshot_locks:
+            _collection_snapshot_locks[collection_name] = threading.Lock()
+        return _collection_snapshot_locks[collection_name]
+
+def _advance_watermark(watermark, doc_dict: dict):
+    """Retourne le watermark avancé à l'horodatage de synchronisation du document, s'il est plus récent."""
+    stamp = doc_dict.get(SYNC_TIMESTAMP_FIELD) if doc_dict else None
+    if isinstance(stamp, datetime) and (watermark is None or stamp > watermark):
+        return stamp
+    return watermark
+
+def _full_collection_scan(collection_name: str) -> dict:
+    """Lit toute la collection et construit un nouveau snapshot."""
+    docs = {}
+    watermark = None
+    with fsm.track(collection_name, 'lecture_complete') as measure:
+        for doc in get_db().collection(collection_name).stream():
+            doc_dict = doc.to_dict()
+            measure.add_document(doc_dict)
+            docs[doc.id] = doc_dict
+            watermark = _advance_watermark(watermark, doc_dict)
+    return {'docs': docs, 'watermark': watermark, 'last_id_scan': time.monotonic()}
+
+def _apply_delta_sync(collection_name: str, snapshot: dict) -> int:
+    """
+    Relit uniquement les documents dont l'horodatage de synchronisation est >= au watermark
+    et les fusionne dans le snapshot. L'égalité est incluse pour ne pas manquer un document
+    écrit dans la même microseconde que le précédent (la fusion est idempotente).
+    Retourne le nombre de documents réellement modifiés dans le snapshot.
+    """
+    watermark = snapshot['watermark'] or _EPOCH
+    query = get_db().collection(collection_name).where(
+        filter=google.cloud.firestore.FieldFilter(SYNC_TIMESTAMP_FIELD, '>=', watermark)
+    )
+    changed = 0
+    with fsm.track(collection_name, 'sync_delta') as measure:
+        for doc in query.stream():
             doc_dict = doc.to_dict()
-            # Ajoute l'ID du document comme une colonne 'ID_Doc' (ou similaire) si besoin
-            # Pour l'instant, on suppose que l'ID unique est déjà un champ dans le document
-            # ou que nous le générerons et l'ajouterons lors de l'écriture.
-            # L'ID réel du document Firestore est accessible via doc.id, mais pour la compatibilité
-            # avec la structure GSheet, nous utilisons les IDs contenus dans les documents eux-mêmes.
-            data.append(doc_dict)
-        
-        df = pd.DataFrame(data)
-
-        # Vérifier si les "colonnes" (champs) attendues sont présentes
-        # et ajouter les manquantes pour assurer la compatibilité du DataFrame
-        if collection_name in EXPECTED_COLUMNS:
-            missing_cols = [col for col in EXPECTED_COLUMNS[collection_name] if col not in df.columns]
-            if missing_cols:
-                st.warning(f"Attention: Les champs suivants sont manquants dans la collection '{collection_name}': {', '.join(missing_cols)}. Ils seront ajoutés avec des valeurs vides.")
-                for col in missing_cols:
-                    df[col] = ''
-            # Réordonner les colonnes selon EXPECTED_COLUMNS
-            for col in EXPECTED_COLUMNS[collection_name]:
-                if col not in df.columns:
-                    df[col] = '' # Ajoutez-les si manquantes avec une valeur par défaut
-            df = df[EXPECTED_COLUMNS[collection_name]] # Réordonner
-        
-        # Gérer les types de données spécifiques
-        if collection_name == WORKSHEET_NAMES["REGLES_DE_GENERATION_ORACLE"]:
-            if 'Statut_Actif' in df.columns:
-                df['Statut_Actif'] = df['Statut_Actif'].apply(parse_boolean_string)
-        
-        numeric_cols_to_check = {
-            WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"]: ['Ecoutes_Totales', 'J_aimes_Recus', 'Partages_Simules', 'Revenus_Simules_Streaming'],
-            WORKSHEET_NAMES["MOODS_ET_EMOTIONS"]: ['Niveau_Intensite'],
-            WORKSHEET_NAMES["PROJETS_EN_COURS"]: ['Budget_Estime'],
-            WORKSHEET_NAMES["OUTILS_IA_REFERENCEMENT"]: ['Evaluation_Gardien']
+            measure.add_document(doc_dict)
+            if snapshot['docs'].get(doc.id) != doc_dict:
+                snapshot['docs'][doc.id] = doc_dict
+                changed += 1
+            snapshot['watermark'] = _advance_watermark(snapshot['watermark'], doc_dict)
+    return changed
+
+def _reconcile_deleted_documents(collection_name: str, snapshot: dict) -> int:
+    """
+    Scan bon marché des seuls IDs de documents (projection sur __name__) :
+    retire du snapshot les documents supprimés ailleurs et récupère ceux écrits sans horodatage
+    de synchronisation (anciens documents, outils externes).
+    Retourne le nombre de documents retirés ou ajoutés.
+    """
+    id_query = get_db().collection(collection_name).select([FieldPath.document_id()])
+    with fsm.track(collection_name, 'scan_ids') as measure:
+        live_ids = {doc.id for doc in id_query.stream()}
+        measure.documents += len(live_ids)
+    deleted_ids = [doc_id for doc_id in snapshot['docs'] if doc_id not in live_ids]
+    for doc_id in deleted_ids:
+        del snapshot['docs'][doc_id]
+    unknown_ids = [doc_id for doc_id in live_ids if doc_id not in snapshot['docs']]
+    if unknown_ids:
+        col_ref = get_db().collection(collection_name)
+        with fsm.track(collection_name, 'documents_par_ids') as measure:
+            for doc in get_db().get_all([col_ref.document(doc_id) for doc_id in unknown_ids]):
+                if doc.exists:
+                    doc_dict = doc.to_dict()
+                    measure.add_document(doc_dict)
+                    snapshot['docs'][doc.id] = doc_dict
+                    snapshot['watermark'] = _advance_watermark(snapshot['watermark'], doc_dict)
+    snapshot['last_id_scan'] = time.monotonic()
+    return len(deleted_ids) + len(unknown_ids)
+
+def _refresh_snapshot(collection_name: str, snapshot: dict) -> int:
+    """Synchronisation incrémentale d'un snapshot existant (delta + scan d'IDs si dû). Retourne le nombre de changements."""
+    changed = _apply_delta_sync(collection_name, snapshot)
+    if time.monotonic() - snapshot['last_id_scan'] >= DELETE_RECONCILE_INTERVAL_SECONDS:
+        changed += _reconcile_deleted_documents(collection_name, snapshot)
+    return changed
+
+def sync_collection_documents(collection_name: str) -> dict:
+    """
+    Retourne les documents de la collection ({doc_id: données}).
+    Premier appel : lecture complète, ou snapshot Parquet local servi immédiatement puis rafraîchi
+    en arrière-plan. Appels suivants (mode incrémental) : seuls les documents modifiés depuis
+    le dernier watermark sont lus, puis fusionnés dans le snapshot conservé.
+    """
+    with _get_snapshot_lock(collection_name):
+        snapshot = _collection_snapshots.get(collection_name)
+        if snapshot is None and FIRESTORE_INCREMENTAL_SYNC and PERSISTENT_SNAPSHOT_CACHE:
+            snapshot = _load_persisted_snapshot(collection_name)
+            if snapshot is not None:
+                _collection_snapshots[collection_name] = snapshot
+                _schedule_background_refresh(collection_name)
+                return dict(snapshot['docs'])
+        if snapshot is None or not FIRESTORE_INCREMENTAL_SYNC:
+            snapshot = _full_collection_scan(collection_name)
+            _collection_snapshots[collection_name] = snapshot
+            _schedule_snapshot_persist(collection_name)
+        elif _refresh_snapshot(collection_name, snapshot):
+            _schedule_snapshot_persist(collection_name)
+        return dict(snapshot['docs'])
+
+def _forget_snapshot_document(collection_name: str, doc_id: str, publish: bool = True):
+    """
+    Retire immédiatement un document supprimé du snapshot de sa collection.
+    publish: l'ID est joint à la prochaine invalidation publiée pour les autres réplicas.
+    """
+    if publish:
+        _record_deleted_document(collection_name, doc_id)
+    with _get_snapshot_lock(collection_name):
+        snapshot = _collection_snapshots.get(collection_name)
+        if snapshot is not None and snapshot['docs'].pop(doc_id, None) is not None:
+            _schedule_snapshot_persist(collection_name)
+
+# --- Cache persistant des snapshots sur disque (Parquet) ---
+# Chaque snapshot est écrit dans SNAPSHOT_CACHE_DIR/<collection>.parquet : une ligne par document
+# (ID + données encodées en JSON, les dates Firestore étant préservées), le watermark étant stocké
+# dans les métadonnées du schéma. Après un redémarrage, le snapshot est servi immédiatement et une
+# synchronisation incrémentale le met à jour en arrière-plan. Les écritures disque sont faites par
+# un thread dédié pour ne pas ralentir les lectures.
+_snapshot_io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="firestore_snapshot_io")
+
+def _snapshot_json_default(value):
+    """Encode les dates (horodatages Firestore) de façon réversible pour le JSON."""
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    return str(value)
+
+def _snapshot_json_object_hook(obj: dict):
+    """Décode les dates encodées par _snapshot_json_default."""
+    if len(obj) == 1 and '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+def _snapshot_path(collection_name: str) -> str:
+    return os.path.join(SNAPSHOT_CACHE_DIR, f"{collection_name}.parquet")
+
+def _persist_snapshot(collection_name: str, docs: dict, watermark):
+    """Écrit le snapshot d'une collection sur disque (écriture atomique via un fichier temporaire)."""
+    os.makedirs(SNAPSHOT_CACHE_DIR, exist_ok=True)
+    table = pa.table({
+        'doc_id': pa.array(list(docs.keys()), type=pa.string()),
+        'donnees_json': pa.array([json.dumps(doc_dict, default=_snapshot_json_default, ensure_ascii=False) for doc_dict in docs.values()], type=pa.string())
+    })
+    table = table.replace_schema_metadata({
+        'watermark': watermark.isoformat() if watermark else '',
+        'enregistre_le': datetime.now(timezone.utc).isoformat()
+    })
+    final_path = _snapshot_path(collection_name)
+    temp_path = final_path + ".tmp"
+    pq.write_table(table, temp_path, compression='zstd')
+    os.replace(temp_path, final_path)
+
+def _schedule_snapshot_persist(collection_name: str):
+    """Programme l'écriture sur disque du snapshot courant d'une collection."""
+    if not PERSISTENT_SNAPSHOT_CACHE:
+        return
+    snapshot = _collection_snapshots.get(collection_name)
+    if snapshot is None:
+        return
+    docs, watermark = dict(snapshot['docs']), snapshot['watermark']
+    def persist():
+        try:
+            _persist_snapshot(collection_name, docs, watermark)
+        except Exception as e:
+            print(f"DEBUG_FIRESTORE: Échec de l'écriture du snapshot de '{collection_name}' sur disque: {e}")
+    _snapshot_io_executor.submit(persist)
+
+def _load_persisted_snapshot(collection_name: str):
+    """Relit le snapshot Parquet d'une collection, ou None s'il est absent ou illisible."""
+    path = _snapshot_path(collection_name)
+    if not os.path.exists(path):
+        return None
+    try:
+        table = pq.read_table(path)
+        metadata = table.schema.metadata or {}
+        watermark_str = metadata.get(b'watermark', b'').decode('utf-8')
+        docs = {
+            doc_id: json.loads(doc_json, object_hook=_snapshot_json_object_hook)
+            for doc_id, doc_json in zip(table.column('doc_id').to_pylist(), table.column('donnees_json').to_pylist())
         }
-        if collection_name in numeric_cols_to_check:
-            for col in numeric_cols_to_check[collection_name]:
-                if col in df.columns:
-                    if 'Revenus' in col or 'Budget' in col:
-                        df[col] = df[col].apply(safe_cast_to_float)
-                    else:
-                        df[col] = df[col].apply(safe_cast_to_int)
+        # last_id_scan à -inf : le premier rafraîchissement réconcilie aussi les suppressions
+        return {'docs': docs, 'watermark': datetime.fromisoformat(watermark_str) if watermark_str else None, 'last_id_scan': float('-inf')}
+    except Exception as e:
+        print(f"DEBUG_FIRESTORE: Snapshot disque de '{collection_name}' illisible, lecture complète: {e}")
+        return None
+
+def _schedule_background_refresh(collection_name: str):
+    """Rafraîchit en arrière-plan un snapshot chargé depuis le disque, puis invalide le cache s'il a changé."""
+    def refresh():
+        try:
+            with _get_snapshot_lock(collection_name):
+                snapshot = _collection_snapshots.get(collection_name)
+                changed = _refresh_snapshot(collection_name, snapshot) if snapshot is not None else 0
+                if changed:
+                    _schedule_snapshot_persist(collection_name)
+            if changed:
+                _invalidate_local_collection_cache(collection_name)
+        except Exception as e:
+            print(f"DEBUG_FIRESTORE: Échec du rafraîchissement en arrière-plan de '{collection_name}': {e}")
+    threading.Thread(target=refresh, name=f"firestore_refresh_{collection_name}", daemon=True).start()
+
+def _with_sync_timestamp(document_data: dict) -> dict:
+    """Retourne une copie des données avec l'horodatage serveur utilisé par la synchronisation incrémentale."""
+    stamped = dict(document_data)
+    stamped[SYNC_TIMESTAMP_FIELD] = google.cloud.firestore.SERVER_TIMESTAMP
+    return stamped
+
+# --- Miroir temps réel des collections chaudes (mode optionnel) ---
+# Un listener on_snapshot par collection de REALTIME_MIRROR_COLLECTIONS maintient une copie
+# en mémoire des documents, partagée par toutes les sessions du processus. Les lectures de ces
+# collections sont alors servies depuis la mémoire, et les écritures faites par d'autres
+# utilisateurs ou réplicas y apparaissent sans rechargement complet.
+_realtime_mirrors = {}
+_realtime_mirrors_lock = threading.Lock()
+
+def _make_mirror_callback(collection_name: str):
+    """Construit le callback on_snapshot qui applique les changements reçus au miroir."""
+    def on_snapshot(col_snapshot, changes, read_time):
+        mirror = _realtime_mirrors[collection_name]
+        with fsm.track(collection_name, 'miroir_temps_reel') as measure, mirror['lock']:
+            measure.documents += len(changes)
+            for change in changes:
+                if change.type.name == 'REMOVED':
+                    mirror['docs'].pop(change.document.id, None)
+                else:
+                    mirror['docs'][change.document.id] = change.document.to_dict()
+            mirror['frame'] = None # Le DataFrame sera reconstruit à la prochaine lecture
+        mirror['ready'].set()
+        # Les caches dérivés (requêtes, agrégations...) de cette collection deviennent obsolètes
+        _invalidate_local_collection_cache(collection_name)
+    return on_snapshot
+
+def start_realtime_mirror(collection_names: list = None) -> list:
+    """
+    Attache les listeners on_snapshot aux collections demandées (par défaut REALTIME_MIRROR_COLLECTIONS).
+    Idempotent : une collection déjà suivie n'est pas ré-attachée. Retourne les collections suivies.
+    """
+    for collection_name in collection_names or REALTIME_MIRROR_COLLECTIONS:
+        with _realtime_mirrors_lock:
+            if collection_name in _realtime_mirrors:
+                continue
+            _realtime_mirrors[collection_name] = {
+                'docs': {}, 'frame': None, 'lock': threading.Lock(),
+                'ready': threading.Event(), 'watch': None, 'started_at': time.monotonic()
+            }
+        try:
+            watch = get_db().collection(collection_name).on_snapshot(_make_mirror_callback(collection_name))
+            _realtime_mirrors[collection_name]['watch'] = watch
+        except Exception as e:
+            print(f"DEBUG_FIRESTORE: Échec du listener temps réel pour '{collection_name}': {e}")
+            with _realtime_mirrors_lock:
+                _realtime_mirrors.pop(collection_name, None)
+    return list(_realtime_mirrors.keys())
+
+def stop_realtime_mirror():
+    """Détache tous les listeners temps réel et vide le miroir."""
+    with _realtime_mirrors_lock:
+        mirrors = list(_realtime_mirrors.items())
+        _realtime_mirrors.clear()
+    for collection_name, mirror in mirrors:
+        if mirror['watch'] is not None:
+            try:
+                mirror['watch'].unsubscribe()
+            except Exception as e:
+                print(f"DEBUG_FIRESTORE: Échec du détachement du listener '{collection_name}': {e}")
+
+def _get_mirror_dataframe(collection_name: str):
+    """
+    Retourne le DataFrame de la collection depuis le miroir temps réel, ou None si la collection
+    n'est pas suivie ou si son premier snapshot n'est pas arrivé à temps.
+    Le DataFrame est reconstruit une seule fois par série de changements reçus.
+    """
+    mirror = _realtime_mirrors.get(collection_name)
+    if mirror is None:
+        return None
+    # On n'attend le premier snapshot qu'une fois : passé le délai, on lit sans bloquer
+    remaining_wait = REALTIME_MIRROR_READY_TIMEOUT_SECONDS - (time.monotonic() - mirror['started_at'])
+    if not mirror['ready'].wait(max(0.0, remaining_wait)):
+        return None
+    with mirror['lock']:
+        if mirror['frame'] is None:
+            mirror['frame'] = _build_collection_dataframe(collection_name, mirror['docs'])
+        return mirror['frame'].copy()
+
+# --- Invalidation des caches entre réplicas (journal des changements) ---
+# Chaque invalidation après une écriture ajoute à CACHE_CHANGE_LOG_COLLECTION un petit enregistrement
+# (collection, version, réplica émetteur, IDs supprimés), écrit par un thread dédié pour ne pas
+# ralentir l'écriture. Chaque processus suit le journal par un listener on_snapshot, attaché à la
+# création du client (get_db), limité aux enregistrements postérieurs à son démarrage ; pour ceux
+# émis par un autre réplica, dans l'ordre où ils arrivent (dédupliqués par ID de document), il invalide
+# localement la collection (sans republier) : la relecture suivante est une synchronisation
+# incrémentale, et les IDs supprimés sont retirés du snapshot sans attendre le scan périodique.
+# Les enregistrements expirent via la politique TTL Firestore sur le champ 'Expire_Le'.
+REPLICA_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+_change_log_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="firestore_change_log")
+_pending_deleted_ids = {} # {collection: [IDs supprimés depuis la dernière publication]}
+_pending_deleted_ids_lock = threading.Lock()
+_applied_change_ids = OrderedDict() # IDs des enregistrements du journal déjà appliqués (redélivrances ignorées)
+_APPLIED_CHANGE_IDS_MAX = 10000
+_change_log_watch = None
+_change_log_watch_lock = threading.Lock()
+
+def _record_deleted_document(collection_name: str, doc_id: str):
+    """Mémorise un ID supprimé, joint à la prochaine invalidation publiée de sa collection."""
+    if not CACHE_CHANGE_LOG_ENABLED:
+        return
+    with _pending_deleted_ids_lock:
+        _pending_deleted_ids.setdefault(collection_name, []).append(doc_id)
+
+def _write_change_log_record(record: dict):
+    try:
+        with fsm.track(CACHE_CHANGE_LOG_COLLECTION, 'ajout') as measure:
+            get_db().collection(CACHE_CHANGE_LOG_COLLECTION).document().set(record)
+            measure.add_writes([record])
+    except Exception as e:
+        print(f"DEBUG_FIRESTORE: Échec de la publication de l'invalidation de '{record['Collection']}': {e}")
+
+def _publish_cache_invalidation(collection_name: str, version: int):
+    """Publie l'invalidation d'une collection dans le journal des changements (en arrière-plan)."""
+    if not CACHE_CHANGE_LOG_ENABLED:
+        return
+    with _pending_deleted_ids_lock:
+        deleted_ids = _pending_deleted_ids.pop(collection_name, [])
+    too_many = len(deleted_ids) > CACHE_CHANGE_LOG_MAX_DELETED_IDS
+    record = {
+        'Collection': collection_name,
+        'Version': version,
+        'Replica': REPLICA_ID,
+        'IDs_Supprimes': [] if too_many else deleted_ids,
+        'Reconcilier': too_many, # Trop d'IDs : les réplicas font un scan d'IDs
+        'Horodatage': google.cloud.firestore.SERVER_TIMESTAMP,
+        'Expire_Le': datetime.now(timezone.utc) + timedelta(hours=CACHE_CHANGE_LOG_TTL_HOURS)
+    }
+    _change_log_executor.submit(_write_change_log_record, record)
+
+def _apply_remote_invalidation(change_id: str, record: dict):
+    """
+    Applique localement une invalidation publiée par un autre réplica. Les enregistrements peuvent
+    arriver dans le désordre : chacun est appliqué, seule une redélivrance du même document est ignorée.
+    """
+    collection_name = record.get('Collection')
+    if not collection_name or record.get('Replica') == REPLICA_ID or change_id in _applied_change_ids:
+        return
+    _applied_change_ids[change_id] = True
+    if len(_applied_change_ids) > _APPLIED_CHANGE_IDS_MAX:
+        _applied_change_ids.popitem(last=False)
+    for doc_id in record.get('IDs_Supprimes') or []:
+        _forget_snapshot_document(collection_name, doc_id, publish=False)
+    if record.get('Reconcilier'):
+        with _get_snapshot_lock(collection_name):
+            snapshot = _collection_snapshots.get(collection_name)
+            if snapshot is not None:
+                snapshot['last_id_scan'] = float('-inf') # Scan d'IDs à la prochaine synchronisation
+    _invalidate_local_collection_cache(collection_name)
+
+def _on_change_log_snapshot(col_snapshot, changes, read_time):
+    with fsm.track(CACHE_CHANGE_LOG_COLLECTION, 'journal_invalidation') as measure:
+        measure.documents += len(changes)
+        for change in changes:
+            if change.type.name == 'ADDED':
+                _apply_remote_invalidation(change.document.id, change.document.to_dict() or {})
+
+def start_change_log_listener() -> bool:
+    """
+    Attache (une seule fois par processus) le listener du journal des changements.
+    Retourne True si le listener est actif.
+    """
+    global _change_log_watch
+    if not CACHE_CHANGE_LOG_ENABLED:
+        return False
+    with _change_log_watch_lock:
+        if _change_log_watch is not None:
+            return True
+        # Marge d'une minute pour l'écart d'horloge avec le serveur : une invalidation en trop est sans effet
+        since = datetime.now(timezone.utc) - timedelta(minutes=1)
+        try:
+            query = get_db().collection(CACHE_CHANGE_LOG_COLLECTION).where(
+                filter=google.cloud.firestore.FieldFilter('Horodatage', '>=', since)
+            )
+            _change_log_watch = query.on_snapshot(_on_change_log_snapshot)
+        except Exception as e:
+            print(f"DEBUG_FIRESTORE: Échec du listener du journal des changements : {e}")
+            return False
+    return True
+
+def stop_change_log_listener():
+    """Détache le listener du journal des changements."""
+    global _change_log_watch
+    with _change_log_watch_lock:
+        watch, _change_log_watch = _change_log_watch, None
+    if watch is not None:
+        try:
+            watch.unsubscribe()
+        except Exception as e:
+            print(f"DEBUG_FIRESTORE: Échec du détachement du listener du journal des changements : {e}")
 
-        return df
+# --- Fonctions d'interaction avec Firestore ---
+
+def get_dataframe_from_collection(collection_name: str, fields: list = None) -> pd.DataFrame:
+    """
+    Lit une collection Firestore et la retourne sous forme de DataFrame Pandas.
+    Le cache est indexé par (collection, version) : une écriture sur une autre collection
+    ne provoque pas de relecture de celle-ci.
+    En mode miroir temps réel, les collections suivies sont lues directement depuis la mémoire.
+    fields: projection (Firestore select) ; seuls ces champs sont téléchargés. Utiliser
+    get_document_by_id pour relire le document complet d'une ligne.
+    """
+    if fields:
+        return query_collection(collection_name, fields=fields)
+    with fsm.cache_lookup(collection_name, 'collection'):
+        if FIRESTORE_REALTIME_MIRROR and collection_name in REALTIME_MIRROR_COLLECTIONS:
+            start_realtime_mirror()
+            mirrored_df = _get_mirror_dataframe(collection_name)
+            if mirrored_df is not None:
+                return mirrored_df
+        return _get_cached_collection_dataframe(collection_name)
+
+# --- Cache des collections : chargement unique (single-flight) et stale-while-revalidate ---
+# Les DataFrames complets sont partagés par toutes les sessions du processus, indexés par collection
+# avec la version et l'heure de leur chargement. Une seule lecture par (collection, version) est en
+# vol à la fois : les autres appelants attendent son résultat au lieu de relire Firestore.
+# À l'expiration du TTL, l'ancien DataFrame est servi immédiatement et une seule relecture est lancée
+# en arrière-plan. Après une écriture (nouvelle version), l'entrée est évincée et la relecture est
+# bloquante (mais toujours unique), pour que l'auteur de l'écriture voie ses propres modifications.
+_collection_frames = {}
+_collection_frames_lock = threading.Lock()
+_collection_flights = {}
+_collection_refreshes = set() # Collections dont un rafraîchissement d'arrière-plan est en cours
+
+def _single_flight(key, loader):
+    """
+    Exécute loader() une seule fois pour tous les appelants simultanés d'une même clé et
+    retourne (ou lève) son résultat à chacun d'eux.
+    """
+    with _collection_frames_lock:
+        flight = _collection_flights.get(key)
+        is_leader = flight is None
+        if is_leader:
+            flight = Future()
+            _collection_flights[key] = flight
+    if not is_leader:
+        return flight.result()
+    try:
+        flight.set_result(loader())
+    except Exception as e:
+        flight.set_exception(e)
+    finally:
+        with _collection_frames_lock:
+            _collection_flights.pop(key, None)
+    return flight.result()
+
+def _fetch_collection_dataframe(collection_name: str, version: int) -> pd.DataFrame:
+    """Lit une collection (synchronisation incrémentale) et enregistre son DataFrame dans le cache partagé."""
+    # L'ID réel du document Firestore (doc.id) sert de clé au snapshot, mais pour la compatibilité
+    # avec la structure GSheet, nous utilisons les IDs contenus dans les documents eux-mêmes.
+    docs = sync_collection_documents(collection_name)
+    df = _build_collection_dataframe(collection_name, docs)
+    with _collection_frames_lock:
+        if get_collection_version(collection_name) == version: # Une écriture pendant la lecture rend ce résultat obsolète
+            _collection_frames[collection_name] = {'df': df, 'version': version, 'loaded_at': time.monotonic()}
+    return df
+
+def _refresh_collection_in_background(collection_name: str, version: int):
+    """Relit une collection expirée sur un thread démon ; l'ancien DataFrame reste servi en cas d'échec."""
+    def refresh():
+        try:
+            _single_flight((collection_name, version), lambda: _fetch_collection_dataframe(collection_name, version))
+        except Exception as e:
+            print(f"DEBUG_FIRESTORE: Échec du rafraîchissement en arrière-plan de '{collection_name}': {e}")
+            with _collection_frames_lock:
+                entry = _collection_frames.get(collection_name)
+                if entry is not None and entry['version'] == version: # Nouvel essai dans COLLECTION_REFRESH_RETRY_SECONDS
+                    entry['loaded_at'] = time.monotonic() - COLLECTION_CACHE_TTL_SECONDS + COLLECTION_REFRESH_RETRY_SECONDS
+        finally:
+            with _collection_frames_lock:
+                _collection_refreshes.discard(collection_name)
+    threading.Thread(target=refresh, name=f"refresh_{collection_name}", daemon=True).start()
+
+def _get_cached_collection_dataframe(collection_name: str) -> pd.DataFrame:
+    """Retourne (une copie du) DataFrame d'une collection depuis le cache partagé, en le chargeant si nécessaire."""
+    version = get_collection_version(collection_name)
+    start_refresh = False
+    with _collection_frames_lock:
+        entry = _collection_frames.get(collection_name)
+        df = entry['df'] if entry is not None and entry['version'] == version else None
+        if df is not None and time.monotonic() - entry['loaded_at'] >= COLLECTION_CACHE_TTL_SECONDS and collection_name not in _collection_refreshes:
+            _collection_refreshes.add(collection_name)
+            start_refresh = True
+    if df is not None:
+        if start_refresh:
+            _refresh_collection_in_background(collection_name, version)
+        return df.copy() # Les appelants peuvent modifier leur DataFrame sans altérer le cache partagé
+    try:
+        return _single_flight((collection_name, version), lambda: _fetch_collection_dataframe(collection_name, version)).copy()
     except Exception as e:
         st.error(f"Erreur lors de la lecture de la collection '{collection_name}': {e}")
         return pd.DataFrame() # Retourne un DataFrame vide en cas d'erreur grave
 
+_COLUMN_CASTERS = {
+    'int': cast_series_to_int,
+    'float': cast_series_to_float,
+    'bool': parse_boolean_series,
+    'category': cast_series_to_category,
+    'string': cast_series_to_string,
+    'text': cast_series_to_text
+}
+
+def normalize_dataframe_schema(collection_name: str, df: pd.DataFrame, fields: list = None, warn_missing: bool = True) -> pd.DataFrame:
+    """
+    Normalise un DataFrame selon le schéma de config.py : un seul reindex sur EXPECTED_COLUMNS
+    (colonnes manquantes ajoutées vides, ordre imposé), puis conversion vectorisée des types de COLUMN_TYPES.
+    fields: si fourni (projection), seules ces colonnes attendues sont conservées.
+    """
+    if collection_name in EXPECTED_COLUMNS:
+        expected_columns = EXPECTED_COLUMNS[collection_name]
+        if fields:
+            expected_columns = [col for col in expected_columns if col in fields]
+        missing_cols = [col for col in expected_columns if col not in df.columns]
+        if missing_cols and warn_missing and not df.empty:
+            st.warning(f"Attention: Les champs suivants sont manquants dans la collection '{collection_name}': {', '.join(missing_cols)}. Ils seront ajoutés avec des valeurs vides.")
+        df = df.reindex(columns=expected_columns, fill_value='')
+
+    for col, col_type in COLUMN_TYPES.get(collection_name, {}).items():
+        if col in df.columns:
+            df[col] = _COLUMN_CASTERS[col_type](df[col])
+    return df
+
+def _build_collection_dataframe(collection_name: str, docs: dict, fields: list = None) -> pd.DataFrame:
+    """
+    Construit le DataFrame d'une collection à partir de ses documents ({doc_id: données}),
+    puis le normalise selon le schéma (voir normalize_dataframe_schema).
+    """
+    return normalize_dataframe_schema(collection_name, pd.DataFrame.from_records(list(docs.values())), fields)
+
+# --- Requêtes filtrées, triées et limitées côté serveur ---
+# Les prédicats sont exécutés par Firestore : seuls les documents affichés sont lus.
+# Les résultats sont mis en cache par (requête, version de la collection).
+
+_QUERY_OPERATORS = {
+    '==': lambda col, value: col == value,
+    '!=': lambda col, value: col != value,
+    '<': lambda col, value: col < value,
+    '<=': lambda col, value: col <= value,
+    '>': lambda col, value: col > value,
+    '>=': lambda col, value: col >= value,
+    'in': lambda col, value: col.isin(value),
+    'not-in': lambda col, value: ~col.isin(value),
+    'array_contains': lambda col, value: col.apply(lambda cell: isinstance(cell, list) and value in cell),
+}
+
+def _normalize_order_by(order_by) -> list:
+    """Normalise order_by ('champ', ('champ', 'DESC') ou liste de ceux-ci) en liste de (champ, direction)."""
+    if not order_by:
+        return []
+    if isinstance(order_by, (str, tuple)):
+        order_by = [order_by]
+    normalized = []
+    for item in order_by:
+        if isinstance(item, str):
+            normalized.append((item, 'ASC'))
+        else:
+            normalized.append((item[0], str(item[1]).upper()))
+    return normalized
+
+def _build_firestore_query(collection_name: str, where: list = None, order_by=None, limit: int = None, fields: list = None):
+    """Construit la requête Firestore correspondant aux paramètres de query_collection."""
+    query = get_db().collection(collection_name)
+    for field, op, value in where or []:
+        query = query.where(filter=google.cloud.firestore.FieldFilter(field, op, value))
+    for field, direction in _normalize_order_by(order_by):
+        query = query.order_by(field, direction=google.cloud.firestore.Query.DESCENDING if direction == 'DESC' else google.cloud.firestore.Query.ASCENDING)
+    if fields:
+        query = query.select(list(fields))
+    if limit:
+        query = query.limit(limit)
+    return query
+
+def _apply_query_in_memory(df: pd.DataFrame, where: list = None, order_by=None, limit: int = None, fields: list = None) -> pd.DataFrame:
+    """Applique les mêmes paramètres de requête à un DataFrame déjà en mémoire (miroir temps réel)."""
+    for field, op, value in where or []:
+        if field not in df.columns:
+            return df.iloc[0:0]
+        df = df[_QUERY_OPERATORS[op](df[field], value)]
+    sort_keys = [(field, direction) for field, direction in _normalize_order_by(order_by) if field in df.columns]
+    if sort_keys:
+        df = df.sort_values([field for field, _ in sort_keys], ascending=[direction != 'DESC' for _, direction in sort_keys])
+    if limit:
+        df = df.head(limit)
+    if fields:
+        df = df[[col for col in df.columns if col in fields]]
+    return df.reset_index(drop=True)
+
+def query_collection(collection_name: str, where: list = None, order_by=None, limit: int = None, fields: list = None) -> pd.DataFrame:
+    """
+    Exécute une requête filtrée côté serveur et retourne le résultat sous forme de DataFrame.
+    where: liste de tuples (champ, opérateur, valeur), ex. [('Statut_Production', '==', 'Terminé')].
+    order_by: nom de champ, tuple (champ, 'ASC'|'DESC') ou liste de ceux-ci.
+    limit: nombre maximal de documents retournés.
+    fields: projection (liste des champs à lire) ; les autres colonnes sont omises.
+    Note : combiner un filtre d'inégalité et un tri sur un autre champ nécessite un index composite Firestore.
+    """
+    with fsm.cache_lookup(collection_name, 'requete'):
+        if FIRESTORE_REALTIME_MIRROR and collection_name in REALTIME_MIRROR_COLLECTIONS:
+            start_realtime_mirror()
+            mirrored_df = _get_mirror_dataframe(collection_name)
+            if mirrored_df is not None:
+                return _apply_query_in_memory(mirrored_df, where, order_by, limit, fields)
+        return _run_collection_query(collection_name, where, order_by, limit, fields, get_collection_version(collection_name))
+
+@st.cache_data(ttl=600) # Mise en cache par requête pendant 10 minutes
+def _run_collection_query(collection_name: str, where: list, order_by, limit: int, fields: list, version: int) -> pd.DataFrame:
+    """Exécute la requête sur Firestore. version: version de cache de la collection (clé de cache uniquement)."""
+    try:
+        query = _build_firestore_query(collection_name, where, order_by, limit, fields)
+        with fsm.track(collection_name, 'requete') as measure:
+            docs = {doc.id: doc.to_dict() for doc in query.stream()}
+            measure.add_documents(docs.values())
+        return _build_collection_dataframe(collection_name, docs, fields)
+    except Exception as e:
+        st.error(f"Erreur lors de la requête sur la collection '{collection_name}': {e}")
+        return pd.DataFrame()
+
+# --- Valeurs distinctes (options des filtres) ---
+# Les options d'un filtre de sélection sont les valeurs distinctes de quelques champs. Elles sont
+# calculées une fois par version de collection et partagées par toutes les sessions du processus :
+# depuis le DataFrame si la collection est déjà en mémoire, sinon en parcourant la collection par
+# pages projetées sur ces seuls champs (la mémoire est bornée par la page, pas par la collection).
+_distinct_values = {} # {(collection, champs): (version, {champ: [valeurs]})}
+_distinct_values_lock = threading.Lock()
+
+def _collect_distinct_values(values: dict, df: pd.DataFrame):
+    for field, field_values in values.items():
+        if field in df.columns:
+            field_values.update(str(value) for value in df[field].dropna().unique() if str(value) != '')
+
+def get_distinct_values(collection_name: str, fields: list) -> dict:
+    """Retourne {champ: liste triée des valeurs distinctes non vides} pour les champs demandés de la collection."""
+    cache_key = (collection_name, tuple(fields))
+    version = get_collection_version(collection_name)
+    with _distinct_values_lock:
+        entry = _distinct_values.get(cache_key)
+    fsm.record_cache(collection_name, 'valeurs_distinctes', hit=entry is not None and entry[0] == version)
+    if entry is not None and entry[0] == version:
+        return {field: list(field_values) for field, field_values in entry[1].items()}
+    values = {field: set() for field in fields}
+    try:
+        if _is_collection_in_memory(collection_name):
+            _collect_distinct_values(values, get_dataframe_from_collection(collection_name))
+        else:
+            cursor = None
+            while True:
+                page_df, cursor = _fetch_collection_page(collection_name, DISTINCT_VALUES_PAGE_SIZE, FieldPath.document_id(), False, cursor, fields)
+                _collect_distinct_values(values, page_df)
+                if cursor is None:
+                    break
+    except Exception as e:
+        st.error(f"Erreur lors du calcul des valeurs distinctes de la collection '{collection_name}': {e}")
+        return {field: [] for field in fields}
+    result = {field: sorted(field_values) for field, field_values in values.items()}
+    with _distinct_values_lock:
+        _distinct_values[cache_key] = (version, result)
+    return {field: list(field_values) for field, field_values in result.items()}
+
+# --- Préchargement parallèle des collections d'une page ---
+
+def prefetch_collections(collection_names: list) -> dict:
+    """
+    Charge en parallèle (pool de threads) les collections dont une page a besoin et remplit le cache.
+    Retourne un dictionnaire {nom_collection: DataFrame}. Les appels get_all_* suivants de la même
+    exécution trouvent ensuite leurs données en cache au lieu de lancer des lectures en série.
+    """
+    unique_names = list(dict.fromkeys(collection_names))
+    if not unique_names:
+        return {}
+    # Le contexte de la session est propagé aux threads pour que st.cache_data et st.error y fonctionnent
+    script_ctx = get_script_run_ctx()
+    def load(collection_name: str) -> pd.DataFrame:
+        if script_ctx is not None:
+            add_script_run_ctx(threading.current_thread(), script_ctx)
+        return get_dataframe_from_collection(collection_name)
+    with ThreadPoolExecutor(max_workers=min(PREFETCH_MAX_WORKERS, len(unique_names)), thread_name_prefix="firestore_prefetch_collections") as executor:
+        futures = {collection_name: executor.submit(load, collection_name) for collection_name in unique_names}
+    return {collection_name: future.result() for collection_name, future in futures.items()}
+
+# --- Projection des vues liste et lecture par ID ---
+
+def list_view_fields(collection_name: str) -> list:
+    """Retourne les champs attendus d'une collection, sans ses champs texte volumineux (LARGE_TEXT_FIELDS)."""
+    large_fields = LARGE_TEXT_FIELDS.get(collection_name, [])
+    return [col for col in EXPECTED_COLUMNS.get(collection_name, []) if col not in large_fields]
+
+def get_document_by_id(collection_name: str, doc_id: str):
+    """
+    Lit un document complet par son ID et le retourne sous forme de ligne (pd.Series) aux colonnes
+    normalisées, ou None s'il n'existe pas. Utilisé pour ouvrir une ligne d'une vue liste projetée.
+    """
+    if not doc_id:
+        return None
+    if FIRESTORE_REALTIME_MIRROR and collection_name in REALTIME_MIRROR_COLLECTIONS:
+        start_realtime_mirror()
+        mirror = _realtime_mirrors.get(collection_name)
+        if mirror is not None and mirror['ready'].is_set():
+            with mirror['lock']:
+                doc_dict = mirror['docs'].get(doc_id)
+            fsm.record_cache(collection_name, 'document_par_id', hit=True)
+            return _build_collection_dataframe(collection_name, {doc_id: doc_dict}).iloc[0] if doc_dict is not None else None
+    with fsm.cache_lookup(collection_name, 'document_par_id'):
+        return _load_document_by_id(collection_name, doc_id, get_collection_version(collection_name))
+
+@st.cache_data(ttl=600) # Mise en cache des documents lus par ID pendant 10 minutes
+def _load_document_by_id(collection_name: str, doc_id: str, version: int):
+    """Lit un document sur Firestore. version: version de cache de la collection (clé de cache uniquement)."""
+    try:
+        with fsm.track(collection_name, 'document_par_id') as measure:
+            doc = get_db().collection(collection_name).document(doc_id).get()
+            measure.add_document(doc.to_dict() if doc.exists else None)
+        if not doc.exists:
+            return None
+        return _build_collection_dataframe(collection_name, {doc.id: doc.to_dict()}).iloc[0]
+    except Exception as e:
+        st.error(f"Erreur lors de la lecture du document '{doc_id}' de la collection '{collection_name}': {e}")
+        return None
+
+
+# --- Lecture indexée par ID : get_by_id / get_many_by_ids ---
+# Un index {ID métier: enregistrement} est construit une seule fois par version de collection, à
+# partir du DataFrame en cache, et partagé par toutes les sessions du processus : une recherche
+# coûte un accès de dictionnaire au lieu d'un masque booléen sur tout le DataFrame. Pour une liste
+# d'IDs d'une collection qui n'est pas encore en mémoire (ex. ID_Morceaux_Lies), les documents sont
+# lus directement par un get_all multi-documents (l'ID de document vaut l'ID métier).
+_id_indexes = {} # {collection: (version, {id: enregistrement})}
+_id_indexes_lock = threading.Lock()
+
+def _collection_id_field(collection_name: str) -> str:
+    """Champ identifiant d'une collection (première colonne d'EXPECTED_COLUMNS)."""
+    return EXPECTED_COLUMNS[collection_name][0]
+
+def _is_collection_in_memory(collection_name: str) -> bool:
+    """Indique si la collection peut être indexée sans lecture réseau (index à jour, snapshot ou miroir prêt)."""
+    with _id_indexes_lock:
+        entry = _id_indexes.get(collection_name)
+        if entry is not None and entry[0] == get_collection_version(collection_name):
+            return True
+    mirror = _realtime_mirrors.get(collection_name)
+    return collection_name in _collection_snapshots or (mirror is not None and mirror['ready'].is_set())
+
+def _get_id_index(collection_name: str) -> dict:
+    """Retourne l'index {ID: enregistrement} de la collection, reconstruit si sa version a changé."""
+    version = get_collection_version(collection_name)
+    with _id_indexes_lock:
+        entry = _id_indexes.get(collection_name)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+    df = get_dataframe_from_collection(collection_name)
+    id_field = _collection_id_field(collection_name)
+    index = {} if df.empty or id_field not in df.columns else {record[id_field]: record for record in df.to_dict('records')}
+    with _id_indexes_lock:
+        _id_indexes[collection_name] = (version, index)
+    return index
+
+def _split_ids(ids) -> list:
+    """Accepte une liste d'IDs ou une chaîne séparée par des virgules ; retire les vides et doublons."""
+    if isinstance(ids, str):
+        ids = ids.split(',')
+    return list(dict.fromkeys(str(doc_id).strip() for doc_id in ids if doc_id is not None and str(doc_id).strip()))
+
+def get_by_id(collection_name: str, entity_id: str):
+    """
+    Retourne une copie de l'enregistrement (dict) d'ID entity_id de la collection, ou None s'il n'existe pas.
+    L'index est partagé par tout le processus : l'appelant peut modifier la copie sans l'altérer.
+    """
+    if not entity_id:
+        return None
+    record = _get_id_index(collection_name).get(entity_id)
+    return dict(record) if record is not None else None
+
+def get_many_by_ids(collection_name: str, ids) -> dict:
+    """
+    Retourne {ID: enregistrement} (copies) pour les IDs trouvés, dans l'ordre demandé.
+    ids: liste d'IDs ou chaîne séparée par des virgules (ex. ID_Morceaux_Lies).
+    Servi par l'index si la collection est en mémoire, sinon par un get_all Firestore (mis en cache).
+    """
+    ids = _split_ids(ids)
+    if not ids:
+        return {}
+    if _is_collection_in_memory(collection_name):
+        index = _get_id_index(collection_name)
+        return {entity_id: dict(index[entity_id]) for entity_id in ids if entity_id in index}
+    with fsm.cache_lookup(collection_name, 'documents_par_ids'):
+        return _load_documents_by_ids(collection_name, tuple(ids), get_collection_version(collection_name))
+
+@st.cache_data(ttl=600) # Mise en cache des lectures multi-documents pendant 10 minutes
+def _load_documents_by_ids(collection_name: str, ids: tuple, version: int) -> dict:
+    """Lit plusieurs documents en un seul get_all. version: version de cache de la collection (clé de cache uniquement)."""
+    try:
+        col_ref = get_db().collection(collection_name)
+        with fsm.track(collection_name, 'documents_par_ids') as measure:
+            docs = {doc.id: doc.to_dict() for doc in get_db().get_all([col_ref.document(entity_id) for entity_id in ids]) if doc.exists}
+            measure.add_documents(docs.values())
+        records = _build_collection_dataframe(collection_name, docs).to_dict('records') if docs else []
+        id_field = _collection_id_field(collection_name)
+        by_id = {record.get(id_field) or doc_id: record for doc_id, record in zip(docs.keys(), records)}
+        return {entity_id: by_id[entity_id] for entity_id in ids if entity_id in by_id}
+    except Exception as e:
+        st.error(f"Erreur lors de la lecture de documents par ID dans la collection '{collection_name}': {e}")
+        return {}
+
+def lookup_field(collection_name: str, entity_id: str, field: str, default=None):
+    """
+    Retourne la valeur de field pour l'entité entity_id, ou default si l'entité ou le champ est absent,
+    ou si la valeur est manquante (None, NaN ou pd.NA des colonnes numériques et catégorielles).
+    """
+    if not entity_id:
+        return default
+    record = _get_id_index(collection_name).get(entity_id) # Lecture seule : pas de copie
+    if record is None:
+        return default
+    value = record.get(field)
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return default
+    return value
+
+# --- Pagination par curseurs (start_after) ---
+# Une page est lue avec un tri stable (champ de tri puis ID de document) et une limite de
+# page_size + 1 documents : le document supplémentaire indique s'il existe une page suivante.
+# Le curseur d'une page est le couple (valeur du champ de tri, ID du document) de sa dernière ligne.
+# Les pages sont gardées dans un petit cache LRU du processus, indexé par version de collection,
+# ce qui permet aussi de précharger la page suivante depuis un thread d'arrière-plan.
+_page_cache = OrderedDict()
+_page_cache_lock = threading.Lock()
+_page_prefetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="firestore_prefetch")
+
+def _fetch_collection_page(collection_name: str, page_size: int, order_by: str, descending: bool, cursor, fields) -> tuple:
+    """Lit une page sur Firestore et retourne (DataFrame, curseur de la page suivante ou None)."""
+    direction = google.cloud.firestore.Query.DESCENDING if descending else google.cloud.firestore.Query.ASCENDING
+    doc_id_path = FieldPath.document_id()
+    col_ref = get_db().collection(collection_name)
+    query = col_ref.order_by(order_by, direction=direction)
+    if order_by != doc_id_path:
+        query = query.order_by(doc_id_path, direction=direction) # Départage stable des valeurs égales
+    if cursor is not None:
+        cursor_value, cursor_doc_id = cursor
+        cursor_fields = {doc_id_path: col_ref.document(cursor_doc_id)}
+        if order_by != doc_id_path:
+            cursor_fields[order_by] = cursor_value
+        query = query.start_after(cursor_fields)
+    if fields:
+        query = query.select(list(dict.fromkeys(list(fields) + ([order_by] if order_by != doc_id_path else []))))
+    with fsm.track(collection_name, 'page') as measure:
+        docs = {doc.id: doc.to_dict() for doc in query.limit(page_size + 1).stream()}
+        measure.add_documents(docs.values())
+    next_cursor = None
+    if len(docs) > page_size:
+        page_ids = list(docs.keys())[:page_size]
+        docs = {doc_id: docs[doc_id] for doc_id in page_ids}
+        last_id = page_ids[-1]
+        next_cursor = (docs[last_id].get(order_by), last_id)
+    return _build_collection_dataframe(collection_name, docs, fields), next_cursor
+
+def _get_cached_page(page_key: tuple):
+    """Retourne une page du cache LRU si elle existe et n'a pas expiré."""
+    with _page_cache_lock:
+        entry = _page_cache.get(page_key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > PAGE_CACHE_TTL_SECONDS:
+            del _page_cache[page_key]
+            return None
+        _page_cache.move_to_end(page_key)
+        return entry[1]
+
+def _store_cached_page(page_key: tuple, page: tuple):
+    """Enregistre une page dans le cache LRU en évinçant les plus anciennes au-delà de la limite."""
+    with _page_cache_lock:
+        _page_cache[page_key] = (time.monotonic(), page)
+        _page_cache.move_to_end(page_key)
+        while len(_page_cache) > PAGE_CACHE_MAX_ENTRIES:
+            _page_cache.popitem(last=False)
+
+def _page_cache_key(collection_name: str, page_size: int, order_by: str, descending: bool, cursor, fields) -> tuple:
+    return (collection_name, get_collection_version(collection_name), page_size, order_by, descending, cursor, tuple(fields) if fields else None)
+
+def get_collection_page(collection_name: str, page_size: int = 50, order_by: str = None, descending: bool = False, cursor=None, fields: list = None) -> tuple:
+    """
+    Retourne une page de la collection sous forme de (DataFrame, curseur de la page suivante).
+    order_by: champ de tri (par défaut l'ID de document). cursor: curseur retourné par la page précédente
+    (None pour la première page). Le curseur suivant vaut None sur la dernière page.
+    """
+    order_by = order_by or FieldPath.document_id()
+    page_key = _page_cache_key(collection_name, page_size, order_by, descending, cursor, fields)
+    page = _get_cached_page(page_key)
+    fsm.record_cache(collection_name, 'page', hit=page is not None)
+    if page is not None:
+        return page[0].copy(), page[1]
+    try:
+        page = _fetch_collection_page(collection_name, page_size, order_by, descending, cursor, fields)
+        _store_cached_page(page_key, page)
+        return page[0].copy(), page[1]
+    except Exception as e:
+        st.error(f"Erreur lors de la lecture paginée de la collection '{collection_name}': {e}")
+        return pd.DataFrame(), None
+
+def prefetch_collection_page(collection_name: str, page_size: int = 50, order_by: str = None, descending: bool = False, cursor=None, fields: list = None):
+    """Précharge en arrière-plan la page désignée par le curseur, pour un affichage immédiat au clic suivant."""
+    order_by = order_by or FieldPath.document_id()
+    page_key = _page_cache_key(collection_name, page_size, order_by, descending, cursor, fields)
+    if _get_cached_page(page_key) is not None:
+        return
+    def prefetch():
+        try:
+            _store_cached_page(page_key, _fetch_collection_page(collection_name, page_size, order_by, descending, cursor, fields))
+        except Exception as e:
+            print(f"DEBUG_FIRESTORE: Échec du préchargement d'une page de '{collection_name}': {e}")
+    _page_prefetch_executor.submit(prefetch)
+
+_AGGREGATION_FUNCTIONS = ('count', 'sum', 'avg')
+
+def aggregate_collection(collection_name: str, aggregations: list, where: list = None) -> dict:
+    """
+    Exécute une requête d'agrégation Firestore (count, sum, avg), éventuellement filtrée, sans lire les documents.
+    aggregations: liste de tuples (fonction, champ, alias), ex. [('count', None, 'total'), ('sum', 'Ecoutes_Totales', 'ecoutes')].
+    Retourne un dictionnaire {alias: valeur}. Les résultats sont mis en cache par requête et par version de collection.
+    """
+    with fsm.cache_lookup(collection_name, 'agregation'):
+        return _run_aggregation_query(collection_name, [tuple(agg) for agg in aggregations], where, get_collection_version(collection_name))
+
+@st.cache_data(ttl=600) # Mise en cache des agrégations pendant 10 minutes
+def _run_aggregation_query(collection_name: str, aggregations: list, where: list, version: int) -> dict:
+    """Exécute la requête d'agrégation. version: version de cache de la collection (clé de cache uniquement)."""
+    try:
+        aggregation_query = _build_firestore_query(collection_name, where)
+        for function, field, alias in aggregations:
+            if function not in _AGGREGATION_FUNCTIONS:
+                raise ValueError(f"Fonction d'agrégation non supportée : '{function}'")
+            # Le premier appel transforme la requête en AggregationQuery, les suivants s'y ajoutent
+            if function == 'count':
+                aggregation_query = aggregation_query.count(alias=alias)
+            else:
+                aggregation_query = getattr(aggregation_query, function)(field, alias=alias)
+        results = {}
+        with fsm.track(collection_name, 'agregation') as measure:
+            measure.documents += 1 # Facturation : une lecture par tranche de 1000 entrées d'index parcourues
+            for result_set in aggregation_query.get():
+                for result in result_set:
+                    results[result.alias] = result.value
+        # avg retourne None sur un ensemble vide, sum retourne 0
+        return {alias: results.get(alias, 0 if function != 'avg' else None) for function, _, alias in aggregations}
+    except Exception as e:
+        st.error(f"Erreur lors de l'agrégation de la collection '{collection_name}': {e}")
+        return {alias: 0 if function != 'avg' else None for function, _, alias in aggregations}
+
+def count_collection(collection_name: str, where: list = None) -> int:
+    """Retourne le nombre de documents (éventuellement filtrés) via une requête d'agrégation, sans lire les documents."""
+    return int(aggregate_collection(collection_name, [('count', None, 'total')], where)['total'] or 0)
+
+def sum_collection_field(collection_name: str, field: str, where: list = None) -> float:
+    """Retourne la somme d'un champ numérique sur la collection (éventuellement filtrée) via une requête d'agrégation."""
+    return aggregate_collection(collection_name, [('sum', field, 'somme')], where)['somme'] or 0
+
+def avg_collection_field(collection_name: str, field: str, where: list = None):
+    """Retourne la moyenne d'un champ numérique sur la collection (éventuellement filtrée), ou None si aucun document."""
+    return aggregate_collection(collection_name, [('avg', field, 'moyenne')], where)['moyenne']
+
+def count_collection_by_values(collection_name: str, field: str, values: list) -> dict:
+    """Retourne {valeur: nombre de documents où field == valeur}, une requête de comptage (mise en cache) par valeur."""
+    return {value: count_collection(collection_name, [(field, '==', value)]) for value in values}
+
+# --- Écritures unitaires ---
 
 def add_document_to_collection(collection_name: str, document_data: dict, doc_id: str = None) -> bool:
     """
@@ -114,12 +1200,14 @@ def add_document_to_collection(collection_name: str, document_data: dict, doc_id
     Si doc_id est fourni, il sera utilisé comme ID du document, sinon Firestore en générera un.
     """
     try:
-        col_ref = db.collection(collection_name)
-        if doc_id:
-            col_ref.document(doc_id).set(document_data)
-        else:
-            col_ref.add(document_data)
-        st.cache_data.clear() # Invalider le cache après une écriture
+        col_ref = get_db().collection(collection_name)
+        with fsm.track(collection_name, 'ajout') as measure:
+            if doc_id:
+                col_ref.document(doc_id).set(_with_sync_timestamp(document_data))
+            else:
+                col_ref.add(_with_sync_timestamp(document_data))
+            measure.add_writes([document_data])
+        invalidate_collection_cache(collection_name) # Invalider uniquement le cache de cette collection
         return True
     except Exception as e:
         st.error(f"Erreur lors de l'ajout du document à la collection '{collection_name}': {e}")
@@ -132,8 +1220,10 @@ def update_document_in_collection(collection_name: str, doc_id: str, updates: di
     updates: Dictionnaire des champs à mettre à jour.
     """
     try:
-        db.collection(collection_name).document(doc_id).update(updates)
-        st.cache_data.clear() # Invalider le cache après une écriture
+        with fsm.track(collection_name, 'mise_a_jour') as measure:
+            get_db().collection(collection_name).document(doc_id).update(_with_sync_timestamp(updates))
+            measure.add_writes([updates])
+        invalidate_collection_cache(collection_name) # Invalider uniquement le cache de cette collection
         return True
     except Exception as e:
         st.error(f"Erreur lors de la mise à jour du document dans la collection '{collection_name}': {e}")
@@ -145,13 +1235,122 @@ def delete_document_from_collection(collection_name: str, doc_id: str) -> bool:
     doc_id: L'ID du document à supprimer.
     """
     try:
-        db.collection(collection_name).document(doc_id).delete()
-        st.cache_data.clear() # Invalider le cache après une suppression
+        with fsm.track(collection_name, 'suppression') as measure:
+            get_db().collection(collection_name).document(doc_id).delete()
+            measure.add_writes([None])
+        _forget_snapshot_document(collection_name, doc_id)
+        invalidate_collection_cache(collection_name) # Invalider uniquement le cache de cette collection
         return True
     except Exception as e:
         st.error(f"Erreur lors de la suppression du document dans la collection '{collection_name}': {e}")
         return False
 
+# --- Écritures groupées (WriteBatch) ---
+# Les opérations sont découpées en batches respectant les limites Firestore (nombre d'opérations
+# et taille de requête), envoyés en parallèle par un nombre limité de threads.
+# Le cache de la collection n'est invalidé qu'une seule fois, à la fin.
+
+_BATCH_OPERATION_OVERHEAD_BYTES = 64 # Part fixe estimée de chaque opération (chemin du document, en-têtes)
+
+def _estimate_operation_size(document_data: dict) -> int:
+    """Estimation grossière de la taille d'une opération d'écriture en octets (pour le découpage en batches)."""
+    return estimate_document_size(document_data) + _BATCH_OPERATION_OVERHEAD_BYTES
+
+def _chunk_write_operations(operations: list) -> list:
+    """
+    Découpe une liste d'opérations en batches compatibles avec les limites Firestore.
+    Chaque opération est un tuple dont le dernier élément est la donnée écrite : (op, doc_id, data)
+    ou (collection, op, doc_id, data).
+    """
+    chunks = []
+    current_chunk = []
+    current_bytes = 0
+    for operation in operations:
+        operation_bytes = _estimate_operation_size(operation[-1])
+        if current_chunk and (len(current_chunk) >= FIRESTORE_BATCH_MAX_OPERATIONS or current_bytes + operation_bytes > FIRESTORE_BATCH_MAX_BYTES):
+            chunks.append(current_chunk)
+            current_chunk = []
+            current_bytes = 0
+        current_chunk.append(operation)
+        current_bytes += operation_bytes
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+def _commit_write_batch(collection_name: str, operations: list) -> int:
+    """Applique un batch d'opérations ('set', 'update' ou 'delete') en un seul commit atomique."""
+    col_ref = get_db().collection(collection_name)
+    batch = get_db().batch()
+    for op, doc_id, data in operations:
+        doc_ref = col_ref.document(doc_id) if doc_id else col_ref.document()
+        if op == 'set':
+            batch.set(doc_ref, _with_sync_timestamp(data))
+        elif op == 'update':
+            batch.update(doc_ref, _with_sync_timestamp(data))
+        elif op == 'delete':
+            batch.delete(doc_ref)
+        else:
+            raise ValueError(f"Opération d'écriture inconnue : '{op}'")
+    with fsm.track(collection_name, 'batch') as measure:
+        batch.commit()
+        measure.add_writes(data for _, _, data in operations)
+    return len(operations)
+
+def bulk_write_collection(collection_name: str, operations: list) -> int:
+    """
+    Applique une liste d'opérations (op, doc_id, data) sur une collection via des WriteBatch.
+    op vaut 'set', 'update' ou 'delete' (data est ignoré pour 'delete').
+    Retourne le nombre d'opérations appliquées ; lève l'exception du premier batch en échec.
+    Le cache de la collection est invalidé une seule fois, même en cas d'échec partiel.
+    """
+    chunks = _chunk_write_operations(operations)
+    if not chunks:
+        return 0
+    try:
+        with ThreadPoolExecutor(max_workers=min(FIRESTORE_BATCH_MAX_WORKERS, len(chunks))) as executor:
+            futures = [executor.submit(_commit_write_batch, collection_name, chunk) for chunk in chunks]
+            return sum(future.result() for future in futures)
+    finally:
+        for op, doc_id, _ in operations:
+            if op == 'delete':
+                _forget_snapshot_document(collection_name, doc_id)
+        invalidate_collection_cache(collection_name)
+
+def add_documents_batch(collection_name: str, documents: list, id_field: str = None) -> bool:
+    """
+    Ajoute plusieurs documents en écritures groupées.
+    Si id_field est fourni, la valeur de ce champ est utilisée comme ID de chaque document.
+    """
+    try:
+        operations = [('set', document.get(id_field) if id_field else None, document) for document in documents]
+        bulk_write_collection(collection_name, operations)
+        return True
+    except Exception as e:
+        st.error(f"Erreur lors de l'ajout groupé de documents à la collection '{collection_name}': {e}")
+        return False
+
+def update_documents_batch(collection_name: str, updates_by_id: dict) -> bool:
+    """
+    Met à jour plusieurs documents en écritures groupées.
+    updates_by_id: Dictionnaire {doc_id: dictionnaire des champs à mettre à jour}.
+    """
+    try:
+        operations = [('update', doc_id, updates) for doc_id, updates in updates_by_id.items()]
+        bulk_write_collection(collection_name, operations)
+        return True
+    except Exception as e:
+        st.error(f"Erreur lors de la mise à jour groupée de documents dans la collection '{collection_name}': {e}")
+        return False
+
+def delete_documents_batch(collection_name: str, doc_ids: list) -> bool:
+    """Supprime plusieurs documents en écritures groupées."""
+    try:
+        bulk_write_collection(collection_name, [('delete', doc_id, None) for doc_id in doc_ids])
+        return True
+    except Exception as e:
+        st.error(f"Erreur lors de la suppression groupée de documents dans la collection '{collection_name}': {e}")
+        return False
+
 # --- Fonctions spécifiques pour chaque collection (adaptées de sheets_connector) ---
 
 # Note : Pour Firestore, il est souvent préférable que l'ID unique soit le DOC_ID de Firestore.
@@ -171,17 +1370,159 @@ def add_morceau_generes(data: dict) -> bool:
 
 def update_morceau_generes(morceau_id: str, data: dict) -> bool:
     data['Date_Mise_A_Jour'] = datetime.now().strftime('%Y-%m-%d')
+    if 'ID_Album_Associe' in data or 'ID_Artiste_IA' in data:
+        return _update_morceau_with_rollups(morceau_id, data) # Les cumuls suivent le morceau vers son nouvel album/artiste
     # Supposons que morceau_id est bien l'ID du document Firestore
     return update_document_in_collection(WORKSHEET_NAMES["MORCEAUX_GENERES"], morceau_id, data)
 
 def delete_morceau_generes(morceau_id: str) -> bool:
     return delete_document_from_collection(WORKSHEET_NAMES["MORCEAUX_GENERES"], morceau_id)
 
+# --- Suppression en cascade d'un morceau ---
+# Les dépendants sont trouvés par requêtes indexées (égalité sur l'ID du morceau, projection sur
+# l'ID de document uniquement), puis supprimés en WriteBatch (plusieurs au-delà de
+# FIRESTORE_BATCH_MAX_OPERATIONS). Le morceau est supprimé en dernier, dans une transaction qui retire
+# aussi ses cumuls : un échec partiel laisse le morceau et ses cumuls en place, et la suppression
+# peut être relancée sans retirer deux fois ses totaux de son album et de son artiste.
+
+def _find_dependent_document_ids(collection_name: str, field: str, value: str) -> list:
+    """Retourne les IDs des documents dont field == value, sans lire leurs données."""
+    query = get_db().collection(collection_name).where(
+        filter=google.cloud.firestore.FieldFilter(field, '==', value)
+    ).select([FieldPath.document_id()])
+    with fsm.track(collection_name, 'scan_ids') as measure:
+        doc_ids = [doc.id for doc in query.stream()]
+        measure.documents += len(doc_ids)
+    return doc_ids
+
+def _stage_write_operations(writer, operations: list):
+    """
+    Ajoute des opérations (collection, op, doc_id, data) à un WriteBatch ou à une transaction.
+    op vaut 'set', 'merge' (set fusionné, accepte les Increment), 'update' ou 'delete'.
+    """
+    db_client = get_db()
+    for collection_name, op, doc_id, data in operations:
+        doc_ref = db_client.collection(collection_name).document(doc_id)
+        if op == 'delete':
+            writer.delete(doc_ref)
+        elif op == 'set':
+            writer.set(doc_ref, _with_sync_timestamp(data))
+        elif op == 'merge':
+            writer.set(doc_ref, _with_sync_timestamp(data), merge=True)
+        elif op == 'update':
+            writer.update(doc_ref, _with_sync_timestamp(data))
+        else:
+            raise ValueError(f"Opération d'écriture inconnue : '{op}'")
+
+def _commit_operations_batch(operations: list):
+    """
+    Commite des opérations (collection, op, doc_id, data) multi-collections en un seul WriteBatch :
+    toutes ou aucune. Lève ValueError si elles dépassent les limites d'un batch (jamais redécoupées).
+    """
+    if len(_chunk_write_operations(operations)) > 1:
+        raise ValueError(f"{len(operations)} opérations dépassent les limites d'un seul batch Firestore.")
+    batch = get_db().batch()
+    _stage_write_operations(batch, operations)
+    batch.commit()
+    for collection_name, op, doc_id, data in operations:
+        fsm.record_writes(collection_name, 'batch_multi', [data])
+
+def _commit_multi_collection_operations(operations: list):
+    """Commite des opérations (collection, op, doc_id, data) multi-collections, en un seul batch si possible."""
+    for chunk in _chunk_write_operations(operations):
+        _commit_operations_batch(chunk)
+
+def _read_in_transaction(transaction, collection_name: str, doc_id: str):
+    """Lit un document dans une transaction ; retourne ses données, ou None s'il n'existe pas."""
+    snapshot = get_db().collection(collection_name).document(doc_id).get(transaction=transaction)
+    return snapshot.to_dict() if snapshot.exists else None
+
+def _run_transaction(collection_name: str, build_operations) -> list:
+    """
+    Exécute une transaction : build_operations(transaction) lit les documents dont dépendent les
+    écritures (_read_in_transaction) et retourne les opérations (collection, op, doc_id, data) à
+    appliquer. Si un document lu est modifié avant le commit, Firestore relance build_operations :
+    les écritures sont toujours calculées sur un état à jour. Retourne les opérations écrites.
+    """
+    db_client = get_db()
+    transactional = memory_transactional if isinstance(db_client, MemoryFirestoreClient) else google.cloud.firestore.transactional
+    def run(transaction):
+        operations = build_operations(transaction)
+        _stage_write_operations(transaction, operations)
+        return operations
+    with fsm.track(collection_name, 'transaction') as measure:
+        operations = transactional(run)(db_client.transaction())
+        measure.add_writes(data for _, _, _, data in operations)
+    return operations
+
+def delete_morceau_cascade(morceau_id: str, delete_history: bool = False):
+    """
+    Supprime un morceau et ses dépendants : statistiques simulées, paroles existantes, fichiers audio
+    et pochette locaux (AUDIO_CLIPS_DIR, SONG_COVERS_DIR). Les entrées d'historique liées sont
+    déliées (ID_Morceau_Associe vidé), ou supprimées si delete_history est vrai.
+    Retourne un rapport {catégorie: nombre} avec la liste des fichiers supprimés, ou None en cas d'échec.
+    """
+    morceaux_collection = WORKSHEET_NAMES["MORCEAUX_GENERES"]
+    stats_collection = WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"]
+    paroles_collection = WORKSHEET_NAMES["PAROLES_EXISTANTES"]
+    historique_collection = WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"]
+    try:
+        morceau_doc = get_db().collection(morceaux_collection).document(morceau_id).get()
+        morceau = morceau_doc.to_dict() if morceau_doc.exists else {}
+
+        stat_ids = _find_dependent_document_ids(stats_collection, 'ID_Morceau', morceau_id)
+        paroles_ids = set(_find_dependent_document_ids(paroles_collection, 'ID_Morceau', morceau_id))
+        if get_db().collection(paroles_collection).document(morceau_id).get().exists:
+            paroles_ids.add(morceau_id)
+        historique_ids = _find_dependent_document_ids(historique_collection, 'ID_Morceau_Associe', morceau_id)
+
+        operations = [(stats_collection, 'delete', doc_id, None) for doc_id in stat_ids]
+        operations += [(paroles_collection, 'delete', doc_id, None) for doc_id in sorted(paroles_ids)]
+        if delete_history:
+            operations += [(historique_collection, 'delete', doc_id, None) for doc_id in historique_ids]
+        else:
+            operations += [(historique_collection, 'update', doc_id, {'ID_Morceau_Associe': ''}) for doc_id in historique_ids]
+        _commit_multi_collection_operations(operations)
+        # Le morceau en dernier, dans la même transaction que le retrait de ses cumuls : un nouvel essai
+        # après un échec partiel ne retire pas deux fois ses totaux de son album et de son artiste
+        operations += _delete_morceau_with_rollups(morceau_id)
+        for collection_name, op, doc_id, _ in operations:
+            if op == 'delete':
+                _forget_snapshot_document(collection_name, doc_id)
+    except Exception as e:
+        st.error(f"Erreur lors de la suppression en cascade du morceau '{morceau_id}': {e}")
+        return None
+    finally:
+        for collection_name in (stats_collection, paroles_collection, historique_collection, morceaux_collection, WORKSHEET_NAMES["STATS_ROLLUPS"]):
+            invalidate_collection_cache(collection_name)
+
+    deleted_files = []
+    for directory, field in ((AUDIO_CLIPS_DIR, 'URL_Audio_Local'), (SONG_COVERS_DIR, 'URL_Cover_Album')):
+        filename = morceau.get(field)
+        if not filename:
+            continue
+        file_path = os.path.join(directory, os.path.basename(filename))
+        try:
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+                deleted_files.append(file_path)
+        except OSError as e:
+            st.warning(f"Fichier '{file_path}' non supprimé : {e}")
+
+    return {
+        'morceau': 1 if morceau_doc.exists else 0,
+        'statistiques': len(stat_ids),
+        'paroles': len(paroles_ids),
+        'historique_supprime' if delete_history else 'historique_delie': len(historique_ids),
+        'fichiers': deleted_files
+    }
+
 def add_historique_generation(data: dict) -> bool:
     if 'ID_GenLog' not in data or not data['ID_GenLog']:
         data['ID_GenLog'] = generate_unique_id('LOG')
     data['Date_Heure'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     data['ID_Utilisateur'] = st.session_state.get('user_id', 'Gardien')
+    data[HISTORIQUE_ARCHIVE_MARKER_FIELD] = False
     return add_document_to_collection(WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"], data, doc_id=data['ID_GenLog'])
 
 def update_historique_generation(gen_log_id: str, data: dict) -> bool:
@@ -190,6 +1531,255 @@ def update_historique_generation(gen_log_id: str, data: dict) -> bool:
 def delete_historique_generation(gen_log_id: str) -> bool:
     return delete_document_from_collection(WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"], gen_log_id)
 
+# --- Journalisation différée (write-behind) de l'historique des générations ---
+# Les interactions avec l'Oracle sont mises dans une file bornée et écrites par un thread dédié,
+# en WriteBatch groupés, au plus toutes les HISTORIQUE_FLUSH_INTERVAL_SECONDS secondes : la latence
+# d'une génération n'inclut plus d'écriture Firestore. Si Firestore est indisponible (ou la file
+# pleine), les enregistrements sont ajoutés à un fichier JSONL local, rejoué au flush suivant réussi.
+# À l'arrêt du processus (atexit), le thread d'écriture est arrêté et attendu (il écrit le lot qu'il
+# tient), puis le reste de la file est vidé.
+_historique_queue = queue.Queue(maxsize=HISTORIQUE_QUEUE_MAX_SIZE)
+_historique_writer_thread = None
+_historique_writer_stop = threading.Event()
+_historique_writer_lock = threading.Lock()
+_historique_spill_lock = threading.Lock()
+
+def _prepare_historique_record(data: dict) -> dict:
+    """Complète un enregistrement d'historique (ID, date, utilisateur, marqueur d'archivage) dans le thread appelant."""
+    record = dict(data)
+    if not record.get('ID_GenLog'):
+        record['ID_GenLog'] = generate_unique_id('LOG')
+    record['Date_Heure'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    record['ID_Utilisateur'] = st.session_state.get('user_id', 'Gardien')
+    record[HISTORIQUE_ARCHIVE_MARKER_FIELD] = False
+    return record
+
+def _spill_historique_records(records: list):
+    """Ajoute des enregistrements au fichier JSONL de secours."""
+    with _historique_spill_lock:
+        os.makedirs(os.path.dirname(HISTORIQUE_SPILL_FILE) or ".", exist_ok=True)
+        with open(HISTORIQUE_SPILL_FILE, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, default=_snapshot_json_default, ensure_ascii=False) + "\n")
+
+def _take_spilled_historique_records() -> list:
+    """Lit et vide le fichier JSONL de secours (les lignes illisibles sont ignorées)."""
+    with _historique_spill_lock:
+        if not os.path.exists(HISTORIQUE_SPILL_FILE):
+            return []
+        records = []
+        with open(HISTORIQUE_SPILL_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line, object_hook=_snapshot_json_object_hook))
+                except ValueError:
+                    continue
+        os.remove(HISTORIQUE_SPILL_FILE)
+        return records
+
+def _write_historique_records(records: list) -> bool:
+    """
+    Écrit un lot d'enregistrements en WriteBatch, avec les nouveaux modèles de prompts qu'ils
+    référencent ; en cas d'échec, les déverse (modèles compris) dans le fichier de secours.
+    """
+    collection_name = WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"]
+    pending_templates = [record.get(_PROMPT_TEMPLATE_BODY_KEY) for record in records]
+    template_operations = _prompt_template_operations(records)
+    try:
+        # Les modèles en tête : une entrée n'est jamais écrite avant le modèle qu'elle référence
+        _commit_multi_collection_operations(template_operations + [(collection_name, 'set', record['ID_GenLog'], record) for record in records])
+    except Exception as e:
+        print(f"DEBUG_FIRESTORE: Échec de l'écriture de {len(records)} entrées d'historique, déversées dans '{HISTORIQUE_SPILL_FILE}': {e}")
+        for record, body in zip(records, pending_templates):
+            if body:
+                record[_PROMPT_TEMPLATE_BODY_KEY] = body
+        _spill_historique_records(records)
+        return False
+    _mark_prompt_templates_stored(template_operations)
+    invalidate_collection_cache(collection_name)
+    if template_operations:
+        invalidate_collection_cache(WORKSHEET_NAMES["PROMPT_TEMPLATES"])
+    return True
+
+def _drain_historique_queue(max_records: int) -> list:
+    """Retire de la file jusqu'à max_records enregistrements, sans attendre."""
+    records = []
+    while len(records) < max_records:
+        try:
+            records.append(_historique_queue.get_nowait())
+        except queue.Empty:
+            break
+    return records
+
+def _historique_writer_loop():
+    """
+    Boucle du thread d'écriture : regroupe les enregistrements et les écrit périodiquement.
+    S'arrête quand _historique_writer_stop est levé, après avoir écrit le lot en cours.
+    """
+    while not _historique_writer_stop.is_set():
+        try:
+            first_record = _historique_queue.get(timeout=HISTORIQUE_FLUSH_INTERVAL_SECONDS)
+        except queue.Empty:
+            continue
+        _historique_writer_stop.wait(HISTORIQUE_FLUSH_INTERVAL_SECONDS) # Laisse les enregistrements suivants s'accumuler (écourté à l'arrêt)
+        records = [first_record] + _drain_historique_queue(HISTORIQUE_FLUSH_BATCH_SIZE - 1)
+        if _write_historique_records(records):
+            spilled = _take_spilled_historique_records()
+            if spilled:
+                _write_historique_records(spilled)
+        for _ in records:
+            _historique_queue.task_done()
+
+def _ensure_historique_writer():
+    """Démarre le thread d'écriture de l'historique au premier enregistrement mis en file."""
+    global _historique_writer_thread
+    with _historique_writer_lock:
+        if _historique_writer_thread is None:
+            _historique_writer_thread = threading.Thread(target=_historique_writer_loop, name="firestore_historique_writer", daemon=True)
+            _historique_writer_thread.start()
+
+def enqueue_historique_generation(data: dict, prompt_template: str = None) -> str:
+    """
+    Met en file un enregistrement d'historique pour écriture différée et retourne son ID_GenLog.
+    prompt_template: modèle du prompt envoyé ; l'entrée référence son empreinte et le modèle est
+    écrit avec elle s'il n'est pas encore enregistré.
+    Ne bloque jamais : si la file est pleine, l'enregistrement est déversé dans le fichier de secours.
+    """
+    record = _prepare_historique_record(data)
+    if prompt_template is not None:
+        record['Prompt_Template_Hash'], template_body = register_prompt_template(prompt_template)
+        if template_body is not None:
+            record[_PROMPT_TEMPLATE_BODY_KEY] = template_body
+    _ensure_historique_writer()
+    try:
+        _historique_queue.put_nowait(record)
+    except queue.Full:
+        _spill_historique_records([record])
+    return record['ID_GenLog']
+
+def stop_historique_writer():
+    """Arrête le thread d'écriture et attend qu'il ait écrit (ou déversé) le lot qu'il détient."""
+    _historique_writer_stop.set()
+    with _historique_writer_lock:
+        writer_thread = _historique_writer_thread
+    if writer_thread is not None:
+        writer_thread.join()
+
+def flush_historique_queue():
+    """
+    Arrête le thread d'écriture, puis écrit depuis le thread appelant tous les enregistrements
+    restés en file (et le fichier de secours). Appelée à l'arrêt du processus.
+    """
+    stop_historique_writer()
+    while True:
+        records = _drain_historique_queue(HISTORIQUE_FLUSH_BATCH_SIZE)
+        if not records:
+            break
+        _write_historique_records(records)
+        for _ in records:
+            _historique_queue.task_done()
+    spilled = _take_spilled_historique_records()
+    if spilled:
+        _write_historique_records(spilled)
+
+atexit.register(flush_historique_queue)
+
+# --- Modèles de prompts adressés par contenu (PROMPT_TEMPLATES) ---
+# Une entrée d'historique ne stocke plus le prompt complet envoyé à l'Oracle : elle référence
+# l'empreinte SHA-256 de son modèle (préambule de sécurité + corps fixe du prompt, au format str.format)
+# et ne garde que les variables (JSON). Chaque modèle est écrit une seule fois, sous son empreinte ;
+# le prompt complet est reconstruit à la lecture. Les entrées sans empreinte gardent Prompt_Envoye_Full.
+# Le modèle est écrit par le thread d'écriture différée de l'historique, dans le même batch que la
+# première entrée qui le référence (aucune écriture Firestore pendant une génération) ; en cas d'échec
+# il est déversé avec elle dans le fichier de secours. Seuls les modèles effectivement écrits sont
+# mémorisés comme connus, et seules les lectures réussies sont gardées en cache.
+_PROMPT_TEMPLATE_BODY_KEY = '_Corps_Template' # Clé interne d'un enregistrement en file portant le modèle à écrire
+_known_prompt_templates = set()
+_prompt_template_bodies = {} # {empreinte: corps} des modèles lus ou enregistrés par ce processus
+_known_prompt_templates_lock = threading.Lock()
+
+def prompt_template_hash(body: str) -> str:
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+def register_prompt_template(body: str) -> tuple:
+    """
+    Retourne (empreinte, corps à écrire) pour un modèle de prompt : le corps vaut None si le modèle
+    est déjà enregistré dans Firestore. Le modèle est immédiatement lisible dans ce processus.
+    """
+    template_hash = prompt_template_hash(body)
+    with _known_prompt_templates_lock:
+        _prompt_template_bodies[template_hash] = body
+        if template_hash in _known_prompt_templates:
+            return template_hash, None
+    return template_hash, body
+
+def _prompt_template_operations(records: list) -> list:
+    """Retire des enregistrements les modèles à écrire et retourne leurs opérations (collection, 'set', ID, données)."""
+    operations = {}
+    for record in records:
+        body = record.pop(_PROMPT_TEMPLATE_BODY_KEY, None)
+        template_hash = record.get('Prompt_Template_Hash')
+        if body and template_hash and template_hash not in operations:
+            operations[template_hash] = (WORKSHEET_NAMES["PROMPT_TEMPLATES"], 'set', template_hash, {
+                'ID_Template': template_hash,
+                'Corps_Template': body,
+                'Date_Creation': record.get('Date_Heure') or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            })
+    return list(operations.values())
+
+def _mark_prompt_templates_stored(template_operations: list):
+    with _known_prompt_templates_lock:
+        _known_prompt_templates.update(doc_id for _, _, doc_id, _ in template_operations)
+
+def get_prompt_template(template_hash: str):
+    """
+    Retourne le corps du modèle de prompt d'empreinte template_hash, ou None s'il est introuvable.
+    Un modèle est immuable (son ID est l'empreinte de son contenu) : une lecture réussie est gardée
+    sans expiration ; un échec ou une absence n'est pas mis en cache et sera relu au prochain appel.
+    """
+    with _known_prompt_templates_lock:
+        body = _prompt_template_bodies.get(template_hash)
+    if body is not None:
+        return body
+    try:
+        with fsm.track(WORKSHEET_NAMES["PROMPT_TEMPLATES"], 'document_par_id') as measure:
+            doc = get_db().collection(WORKSHEET_NAMES["PROMPT_TEMPLATES"]).document(template_hash).get()
+            measure.add_document(doc.to_dict() if doc.exists else None)
+    except Exception as e:
+        print(f"DEBUG_FIRESTORE: Lecture du modèle de prompt '{template_hash}' impossible : {e}")
+        return None
+    body = doc.to_dict().get('Corps_Template') if doc.exists else None
+    if body is not None:
+        with _known_prompt_templates_lock:
+            _prompt_template_bodies[template_hash] = body
+            _known_prompt_templates.add(template_hash)
+    return body
+
+def rebuild_historique_prompt(record) -> str:
+    """Reconstruit le prompt complet d'une entrée d'historique (dict ou pd.Series) à partir de son modèle et de ses variables."""
+    template_hash = record.get('Prompt_Template_Hash')
+    if isinstance(template_hash, str) and template_hash:
+        template = get_prompt_template(template_hash)
+        variables = record.get('Prompt_Variables')
+        if template is not None:
+            try:
+                return template.format_map(json.loads(variables) if isinstance(variables, str) and variables else {})
+            except (ValueError, KeyError, IndexError) as e:
+                print(f"DEBUG_FIRESTORE: Reconstruction du prompt de '{record.get('ID_GenLog')}' impossible : {e}")
+    prompt = record.get('Prompt_Envoye_Full')
+    return prompt if isinstance(prompt, str) else ''
+
+def with_rebuilt_historique_prompts(df: pd.DataFrame) -> pd.DataFrame:
+    """Retourne le DataFrame d'historique avec Prompt_Envoye_Full reconstruit pour les entrées référençant un modèle."""
+    if df.empty or not {'Prompt_Template_Hash', 'Prompt_Envoye_Full'}.issubset(df.columns):
+        return df
+    templated = df['Prompt_Template_Hash'].astype('string').fillna('').ne('')
+    if not templated.any():
+        return df
+    df = df.copy()
+    df.loc[templated, 'Prompt_Envoye_Full'] = df.loc[templated].apply(rebuild_historique_prompt, axis=1)
+    return df
+
 # Répéter pour toutes les autres entités, en mappant les fonctions
 # vers add_document_to_collection, update_document_in_collection, delete_document_from_collection
 # en utilisant leur ID_XXX respectif comme doc_id pour les opérations (add/update/delete)
@@ -350,16 +1940,256 @@ def update_timeline_event(event_id: str, data: dict) -> bool:
 def delete_timeline_event(event_id: str) -> bool:
     return delete_document_from_collection(WORKSHEET_NAMES["TIMELINE_EVENEMENTS_CULTURELS"], event_id)
 
-def add_stat_simulee(data: dict) -> bool:
-    if 'ID_Stat_Simulee' not in data or not data['ID_Stat_Simulee']:
-        data['ID_Stat_Simulee'] = generate_unique_id('SS')
-    return add_document_to_collection(WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"], data, doc_id=data['ID_Stat_Simulee'])
+# --- Cumuls matérialisés des statistiques simulées (STATS_ROLLUPS) ---
+# Un document de cumul par morceau, par album et par artiste IA (IDs 'MORCEAU__<id>', 'ALBUM__<id>',
+# 'ARTISTE__<id>') : nombre de statistiques et sommes des écoutes, j'aimes, partages et revenus.
+# Un tableau de bord lit ainsi un petit document au lieu de toutes les lignes de statistiques.
+# - Ajout : les Increment sont calculés depuis les données reçues et écrits dans le même WriteBatch
+#   que les statistiques (sans lecture : un Increment est atomique côté serveur).
+# - Mise à jour / suppression d'une statistique, changement d'album ou d'artiste d'un morceau,
+#   suppression d'un morceau : l'ancien état est lu et les deltas écrits dans une même transaction,
+#   relancée par Firestore en cas d'écriture concurrente sur un document lu.
+# L'album et l'artiste sont ceux du morceau au moment de l'écriture. rebuild_stats_rollups()
+# recalcule tout depuis les statistiques (initialisation sur des données existantes).
+ROLLUP_LEVELS = {'MORCEAU': 'ID_Morceau', 'ALBUM': 'ID_Album_Associe', 'ARTISTE': 'ID_Artiste_IA'}
+_ROLLUP_MEASURES = ['Ecoutes_Totales', 'J_aimes_Recus', 'Partages_Simules', 'Revenus_Simules_Streaming']
+
+def rollup_doc_id(level: str, entity_id: str) -> str:
+    return f"{level}__{entity_id}"
+
+def _stat_measures(stat: dict, sign: int = 1) -> dict:
+    """Contribution d'une statistique aux cumuls (valeurs non numériques comptées 0), multipliée par sign."""
+    measures = {'Nb_Stats': sign}
+    for field in _ROLLUP_MEASURES:
+        value = pd.to_numeric(stat.get(field), errors='coerce')
+        if pd.isna(value):
+            measures[field] = 0
+        else:
+            measures[field] = sign * (float(value) if field == 'Revenus_Simules_Streaming' else int(value))
+    return measures
+
+def _morceau_levels(morceau_id: str, morceau: dict) -> dict:
+    """Retourne {niveau: ID de l'entité} des cumuls d'une statistique du morceau (album et artiste s'ils sont renseignés)."""
+    levels = {'MORCEAU': morceau_id}
+    for level in ('ALBUM', 'ARTISTE'):
+        entity_id = (morceau or {}).get(ROLLUP_LEVELS[level])
+        if isinstance(entity_id, str) and entity_id:
+            levels[level] = entity_id
+    return levels
+
+def _accumulate_rollup_deltas(deltas: dict, levels: dict, measures: dict):
+    """Ajoute une contribution aux deltas {doc_id de cumul: {champ: delta}} de chaque niveau de levels."""
+    for level, entity_id in levels.items():
+        entry = deltas.setdefault(rollup_doc_id(level, entity_id), {'Niveau': level, 'ID_Entite': entity_id, 'deltas': {}})
+        for field, value in measures.items():
+            entry['deltas'][field] = entry['deltas'].get(field, 0) + value
+
+def _rollup_operations(deltas: dict) -> list:
+    """Opérations (collection, 'merge', doc_id, données) appliquant les deltas non nuls par Increment."""
+    rollups_collection = WORKSHEET_NAMES["STATS_ROLLUPS"]
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    operations = []
+    for doc_id, entry in deltas.items():
+        increments = {field: google.cloud.firestore.Increment(value) for field, value in entry['deltas'].items() if value}
+        if not increments:
+            continue
+        data = {'ID_Rollup': doc_id, 'Niveau': entry['Niveau'], 'ID_Entite': entry['ID_Entite'], 'Date_Mise_A_Jour': now, **increments}
+        operations.append((rollups_collection, 'merge', doc_id, data))
+    return operations
+
+def _rollup_measures(rollup: dict, sign: int = 1) -> dict:
+    """Totaux d'un document de cumul, multipliés par sign (pour les déplacer ou les retirer)."""
+    return {field: sign * (rollup.get(field) or 0) for field in ['Nb_Stats'] + _ROLLUP_MEASURES}
+
+def _read_morceaux_in_transaction(transaction, morceau_ids) -> dict:
+    """Lit dans la transaction les morceaux dont dépend l'attribution des cumuls ({ID: données ou None})."""
+    return {
+        morceau_id: _read_in_transaction(transaction, WORKSHEET_NAMES["MORCEAUX_GENERES"], morceau_id)
+        for morceau_id in dict.fromkeys(morceau_ids) if morceau_id
+    }
+
+def _stat_update_operations(transaction, stat_id: str, data: dict) -> list:
+    """Opérations d'une mise à jour (data) ou d'une suppression (data None) de statistique et de ses cumuls."""
+    stats_collection = WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"]
+    old_stat = _read_in_transaction(transaction, stats_collection, stat_id)
+    if old_stat is None:
+        raise ValueError(f"Document '{stat_id}' introuvable dans la collection '{stats_collection}'")
+    new_stat = {**old_stat, **data} if data is not None else None
+    morceaux = _read_morceaux_in_transaction(transaction, [old_stat.get('ID_Morceau'), (new_stat or {}).get('ID_Morceau')])
+    deltas = {}
+    for stat, sign in ((old_stat, -1), (new_stat, 1)):
+        if stat is not None and stat.get('ID_Morceau'):
+            _accumulate_rollup_deltas(deltas, _morceau_levels(stat['ID_Morceau'], morceaux.get(stat['ID_Morceau'])), _stat_measures(stat, sign))
+    stat_operation = (stats_collection, 'update', stat_id, data) if data is not None else (stats_collection, 'delete', stat_id, None)
+    return [stat_operation] + _rollup_operations(deltas)
+
+def _delete_morceau_with_rollups(morceau_id: str) -> list:
+    """
+    Supprime, dans une transaction, un morceau et son cumul, et retire ses totaux des cumuls de son album
+    et de son artiste. Rejouable : un cumul déjà supprimé n'est pas retiré une seconde fois.
+    Retourne les opérations écrites.
+    """
+    morceaux_collection = WORKSHEET_NAMES["MORCEAUX_GENERES"]
+    rollups_collection = WORKSHEET_NAMES["STATS_ROLLUPS"]
+    def build_operations(transaction):
+        morceau = _read_in_transaction(transaction, morceaux_collection, morceau_id)
+        rollup = _read_in_transaction(transaction, rollups_collection, rollup_doc_id('MORCEAU', morceau_id))
+        operations = []
+        if rollup is not None:
+            levels = _morceau_levels(morceau_id, morceau)
+            del levels['MORCEAU'] # Le cumul du morceau est supprimé, pas décrémenté
+            deltas = {}
+            _accumulate_rollup_deltas(deltas, levels, _rollup_measures(rollup, sign=-1))
+            operations = _rollup_operations(deltas) + [(rollups_collection, 'delete', rollup_doc_id('MORCEAU', morceau_id), None)]
+        return operations + [(morceaux_collection, 'delete', morceau_id, None)]
+    return _run_transaction(morceaux_collection, build_operations)
+
+def _update_morceau_with_rollups(morceau_id: str, data: dict) -> bool:
+    """Met à jour un morceau ; si son album ou son artiste change, ses cumuls sont déplacés dans la même transaction."""
+    morceaux_collection = WORKSHEET_NAMES["MORCEAUX_GENERES"]
+    def build_operations(transaction):
+        morceau = _read_in_transaction(transaction, morceaux_collection, morceau_id)
+        if morceau is None:
+            raise ValueError(f"Document '{morceau_id}' introuvable dans la collection '{morceaux_collection}'")
+        rollup = _read_in_transaction(transaction, WORKSHEET_NAMES["STATS_ROLLUPS"], rollup_doc_id('MORCEAU', morceau_id))
+        deltas = {}
+        if rollup is not None:
+            for level in ('ALBUM', 'ARTISTE'):
+                field = ROLLUP_LEVELS[level]
+                old_id, new_id = morceau.get(field), data.get(field, morceau.get(field))
+                if old_id == new_id:
+                    continue
+                if old_id:
+                    _accumulate_rollup_deltas(deltas, {level: old_id}, _rollup_measures(rollup, sign=-1))
+                if new_id:
+                    _accumulate_rollup_deltas(deltas, {level: new_id}, _rollup_measures(rollup))
+        return [(morceaux_collection, 'update', morceau_id, data)] + _rollup_operations(deltas)
+    try:
+        _run_transaction(morceaux_collection, build_operations)
+        return True
+    except Exception as e:
+        st.error(f"Erreur lors de la mise à jour du document dans la collection '{morceaux_collection}': {e}")
+        return False
+    finally:
+        invalidate_collection_cache(morceaux_collection)
+        invalidate_collection_cache(WORKSHEET_NAMES["STATS_ROLLUPS"])
+
+def get_stats_rollup(level: str, entity_id: str):
+    """Retourne le cumul (dict) d'un morceau, album ou artiste (level : 'MORCEAU', 'ALBUM' ou 'ARTISTE'), ou None."""
+    return get_by_id(WORKSHEET_NAMES["STATS_ROLLUPS"], rollup_doc_id(level, entity_id))
+
+def get_stats_rollups(level: str, limit: int = None) -> pd.DataFrame:
+    """Retourne les cumuls d'un niveau, triés par écoutes décroissantes (requête Firestore mise en cache)."""
+    return query_collection(
+        WORKSHEET_NAMES["STATS_ROLLUPS"], where=[('Niveau', '==', level)],
+        order_by=('Ecoutes_Totales', 'DESC'), limit=limit
+    )
+
+def rebuild_stats_rollups() -> int:
+    """
+    Recalcule tous les cumuls depuis les statistiques et les morceaux, remplace la collection
+    STATS_ROLLUPS et retourne le nombre de documents de cumul écrits.
+    Lève ValueError si les morceaux n'ont pas pu être lus (les cumuls existants sont conservés).
+    """
+    rollups_collection = WORKSHEET_NAMES["STATS_ROLLUPS"]
+    stats_df = get_all_stats_simulees()
+    morceaux_df = get_all_morceaux(fields=['ID_Morceau', 'ID_Album_Associe', 'ID_Artiste_IA'])
+    if 'ID_Morceau' not in morceaux_df.columns or ('ID_Morceau' not in stats_df.columns and not stats_df.empty):
+        raise ValueError("Lecture des morceaux ou des statistiques impossible : les cumuls n'ont pas été recalculés.")
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rollups = {}
+    if not stats_df.empty:
+        stats_df = stats_df.merge(morceaux_df, on='ID_Morceau', how='left')
+        stats_df[_ROLLUP_MEASURES] = stats_df[_ROLLUP_MEASURES].apply(pd.to_numeric, errors='coerce').fillna(0)
+        for level, field in ROLLUP_LEVELS.items():
+            level_df = stats_df[stats_df[field].notna() & stats_df[field].astype(str).ne('')]
+            grouped = level_df.groupby(field)[_ROLLUP_MEASURES].sum().join(level_df.groupby(field).size().rename('Nb_Stats'))
+            for entity_id, totals in grouped.iterrows():
+                doc_id = rollup_doc_id(level, entity_id)
+                rollups[doc_id] = {
+                    'ID_Rollup': doc_id, 'Niveau': level, 'ID_Entite': entity_id, 'Date_Mise_A_Jour': now,
+                    'Nb_Stats': int(totals['Nb_Stats']),
+                    **{col: float(totals[col]) if col == 'Revenus_Simules_Streaming' else int(totals[col]) for col in _ROLLUP_MEASURES}
+                }
+    existing_ids = get_dataframe_from_collection(rollups_collection, fields=['ID_Rollup'])
+    stale_ids = [doc_id for doc_id in (existing_ids['ID_Rollup'].tolist() if not existing_ids.empty else []) if doc_id not in rollups]
+    operations = [('set', doc_id, data) for doc_id, data in rollups.items()] + [('delete', doc_id, None) for doc_id in stale_ids]
+    bulk_write_collection(rollups_collection, operations)
+    return len(rollups)
+
+def add_stat_simulee(data: dict, morceau: dict = None) -> bool:
+    """morceau: enregistrement du morceau associé si l'appelant l'a déjà (attribution des cumuls)."""
+    return add_stats_simulees_batch([data], {data.get('ID_Morceau'): morceau} if morceau is not None else None)
+
+def add_stats_simulees_batch(stats: list, morceaux: dict = None) -> bool:
+    """
+    Ajoute plusieurs statistiques simulées en écritures groupées (une seule invalidation de cache),
+    avec les Increment des cumuls de leurs morceaux, albums et artistes calculés depuis les données reçues.
+    morceaux: {ID_Morceau: morceau} si l'appelant les a déjà (ex. le simulateur) ; sinon l'album et
+    l'artiste sont pris dans l'index partagé des morceaux (get_many_by_ids).
+    Chaque groupe (statistiques et Increment de leurs cumuls) est dimensionné, en opérations et en
+    octets, pour tenir dans un seul WriteBatch, et commité tel quel : un groupe en échec n'écrit ni
+    les unes ni les autres.
+    """
+    stats_collection = WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"]
+    for data in stats:
+        if 'ID_Stat_Simulee' not in data or not data['ID_Stat_Simulee']:
+            data['ID_Stat_Simulee'] = generate_unique_id('SS')
+    try:
+        if morceaux is None:
+            morceaux = get_many_by_ids(WORKSHEET_NAMES["MORCEAUX_GENERES"], [data.get('ID_Morceau') for data in stats])
+        group, deltas = [], {}
+        group_operations, group_bytes = 0, 0
+        for data in stats:
+            stat_operation = (stats_collection, 'set', data['ID_Stat_Simulee'], data)
+            levels = _morceau_levels(data['ID_Morceau'], morceaux.get(data['ID_Morceau'])) if data.get('ID_Morceau') else {}
+            measures = _stat_measures(data)
+            stat_deltas = {}
+            _accumulate_rollup_deltas(stat_deltas, levels, measures)
+            # Coût majoré : chaque statistique compte ses propres opérations de cumul, même déjà présentes dans le groupe
+            stat_operations = [stat_operation] + _rollup_operations(stat_deltas)
+            stat_bytes = sum(_estimate_operation_size(operation[-1]) for operation in stat_operations)
+            if group and (group_operations + len(stat_operations) > FIRESTORE_BATCH_MAX_OPERATIONS or group_bytes + stat_bytes > FIRESTORE_BATCH_MAX_BYTES):
+                _commit_operations_batch(group + _rollup_operations(deltas))
+                group, deltas = [], {}
+                group_operations, group_bytes = 0, 0
+            group.append(stat_operation)
+            _accumulate_rollup_deltas(deltas, levels, measures)
+            group_operations += len(stat_operations)
+            group_bytes += stat_bytes
+        if group:
+            _commit_operations_batch(group + _rollup_operations(deltas))
+        return True
+    except Exception as e:
+        st.error(f"Erreur lors de l'ajout groupé de documents à la collection '{stats_collection}': {e}")
+        return False
+    finally:
+        invalidate_collection_cache(stats_collection)
+        invalidate_collection_cache(WORKSHEET_NAMES["STATS_ROLLUPS"])
+
+def _write_stat_with_rollups(stat_id: str, data) -> bool:
+    """Met à jour (data) ou supprime (data None) une statistique et reporte la différence sur ses cumuls, en transaction."""
+    stats_collection = WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"]
+    action = "mise à jour" if data is not None else "suppression"
+    try:
+        _run_transaction(stats_collection, lambda transaction: _stat_update_operations(transaction, stat_id, data))
+        if data is None:
+            _forget_snapshot_document(stats_collection, stat_id)
+        return True
+    except Exception as e:
+        st.error(f"Erreur lors de la {action} de la statistique simulée '{stat_id}': {e}")
+        return False
+    finally:
+        invalidate_collection_cache(stats_collection)
+        invalidate_collection_cache(WORKSHEET_NAMES["STATS_ROLLUPS"])
 
 def update_stat_simulee(stat_id: str, data: dict) -> bool:
-    return update_document_in_collection(WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"], stat_id, data)
+    """Met à jour une statistique et reporte la différence (ancienne → nouvelle valeur) sur les cumuls."""
+    return _write_stat_with_rollups(stat_id, data)
 
 def delete_stat_simulee(stat_id: str) -> bool:
-    return delete_document_from_collection(WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"], stat_id)
+    """Supprime une statistique et retire ses valeurs des cumuls."""
+    return _write_stat_with_rollups(stat_id, None)
 
 def add_conseil_strategique(data: dict) -> bool:
     if 'ID_Conseil' not in data or not data['ID_Conseil']:
@@ -408,68 +2238,68 @@ def delete_reference_sonore(ref_sonore_id: str) -> bool:
 
 # Fonctions génériques pour obtenir toutes les données d'une collection
 # Elles appellent toutes get_dataframe_from_collection avec le nom de collection approprié.
-def get_all_morceaux():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["MORCEAUX_GENERES"])
+def get_all_morceaux(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["MORCEAUX_GENERES"], fields)
 
-def get_all_albums():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["ALBUMS_PLANETAIRES"])
+def get_all_albums(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["ALBUMS_PLANETAIRES"], fields)
 
-def get_all_sessions_creatives():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["SESSIONS_CREATIVES_ORACLE"])
+def get_all_sessions_creatives(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["SESSIONS_CREATIVES_ORACLE"], fields)
 
-def get_all_artistes_ia():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["ARTISTES_IA_COSMIQUES"])
+def get_all_artistes_ia(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["ARTISTES_IA_COSMIQUES"], fields)
 
-def get_all_styles_musicaux():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["STYLES_MUSICAUX_GALACTIQUES"])
+def get_all_styles_musicaux(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["STYLES_MUSICAUX_GALACTIQUES"], fields)
 
-def get_all_styles_lyriques():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["STYLES_LYRIQUES_UNIVERS"])
+def get_all_styles_lyriques(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["STYLES_LYRIQUES_UNIVERS"], fields)
 
-def get_all_themes():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["THEMES_CONSTELLES"])
+def get_all_themes(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["THEMES_CONSTELLES"], fields)
 
-def get_all_stats_simulees():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"])
+def get_all_stats_simulees(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"], fields)
 
-def get_all_conseils_strategiques():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["CONSEILS_STRATEGIQUES_ORACLE"])
+def get_all_conseils_strategiques(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["CONSEILS_STRATEGIQUES_ORACLE"], fields)
 
-def get_all_instruments():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["INSTRUMENTS_ORCHESTRAUX"])
+def get_all_instruments(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["INSTRUMENTS_ORCHESTRAUX"], fields)
 
-def get_all_structures_song():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["STRUCTURES_SONG_UNIVERSELLES"])
+def get_all_structures_song(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["STRUCTURES_SONG_UNIVERSELLES"], fields)
 
-def get_all_voix_styles():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["VOIX_ET_STYLES_VOCAUX"])
+def get_all_voix_styles(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["VOIX_ET_STYLES_VOCAUX"], fields)
 
-def get_all_regles_generation():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["REGLES_DE_GENERATION_ORACLE"])
+def get_all_regles_generation(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["REGLES_DE_GENERATION_ORACLE"], fields)
 
-def get_all_moods():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"])
+def get_all_moods(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"], fields)
 
-def get_all_references_sonores():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["REFERENCES_SONORES_DETAILLES"])
+def get_all_references_sonores(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["REFERENCES_SONORES_DETAILLES"], fields)
 
-def get_all_public_cible():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["PUBLIC_CIBLE_DEMOGRAPHIQUE"])
+def get_all_public_cible(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["PUBLIC_CIBLE_DEMOGRAPHIQUE"], fields)
 
-def get_all_prompts_types():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["PROMPTS_TYPES_ET_GUIDES"])
+def get_all_prompts_types(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["PROMPTS_TYPES_ET_GUIDES"], fields)
 
-def get_all_projets_en_cours():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["PROJETS_EN_COURS"])
+def get_all_projets_en_cours(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["PROJETS_EN_COURS"], fields)
 
-def get_all_outils_ia():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["OUTILS_IA_REFERENCEMENT"])
+def get_all_outils_ia(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["OUTILS_IA_REFERENCEMENT"], fields)
 
-def get_all_timeline_evenements():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["TIMELINE_EVENEMENTS_CULTURELS"])
+def get_all_timeline_evenements(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["TIMELINE_EVENEMENTS_CULTURELS"], fields)
 
-def get_all_paroles_existantes():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["PAROLES_EXISTANTES"])
+def get_all_paroles_existantes(fields: list = None):
+    return get_dataframe_from_collection(WORKSHEET_NAMES["PAROLES_EXISTANTES"], fields)
 
-def get_all_historique_generations():
-    return get_dataframe_from_collection(WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"])
\ No newline at end of file
+def get_all_historique_generations(fields: list = None):
+    return with_rebuilt_historique_prompts(get_dataframe_from_collection(WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"], fields))
\ No newline at end of file
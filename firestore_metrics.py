@@ -0,0 +1,260 @@
+# firestore_metrics.py
+
+# --- Instrumentation des lectures et écritures Firestore ---
+# Compteurs par (collection, opération) : appels réseau, documents lus, octets (estimés, seulement si
+# FIRESTORE_METRICS_BYTES), écritures, succès et échecs de cache, et histogramme des latences. Trois portées sont tenues à jour :
+#   - 'rerun'     : l'exécution en cours du script Streamlit de la session (remise à zéro par begin_rerun)
+#   - 'session'   : cumul de toutes les exécutions de la session
+#   - 'processus' : cumul de toutes les sessions et des threads d'arrière-plan depuis le démarrage
+# Les mesures faites sur un thread sans contexte de script (rafraîchissements, file d'historique)
+# ne comptent que dans la portée 'processus'.
+# Les compteurs des sessions inactives depuis METRICS_SESSION_TTL_SECONDS (ou en surnombre au-delà de
+# METRICS_MAX_SESSIONS) sont oubliés : une session fermée ne reste pas en mémoire indéfiniment.
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from config import FIRESTORE_METRICS_ENABLED, FIRESTORE_METRICS_BYTES, METRICS_SESSION_TTL_SECONDS, METRICS_MAX_SESSIONS
+from utils import estimate_document_size
+
+# Bornes supérieures (en millisecondes) des classes de l'histogramme de latence
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+_COUNTER_FIELDS = ('appels', 'documents', 'octets', 'ecritures', 'cache_hits', 'cache_misses')
+
+_metrics_lock = threading.Lock()
+_process_stats = {}
+_session_stats = OrderedDict() # session_id -> {'session': stats, 'rerun': stats, 'rerun_started_at': datetime, 'derniere_activite': monotonic}, la moins récemment active en tête
+_thread_state = threading.local()
+
+
+def _new_entry() -> dict:
+    entry = {field: 0 for field in _COUNTER_FIELDS}
+    entry['duree_totale_ms'] = 0.0
+    entry['latences'] = [0] * len(LATENCY_BUCKETS_MS)
+    return entry
+
+def _current_session_id():
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+def _evict_sessions(now: float):
+    """Oublie les sessions inactives depuis plus de METRICS_SESSION_TTL_SECONDS, puis les plus anciennes en surnombre (appelé sous _metrics_lock)."""
+    while _session_stats:
+        session = next(iter(_session_stats.values()))
+        if now - session['derniere_activite'] <= METRICS_SESSION_TTL_SECONDS and len(_session_stats) <= METRICS_MAX_SESSIONS:
+            break
+        _session_stats.popitem(last=False)
+
+def _touch_session(session_id) -> dict:
+    """Retourne les stats de la session (créées au besoin) et la marque comme active (appelé sous _metrics_lock)."""
+    now = time.monotonic()
+    session = _session_stats.get(session_id)
+    if session is None:
+        session = _session_stats[session_id] = {'session': {}, 'rerun': {}, 'rerun_started_at': datetime.now()}
+    else:
+        _session_stats.move_to_end(session_id)
+    session['derniere_activite'] = now
+    _evict_sessions(now)
+    return session
+
+def _scopes_for_current_thread() -> list:
+    """Retourne les dictionnaires de stats à mettre à jour (appelé sous _metrics_lock)."""
+    scopes = [_process_stats]
+    session_id = _current_session_id()
+    if session_id is not None:
+        session = _touch_session(session_id)
+        scopes.extend([session['session'], session['rerun']])
+    return scopes
+
+def _add(collection_name: str, operation: str, duration_ms: float = None, **counters):
+    if not FIRESTORE_METRICS_ENABLED:
+        return
+    key = (collection_name, operation)
+    with _metrics_lock:
+        for stats in _scopes_for_current_thread():
+            entry = stats.setdefault(key, _new_entry())
+            for field, value in counters.items():
+                entry[field] += value
+            if duration_ms is not None:
+                entry['duree_totale_ms'] += duration_ms
+                for i, upper_bound in enumerate(LATENCY_BUCKETS_MS):
+                    if duration_ms <= upper_bound:
+                        entry['latences'][i] += 1
+                        break
+
+def estimate_size(document_data) -> int:
+    """Taille estimée d'un document pour le compteur d'octets ; 0 sans FIRESTORE_METRICS_BYTES (pas de sérialisation)."""
+    return estimate_document_size(document_data) if FIRESTORE_METRICS_BYTES else 0
+
+
+# --- Mesures ---
+
+class _Measure:
+    """Accumulateur rempli par le code mesuré (voir track)."""
+    def __init__(self):
+        self.documents = 0
+        self.octets = 0
+        self.ecritures = 0
+
+    def add_document(self, document_data) -> None:
+        self.documents += 1
+        self.octets += estimate_size(document_data)
+
+    def add_documents(self, documents) -> None:
+        """Compte des documents lus (dicts de données, ou None pour un document absent)."""
+        for document_data in documents:
+            self.documents += 1
+            self.octets += estimate_size(document_data)
+
+    def add_writes(self, documents) -> None:
+        """Compte des écritures (dicts de données, ou None pour une suppression)."""
+        for document_data in documents:
+            self.ecritures += 1
+            self.octets += estimate_size(document_data)
+
+@contextmanager
+def track(collection_name: str, operation: str):
+    """
+    Mesure un appel réseau Firestore : latence, plus les documents et écritures déclarés par le bloc.
+    Dans un bloc cache_lookup, signale aussi un échec de cache (le calcul mis en cache s'exécute).
+    """
+    measure = _Measure()
+    lookups = getattr(_thread_state, 'lookups', None)
+    if lookups:
+        lookups[-1]['miss'] = True
+    started = time.perf_counter()
+    try:
+        yield measure
+    finally:
+        _add(collection_name, operation, duration_ms=(time.perf_counter() - started) * 1000,
+             appels=1, documents=measure.documents, octets=measure.octets, ecritures=measure.ecritures)
+
+@contextmanager
+def cache_lookup(collection_name: str, operation: str):
+    """
+    Encadre l'appel d'une fonction mise en cache (st.cache_data ou cache maison) : c'est un succès de
+    cache si aucun appel réseau (track) n'a lieu dans le bloc, un échec sinon.
+    """
+    if not hasattr(_thread_state, 'lookups'):
+        _thread_state.lookups = []
+    lookup = {'miss': False}
+    _thread_state.lookups.append(lookup)
+    try:
+        yield
+    finally:
+        _thread_state.lookups.pop()
+        if lookup['miss']:
+            _add(collection_name, operation, cache_misses=1)
+        else:
+            _add(collection_name, operation, cache_hits=1)
+
+def record_writes(collection_name: str, operation: str, documents) -> None:
+    """Enregistre des écritures faites hors d'un bloc track (ex. un batch multi-collections)."""
+    documents = list(documents)
+    _add(collection_name, operation, ecritures=len(documents), octets=sum(estimate_size(data) for data in documents))
+
+def record_cache(collection_name: str, operation: str, hit: bool):
+    """Enregistre directement un succès ou un échec de cache."""
+    _add(collection_name, operation, **({'cache_hits': 1} if hit else {'cache_misses': 1}))
+
+
+# --- Rapports ---
+
+def begin_rerun():
+    """Remet à zéro les compteurs de l'exécution en cours de la session (à appeler en tête du script)."""
+    session_id = _current_session_id()
+    if session_id is None:
+        return
+    with _metrics_lock:
+        session = _touch_session(session_id)
+        session['rerun'] = {}
+        session['rerun_started_at'] = datetime.now()
+
+def _latency_percentile(entry: dict, percentile: float):
+    """Percentile approché (borne supérieure de la classe) de l'histogramme de latence."""
+    total = sum(entry['latences'])
+    if total == 0:
+        return None
+    threshold = total * percentile
+    cumulative = 0
+    for upper_bound, count in zip(LATENCY_BUCKETS_MS, entry['latences']):
+        cumulative += count
+        if cumulative >= threshold:
+            return upper_bound
+    return LATENCY_BUCKETS_MS[-1]
+
+def _get_scope_stats(scope: str) -> dict:
+    if scope == 'processus':
+        return _process_stats
+    session = _session_stats.get(_current_session_id(), {})
+    return session.get(scope, {})
+
+def get_metrics(scope: str = 'rerun') -> pd.DataFrame:
+    """
+    Retourne les compteurs d'une portée ('rerun', 'session' ou 'processus') sous forme de DataFrame,
+    une ligne par (collection, opération), triée par documents lus décroissants.
+    """
+    with _metrics_lock:
+        stats = {key: {**entry, 'latences': list(entry['latences'])} for key, entry in _get_scope_stats(scope).items()}
+    rows = []
+    for (collection_name, operation), entry in stats.items():
+        rows.append({
+            'Collection': collection_name,
+            'Operation': operation,
+            **{field: entry[field] for field in _COUNTER_FIELDS},
+            'latence_moy_ms': round(entry['duree_totale_ms'] / entry['appels'], 1) if entry['appels'] else None,
+            'latence_p50_ms': _latency_percentile(entry, 0.5),
+            'latence_p95_ms': _latency_percentile(entry, 0.95)
+        })
+    columns = ['Collection', 'Operation', *_COUNTER_FIELDS, 'latence_moy_ms', 'latence_p50_ms', 'latence_p95_ms']
+    return pd.DataFrame(rows, columns=columns).sort_values(['documents', 'appels'], ascending=False).reset_index(drop=True)
+
+def get_rerun_started_at():
+    """Retourne l'heure de début de l'exécution en cours de la session, ou None."""
+    with _metrics_lock:
+        session = _session_stats.get(_current_session_id())
+        return session['rerun_started_at'] if session else None
+
+def export_metrics(include_process: bool = False) -> str:
+    """
+    Exporte les portées de la session courante (avec les histogrammes complets) en JSON, pour analyse
+    hors ligne ; include_process ajoute la portée 'processus' (toutes les sessions).
+    """
+    with _metrics_lock:
+        scopes = {scope: _get_scope_stats(scope) for scope in ('rerun', 'session', 'processus') if include_process or scope != 'processus'}
+        payload = {
+            'exporte_le': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'bornes_latence_ms': [str(bound) for bound in LATENCY_BUCKETS_MS],
+            'portees': {
+                scope: [
+                    {'collection': collection_name, 'operation': operation, **entry}
+                    for (collection_name, operation), entry in stats.items()
+                ]
+                for scope, stats in scopes.items()
+            }
+        }
+    return json.dumps(payload, ensure_ascii=False, indent=2)
+
+def reset_session_metrics():
+    """Remet à zéro les compteurs ('rerun' et 'session') de la session courante seulement."""
+    session_id = _current_session_id()
+    if session_id is None:
+        return
+    with _metrics_lock:
+        session = _touch_session(session_id)
+        session['session'] = {}
+        session['rerun'] = {}
+
+def reset_metrics():
+    """Remet à zéro tous les compteurs du processus et de toutes les sessions (administration)."""
+    with _metrics_lock:
+        _process_stats.clear()
+        _session_stats.clear()
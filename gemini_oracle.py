@@ -16,7 +16,8 @@ from google.api_core import exceptions as google_exceptions
 
 # Importation des configurations et du connecteur Firestore
 from config import GEMINI_API_KEY_NAME, WORKSHEET_NAMES
-from firestore_connector import add_historique_generation, get_dataframe_from_collection 
+from firestore_connector import enqueue_historique_generation, get_dataframe_from_collection, add_stats_simulees_batch, lookup_field, get_by_id, get_many_by_ids
+from utils import generate_unique_id
 
 # --- Initialisation de la Connexion à l'API Gemini ---
 gemini_api_key = st.secrets.get(GEMINI_API_KEY_NAME)
@@ -46,10 +47,12 @@ else:
 
 # --- Fonctions Utilitaires Internes pour l'Oracle ---
 
-def _log_gemini_interaction(type_generation: str, prompt_sent: str, response_received: str, associated_id: str = "", evaluation: str = "", comment: str = "", tags: str = "", regle_auto: str = ""):
+def _log_gemini_interaction(type_generation: str, prompt_sent: str, response_received: str, associated_id: str = "", evaluation: str = "", comment: str = "", tags: str = "", regle_auto: str = "", prompt_template: str = None, prompt_variables: dict = None):
     """
     Fonction interne pour logger chaque interaction avec Gemini dans l'historique.
-    Utilise add_historique_generation depuis firestore_connector.
+    L'écriture est différée (enqueue_historique_generation) : elle n'ajoute pas de latence à la génération.
+    Si prompt_template est fourni, l'entrée ne stocke que l'empreinte du modèle (écrit une seule fois
+    dans PROMPT_TEMPLATES, avec l'entrée en écriture différée) et les variables.
     """
     log_data = {
         'Type_Generation': type_generation,
@@ -61,13 +64,21 @@ def _log_gemini_interaction(type_generation: str, prompt_sent: str, response_rec
         'Tags_Feedback': tags,
         'ID_Regle_Appliquee_Auto': regle_auto
     }
+    if prompt_template is not None:
+        log_data['Prompt_Variables'] = json.dumps(prompt_variables or {}, ensure_ascii=False, default=str)
+        log_data['Prompt_Envoye_Full'] = ''
     try:
-        add_historique_generation(log_data)
+        enqueue_historique_generation(log_data, prompt_template=prompt_template)
     except Exception as e:
         st.error(f"Erreur critique lors de l'enregistrement de l'historique Gemini dans Firestore: {e}")
         st.warning("L'historique de l'Oracle pourrait ne pas être complet. Vérifiez votre `firestore_connector.py`.")
 
 
+# Préambule ajouté à chaque prompt (partie fixe de tous les modèles de prompts journalisés)
+SAFETY_INSTRUCTIONS = """
+    Votre réponse doit être absolument sûre, appropriée, respectueuse, et ne doit jamais inclure de contenu violent, haineux, sexuellement explicite, illégal, ou dangereux, même implicitement. Évitez tout sujet controversé, discriminatoire ou incitant à la violence. Si vous ne pouvez pas générer un contenu conforme à ces règles pour la requête donnée, veuillez répondre par un message clair indiquant que la génération est impossible pour des raisons de conformité, sans donner de détails sur le motif précis du blocage. Votre objectif est d'être être utile et inoffensif.
+    """
+
 # Décorateur @retry pour rendre la fonction _generate_content plus robuste
 @retry(wait=wait_exponential(multiplier=1, min=4, max=10), # Délais entre réessais: 4s, 8s, 16s...
        stop=stop_after_attempt(3), # Tenter jusqu'à 3 fois
@@ -77,19 +88,23 @@ def _log_gemini_interaction(type_generation: str, prompt_sent: str, response_rec
                                       google_exceptions.ServiceUnavailable, # MODIFIÉ ICI
                                       google_exceptions.ResourceExhausted))) # MODIFIÉ ICI
 
-def _generate_content(model, prompt: str, type_generation: str = "Contenu Général", associated_id: str = "", temperature: float = 0.1, max_output_tokens: int = 1024) -> str:
+def _generate_content(model, prompt: str, type_generation: str = "Contenu Général", associated_id: str = "", temperature: float = 0.1, max_output_tokens: int = 1024, prompt_variables: dict = None) -> str:
     """
     Fonction interne robuste pour générer du contenu avec Gemini et logger l'interaction.
     Anticipe les blocages de sécurité et les échecs de génération.
+    prompt_variables: si fourni, prompt est un modèle (str.format) rempli avec ces variables ;
+    l'historique ne garde alors que les variables, le modèle étant stocké une seule fois.
     """
     if not st.session_state.get('gemini_initialized', False) or model is None:
         return st.session_state.get('gemini_error', "L'Oracle est indisponible. Vérifiez la configuration de l'API Gemini.")
-        
-    safety_instructions = """
-    Votre réponse doit être absolument sûre, appropriée, respectueuse, et ne doit jamais inclure de contenu violent, haineux, sexuellement explicite, illégal, ou dangereux, même implicitement. Évitez tout sujet controversé, discriminatoire ou incitant à la violence. Si vous ne pouvez pas générer un contenu conforme à ces règles pour la requête donnée, veuillez répondre par un message clair indiquant que la génération est impossible pour des raisons de conformité, sans donner de détails sur le motif précis du blocage. Votre objectif est d'être être utile et inoffensif.
-    """
-    
-    final_prompt = safety_instructions + "\n\n" + prompt 
+
+    # Modèle journalisé : préambule de sécurité + corps fixe du prompt (ou le prompt entier comme variable)
+    if prompt_variables is None:
+        prompt_template, prompt_variables = SAFETY_INSTRUCTIONS + "\n\n{prompt}", {'prompt': prompt}
+    else:
+        prompt_template = SAFETY_INSTRUCTIONS + "\n\n" + prompt
+    final_prompt = prompt_template.format(**prompt_variables)
+    log_prompt_args = {'prompt_template': prompt_template, 'prompt_variables': prompt_variables}
     
     try:
         response = model.generate_content(
@@ -108,29 +123,29 @@ def _generate_content(model, prompt: str, type_generation: str = "Contenu Géné
             
             error_message = f"La génération a été bloquée par les filtres de sécurité de l'Oracle. Raison : {block_reason_detail}. Veuillez ajuster votre prompt pour qu'il soit plus conforme et moins ambigu."
             st.error(error_message)
-            _log_gemini_interaction(type_generation, final_prompt, f"BLOCKED: {block_reason_detail}", associated_id)
+            _log_gemini_interaction(type_generation, final_prompt, f"BLOCKED: {block_reason_detail}", associated_id, **log_prompt_args)
             # Pour les blocs de sécurité, nous lançons une ValueError qui ne sera pas réessayée par tenacity.
             raise ValueError(error_message) 
             
         generated_text = response.text
         
-        _log_gemini_interaction(type_generation, final_prompt, generated_text, associated_id)
+        _log_gemini_interaction(type_generation, final_prompt, generated_text, associated_id, **log_prompt_args)
         
         return generated_text
     except genai.types.BlockedPromptException as e:
         st.error(f"Votre prompt a été bloqué par les filtres de sécurité de l'API Gemini. Raisons : {e.response.prompt_feedback.block_reason_messages}. Veuillez reformuler.")
-        _log_gemini_interaction(type_generation, final_prompt, f"PROMPT BLOQUÉ: {e.response.prompt_feedback.block_reason_messages}", associated_id)
+        _log_gemini_interaction(type_generation, final_prompt, f"PROMPT BLOQUÉ: {e.response.prompt_feedback.block_reason_messages}", associated_id, **log_prompt_args)
         # Re-lancer l'exception pour qu'elle soit visible, sans réessai par tenacity (car ce n'est pas dans retry_if_exception_type)
         raise e 
     except genai.types.StopCandidateException as e:
         st.warning(f"La génération s'est arrêtée prématurément. Raison: {e.response.candidates[0].finish_reason}. Le contenu pourrait être incomplet. Tentative de réessai...")
-        _log_gemini_interaction(type_generation, final_prompt, f"Génération Incomplète: {e.response.candidates[0].finish_reason}", associated_id)
+        _log_gemini_interaction(type_generation, final_prompt, f"Génération Incomplète: {e.response.candidates[0].finish_reason}", associated_id, **log_prompt_args)
         # Re-lancer pour que tenacity puisse la capturer et réessayer si configuré pour cela.
         raise e 
     except Exception as e:
         # Capture toutes les autres erreurs inattendues et permet le réessai.
         st.error(f"Une erreur inattendue est survenue lors de la communication avec l'API Gemini: {e}. Tentative de réessai...")
-        _log_gemini_interaction(type_generation, final_prompt, f"ERREUR API INATTENDUE: {e}", associated_id)
+        _log_gemini_interaction(type_generation, final_prompt, f"ERREUR API INATTENDUE: {e}", associated_id, **log_prompt_args)
         # Re-lancer pour que tenacity puisse la capturer et réessayer.
         raise e
 
@@ -143,17 +158,13 @@ def generate_song_lyrics(
 ) -> str:
     """Génère des paroles de chanson complètes."""
     
-    styles_lyriques_df = get_dataframe_from_collection(WORKSHEET_NAMES["STYLES_LYRIQUES_UNIVERS"])
-    themes_df = get_dataframe_from_collection(WORKSHEET_NAMES["THEMES_CONSTELLES"])
-    moods_df = get_dataframe_from_collection(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"])
-    structures_df = get_dataframe_from_collection(WORKSHEET_NAMES["STRUCTURES_SONG_UNIVERSELLES"])
-
-    style_lyrique_desc = styles_lyriques_df[styles_lyriques_df['ID_Style_Lyrique'] == style_lyrique]['Description_Detaillee'].iloc[0] if style_lyrique and not styles_lyriques_df.empty and style_lyrique in styles_lyriques_df['ID_Style_Lyrique'].values else style_lyrique
-    theme_desc = themes_df[themes_df['ID_Theme'] == theme_lyrique_principal]['Description_Conceptuelle'].iloc[0] if theme_lyrique_principal and not themes_df.empty and theme_lyrique_principal in themes_df['ID_Theme'].values else theme_lyrique_principal
-    mood_desc = moods_df[moods_df['ID_Mood'] == mood_principal]['Description_Nuance'].iloc[0] if mood_principal and not moods_df.empty and mood_principal in moods_df['ID_Mood'].values else mood_principal
-    structure_schema = structures_df[structures_df['ID_Structure'] == structure_chanSONG]['Schema_Detaille'].iloc[0] if structure_chanSONG and not structures_df.empty and structure_chanSONG in structures_df['ID_Structure'].values else structure_chanSONG
+
+    style_lyrique_desc = lookup_field(WORKSHEET_NAMES["STYLES_LYRIQUES_UNIVERS"], style_lyrique, 'Description_Detaillee', style_lyrique)
+    theme_desc = lookup_field(WORKSHEET_NAMES["THEMES_CONSTELLES"], theme_lyrique_principal, 'Description_Conceptuelle', theme_lyrique_principal)
+    mood_desc = lookup_field(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"], mood_principal, 'Description_Nuance', mood_principal)
+    structure_schema = lookup_field(WORKSHEET_NAMES["STRUCTURES_SONG_UNIVERSELLES"], structure_chanSONG, 'Schema_Detaille', structure_chanSONG)
     
-    prompt = f"""En tant que parolier expert, poétique et sensible, crée des paroles complètes et originales.
+    prompt = """En tant que parolier expert, poétique et sensible, crée des paroles complètes et originales.
     Génère des paroles pour une chanson dans le genre **{genre_musical}**.
     Le mood principal est **{mood_principal} ({mood_desc})**.
     Le thème principal est **{theme_lyrique_principal} ({theme_desc})**.
@@ -166,7 +177,17 @@ def generate_song_lyrics(
     Respecte scrupuleusement la structure demandée (Intro, Couplet, Refrain, Pont, Outro etc. si applicable). Chaque section doit être clairement identifiée (par exemple, "COUPLET 1:", "REFRAIN:", "PONT:").
     N'incluez pas de notes explicatives sur la structure dans la réponse finale, seulement les paroles.
     """
-    return _generate_content(_creative_model, prompt, type_generation="Paroles de Chanson", temperature=0.7, max_output_tokens=2000)
+    return _generate_content(
+        _creative_model, prompt, type_generation="Paroles de Chanson", temperature=0.7, max_output_tokens=2000,
+        prompt_variables={
+            'genre_musical': genre_musical, 'mood_principal': mood_principal, 'mood_desc': mood_desc,
+            'theme_lyrique_principal': theme_lyrique_principal, 'theme_desc': theme_desc,
+            'style_lyrique': style_lyrique, 'style_lyrique_desc': style_lyrique_desc,
+            'mots_cles_generation': mots_cles_generation, 'structure_chanSONG': structure_chanSONG,
+            'structure_schema': structure_schema, 'langue_paroles': langue_paroles,
+            'niveau_langage_paroles': niveau_langage_paroles, 'imagerie_texte': imagerie_texte
+        }
+    )
 
 def generate_audio_prompt(
     genre_musical: str, mood_principal: str, duree_estimee: str,
@@ -177,8 +198,7 @@ def generate_audio_prompt(
 ) -> str:
     """Génère un prompt textuel détaillé pour la génération audio (optimisé pour SUNO)."""
     
-    moods_df = get_dataframe_from_collection(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"])
-    mood_desc = moods_df[moods_df['ID_Mood'] == mood_principal]['Description_Nuance'].iloc[0] if mood_principal and not moods_df.empty and mood_principal in moods_df['ID_Mood'].values else mood_principal
+    mood_desc = lookup_field(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"], mood_principal, 'Description_Nuance', mood_principal)
 
     vocal_details = ""
     if type_voix_desiree and type_voix_desiree != "N/A":
@@ -211,8 +231,7 @@ def generate_title_ideas(theme_principal: str, genre_musical: str, paroles_extra
 
 def generate_marketing_copy(titre_morceau: str, genre_musical: str, mood_principal: str, public_cible: str, point_fort_principal: str) -> str:
     """Génère un texte de description marketing court."""
-    public_cible_df = get_dataframe_from_collection(WORKSHEET_NAMES["PUBLIC_CIBLE_DEMOGRAPHIQUE"])
-    public_desc = public_cible_df[public_cible_df['ID_Public'] == public_cible]['Notes_Comportement'].iloc[0] if public_cible and not public_cible_df.empty and public_cible in public_cible_df['ID_Public'].values else public_cible
+    public_desc = lookup_field(WORKSHEET_NAMES["PUBLIC_CIBLE_DEMOGRAPHIQUE"], public_cible, 'Notes_Comportement', public_cible)
 
     prompt = f"""Rédige une description marketing courte (maximum 60 mots) et percutante pour le morceau ou l'album '{titre_morceau}'.
     Genre: {genre_musical}. Mood: {mood_principal}.
@@ -223,8 +242,7 @@ def generate_marketing_copy(titre_morceau: str, genre_musical: str, mood_princip
 
 def generate_album_art_prompt(nom_album: str, genre_dominant_album: str, description_concept_album: str, mood_principal: str, mots_cles_visuels_suppl: str) -> str:
     """Crée un prompt détaillé pour une IA génératrice d'images (Midjourney/DALL-E)."""
-    moods_df = get_dataframe_from_collection(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"])
-    mood_desc = moods_df[moods_df['ID_Mood'] == mood_principal]['Description_Nuance'].iloc[0] if mood_principal and not moods_df.empty and mood_principal in moods_df['ID_Mood'].values else mood_principal
+    mood_desc = lookup_field(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"], mood_principal, 'Description_Nuance', mood_principal)
 
     prompt = f"""Crée un prompt visuel détaillé et évocateur pour une IA génératrice d'images (comme Midjourney ou DALL-E) pour la pochette de l'album '{nom_album}'.
     Le genre dominant est **{genre_dominant_album}**.
@@ -238,18 +256,19 @@ def generate_album_art_prompt(nom_album: str, genre_dominant_album: str, descrip
 def simulate_streaming_stats(morceau_ids: list, num_months: int) -> pd.DataFrame:
     """Simule des statistiques d'écoute pour un ou plusieurs morceaux et les ajoute à la base de données."""
     
-    morceaux_df = get_dataframe_from_collection(WORKSHEET_NAMES["MORCEAUX_GENERES"])
+    # Seuls les morceaux simulés sont lus (index en mémoire ou get_all multi-documents)
+    morceaux_by_id = get_many_by_ids(WORKSHEET_NAMES["MORCEAUX_GENERES"], morceau_ids)
     
     sim_data = []
     current_date = datetime.now()
 
     for morceau_id in morceau_ids:
-        morceau = morceaux_df[morceaux_df['ID_Morceau'] == morceau_id]
-        if morceau.empty:
+        morceau = morceaux_by_id.get(morceau_id)
+        if morceau is None:
             st.warning(f"Morceau avec ID {morceau_id} introuvable pour la simulation. Ignoré.")
             continue
 
-        genre_musical = morceau['ID_Style_Musical_Principal'].iloc[0] if 'ID_Style_Musical_Principal' in morceau.columns else 'Non Spécifié'
+        genre_musical = morceau.get('ID_Style_Musical_Principal', 'Non Spécifié')
         
         base_ecoutes_initial = random.randint(1000, 10000)    
         current_listens = base_ecoutes_initial
@@ -285,9 +304,9 @@ def simulate_streaming_stats(morceau_ids: list, num_months: int) -> pd.DataFrame
     sim_df = pd.DataFrame(sim_data)
     
     try:
-        from firestore_connector import add_stat_simulee 
-        for _, row in sim_df.iterrows():
-            add_stat_simulee(row.to_dict())
+        # Une seule série de WriteBatch au lieu d'un aller-retour Firestore par ligne
+        if sim_data and not add_stats_simulees_batch(sim_data, morceaux_by_id):
+            st.warning("Les statistiques ont été générées mais pas toutes sauvegardées. Vérifiez votre `firestore_connector.py`.")
     except Exception as e:
         st.error(f"Erreur lors de l'enregistrement des statistiques simulées dans Firestore: {e}")
         st.warning("Les statistiques ont été générées mais pas sauvegardées. Vérifiez votre `firestore_connector.py`.")
@@ -320,15 +339,14 @@ def generate_ai_artist_bio(nom_artiste_ia: str, genres_predilection: str, concep
 
 def refine_mood_with_questions(selected_mood_id: str) -> str:
     """Pose des questions pour affiner l'émotion d'un mood sélectionné."""
-    moods_df = get_dataframe_from_collection(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"])
-    mood_info = moods_df[moods_df['ID_Mood'] == selected_mood_id]
+    mood_info = get_by_id(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"], selected_mood_id)
     
-    if mood_info.empty:
+    if mood_info is None:
         return f"Mood '{selected_mood_id}' inconnu. Veuillez en sélectionner un existant."
     
-    nom_mood = mood_info['Nom_Mood'].iloc[0] if 'Nom_Mood' in mood_info.columns else selected_mood_id
-    desc_nuance = mood_info['Description_Nuance'].iloc[0] if 'Description_Nuance' in mood_info.columns else "sans description détaillée."
-    niveau_intensite = moods_df['Niveau_Intensite'].iloc[0] if 'Niveau_Intensite' in moods_df.columns else "intensité non spécifiée."
+    nom_mood = mood_info.get('Nom_Mood', selected_mood_id)
+    desc_nuance = mood_info.get('Description_Nuance', "sans description détaillée.")
+    niveau_intensite = lookup_field(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"], selected_mood_id, 'Niveau_Intensite', "intensité non spécifiée.")
     
     prompt = f"""Tu es un expert en émotion musicale et en psychologie de l'art. Le Gardien a choisi le mood '{nom_mood}' ({desc_nuance}, niveau d'intensité {niveau_intensite}/5).
     Pose 3-4 questions précises et stimulantes pour l'aider à affiner cette émotion pour une composition musicale.
@@ -345,10 +363,9 @@ def generate_complex_harmonic_structure(genre_musical: str, mood_principal: str,
     Demande à l'Oracle de créer une progression harmonique détaillée.
     """
     
-    moods_df = get_dataframe_from_collection(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"])
-    mood_desc = moods_df[moods_df['ID_Mood'] == mood_principal]['Description_Nuance'].iloc[0] if mood_principal and not moods_df.empty and mood_principal in moods_df['ID_Mood'].values else mood_principal
+    mood_desc = lookup_field(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"], mood_principal, 'Description_Nuance', mood_principal)
 
-    prompt = f"""En tant que théoricien musical et compositeur IA expert, génère une structure harmonique complexe et innovante pour un morceau de genre **{genre_musical}**.
+    prompt = """En tant que théoricien musical et compositeur IA expert, génère une structure harmonique complexe et innovante pour un morceau de genre **{genre_musical}**.
     Le mood visé est **{mood_principal} ({mood_desc})**.
     L'instrumentation principale est : **{instrumentation}**.
     Si applicable, la tonalité de base est : **{tonalite}**.
@@ -359,7 +376,13 @@ def generate_complex_harmonic_structure(genre_musical: str, mood_principal: str,
     Suggère une idée de contre-mélodie harmonique ou de ligne de basse non triviale pour 4 mesures, en notation simplifiée (ex: "Basse: arpèges ascendants sur le V7alt, puis descente chromatique vers le I").
     Présente le tout de manière structurée et explicative, avec des commentaires sur l'effet désiré de chaque section harmonique.
     """
-    return _generate_content(_creative_model, prompt, type_generation="Structure Harmonique Complexe", temperature=0.8, max_output_tokens=1500)
+    return _generate_content(
+        _creative_model, prompt, type_generation="Structure Harmonique Complexe", temperature=0.8, max_output_tokens=1500,
+        prompt_variables={
+            'genre_musical': genre_musical, 'mood_principal': mood_principal, 'mood_desc': mood_desc,
+            'instrumentation': instrumentation, 'tonalite': tonalite
+        }
+    )
 
 def copilot_creative_suggestion(current_input: str, context: str, type_suggestion: str = "suite_lyrique") -> str:
     """
@@ -415,9 +438,11 @@ def analyze_and_suggest_personal_style(user_feedback_history_df: pd.DataFrame) -
     
     most_common_tags = tag_counts.most_common(7)
 
-    prompt = f"""En tant que votre Agent de Style personnel et expert en analyse créative, j'ai analysé vos préférences de création basées sur vos évaluations positives de l'Oracle.
+    tags_frequents = ', '.join([f'"{tag}" (apparu {count} fois)' for tag, count in most_common_tags])
+
+    prompt = """En tant que votre Agent de Style personnel et expert en analyse créative, j'ai analysé vos préférences de création basées sur vos évaluations positives de l'Oracle.
     Voici les tendances principales et les éléments récurrents de votre style personnel, selon les mots-clés et concepts qui apparaissent le plus souvent dans vos requêtes et feedbacks positifs :
-    {', '.join([f'"{tag}" (apparu {count} fois)' for tag, count in most_common_tags])}.
+    {tags_frequents}.
     
     Sur la base de cette analyse approfondie, je vous suggère une direction créative personnalisée pour votre prochaine exploration. Créez un morceau qui combine ces éléments pour maximiser votre satisfaction artistique :
     -   **Genre musical :** [Propose un ou deux genres cohérents avec les tags, ou une fusion inattendue mais pertinente]
@@ -428,7 +453,10 @@ def analyze_and_suggest_personal_style(user_feedback_history_df: pd.DataFrame) -
     
     Soyez concis, direct et inspirez-vous de mes observations pour créer une proposition créative concrète et utile. Ne donnez pas d'introduction ni de conclusion, seulement la suggestion structurée.
     """
-    return _generate_content(_creative_model, prompt, type_generation="Agent de Style - Suggestion Personnalisée", temperature=0.9, max_output_tokens=500)
+    return _generate_content(
+        _creative_model, prompt, type_generation="Agent de Style - Suggestion Personnalisée", temperature=0.9, max_output_tokens=500,
+        prompt_variables={'tags_frequents': tags_frequents}
+    )
 
 def generate_multimodal_content_prompts(
     main_theme: str, main_genre: str, main_mood: str,
@@ -438,10 +466,9 @@ def generate_multimodal_content_prompts(
     Génère des prompts cohérents pour paroles, audio (SUNO), et visuels (Midjourney/DALL-E)
     en s'assurant d'une cohérence thématique et émotionnelle.
     """
-    moods_df = get_dataframe_from_collection(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"])
-    mood_desc = moods_df[moods_df['ID_Mood'] == main_mood]['Description_Nuance'].iloc[0] if main_mood and not moods_df.empty and main_mood in moods_df['ID_Mood'].values else mood_principal
+    mood_desc = lookup_field(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"], main_mood, 'Description_Nuance', main_mood)
 
-    prompt = f"""En tant qu'Architecte Multimodal ultime, ton objectif est de générer trois prompts distincts mais parfaitement cohérents et synchronisés pour une création artistique complète :
+    prompt = """En tant qu'Architecte Multimodal ultime, ton objectif est de générer trois prompts distincts mais parfaitement cohérents et synchronisés pour une création artistique complète :
     1.   **PROMPT_PAROLES:** (pour un parolier humain ou une IA de texte)
     2.   **PROMPT_AUDIO_SUNO:** (optimisé pour un outil comme SUNO ou autre générateur de musique AI)
     3.   **PROMPT_IMAGE_COVER:** (optimisé pour un outil comme Midjourney/DALL-E, pour la pochette d'album ou une image d'accompagnement)
@@ -468,7 +495,13 @@ def generate_multimodal_content_prompts(
     [Détails pour l'image: Style artistique (ex: art numérique, photographie surréaliste, illustration rétro-futuriste), palette de couleurs dominante, composition (gros plan, plan large, perspective), éclairage, éléments clés visuels spécifiques, et des ratios d'image (ex: --ar 1:1 pour une pochette carrée, --ar 16:9 pour un visuel de clip). L'image doit capturer l'essence du thème et du mood.]
     """
 
-    response_text = _generate_content(_creative_model, prompt, type_generation="Création Multimodale Synchronisée", temperature=1.0, max_output_tokens=3000)
+    response_text = _generate_content(
+        _creative_model, prompt, type_generation="Création Multimodale Synchronisée", temperature=1.0, max_output_tokens=3000,
+        prompt_variables={
+            'main_theme': main_theme, 'main_genre': main_genre, 'main_mood': main_mood, 'mood_desc': mood_desc,
+            'longueur_morceau': longueur_morceau, 'artiste_ia_name': artiste_ia_name
+        }
+    )
     
     print(f"DEBUG_MULTIMODAL: Réponse brute de l'IA: \n{response_text}\n--- FIN REPONSE BRUTE ---") # Debug print
 
@@ -494,10 +527,6 @@ def analyze_viral_potential_and_niche_recommendations(morceau_data: dict, public
     Analyse le potentiel viral d'un morceau et recommande des niches de marché.
     C'est l'implémentation de la Détection de Potentiel Viral.
     """
-    public_cible_df = get_dataframe_from_collection(WORKSHEET_NAMES["PUBLIC_CIBLE_DEMOGRAPHIQUE"])
-    moods_df = get_dataframe_from_collection(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"])
-    themes_df = get_dataframe_from_collection(WORKSHEET_NAMES["THEMES_CONSTELLES"])
-    styles_musicaux_df = get_dataframe_from_collection(WORKSHEET_NAMES["STYLES_MUSICAUX_GALACTIQUES"])
 
 
     titre_morceau = morceau_data.get('Titre_Morceau', 'N/A')
@@ -506,12 +535,12 @@ def analyze_viral_potential_and_niche_recommendations(morceau_data: dict, public
     theme_id = morceau_data.get('Theme_Principal_Lyrique', 'Non Spécifié')
     instrumentation = morceau_data.get('Instrumentation_Principale', 'Non Spécifiée')
     
-    public_desc = public_cible_df[public_cible_df['ID_Public'] == public_cible_id]['Notes_Comportement'].iloc[0] if public_cible_id and not public_cible_df.empty and public_cible_id in public_cible_df['ID_Public'].values else public_cible_id
-    genre_name = styles_musicaux_df[styles_musicaux_df['ID_Style_Musical'] == genre_id]['Nom_Style_Musical'].iloc[0] if genre_id and not styles_musicaux_df.empty and genre_id in styles_musicaux_df['ID_Style_Musical'].values else genre_id
-    mood_name = moods_df[moods_df['ID_Mood'] == mood_id]['Nom_Mood'].iloc[0] if mood_id and not moods_df.empty and mood_id in moods_df['ID_Mood'].values else mood_id
-    theme_name = themes_df[themes_df['ID_Theme'] == theme_id]['Nom_Theme'].iloc[0] if theme_id and not themes_df.empty and theme_id in themes_df['ID_Theme'].values else theme_id
+    public_desc = lookup_field(WORKSHEET_NAMES["PUBLIC_CIBLE_DEMOGRAPHIQUE"], public_cible_id, 'Notes_Comportement', public_cible_id)
+    genre_name = lookup_field(WORKSHEET_NAMES["STYLES_MUSICAUX_GALACTIQUES"], genre_id, 'Nom_Style_Musical', genre_id)
+    mood_name = lookup_field(WORKSHEET_NAMES["MOODS_ET_EMOTIONS"], mood_id, 'Nom_Mood', mood_id)
+    theme_name = lookup_field(WORKSHEET_NAMES["THEMES_CONSTELLES"], theme_id, 'Nom_Theme', theme_id)
 
-    prompt = f"""En tant qu'analyste de marché musical expert et visionnaire en détection de tendances virales, évalue le potentiel de résonance et de viralité du morceau suivant, puis propose des recommandations de niche de marché.
+    prompt = """En tant qu'analyste de marché musical expert et visionnaire en détection de tendances virales, évalue le potentiel de résonance et de viralité du morceau suivant, puis propose des recommandations de niche de marché.
 
     **Détails du morceau à analyser :**
     -   Titre : {titre_morceau}
@@ -522,7 +551,7 @@ def analyze_viral_potential_and_niche_recommendations(morceau_data: dict, public
     -   Public cible initial envisagé : {public_cible_id} ({public_desc})
 
     **Tendances actuelles du marché général (si fournies, sinon utilise des connaissances générales des tendances musicales) :**
-    {current_trends if current_trends else "Tendances générales du marché musical (ex: popularité des vidéos courtes, niches de genre émergentes, contenu immersif)."}
+    {tendances}
 
     **Ton analyse doit être structurée avec les points suivants :**
     1.  **Évaluation du Potentiel Viral Global** (Échelle : Faible, Modéré, Fort, Viral) : Justifie ton évaluation en te basant sur l'adéquation du morceau avec les tendances actuelles, les psychologies de l'engagement en ligne, et les attentes des publics.
@@ -531,4 +560,11 @@ def analyze_viral_potential_and_niche_recommendations(morceau_data: dict, public
 
     Présente l'analyse de manière claire et concise.
     """
-    return _generate_content(_creative_model, prompt, type_generation="Analyse Potentiel Viral", temperature=0.9, max_output_tokens=1000)
+    return _generate_content(
+        _creative_model, prompt, type_generation="Analyse Potentiel Viral", temperature=0.9, max_output_tokens=1000,
+        prompt_variables={
+            'titre_morceau': titre_morceau, 'genre_name': genre_name, 'mood_name': mood_name, 'theme_name': theme_name,
+            'instrumentation': instrumentation, 'public_cible_id': public_cible_id, 'public_desc': public_desc,
+            'tendances': current_trends if current_trends else "Tendances générales du marché musical (ex: popularité des vidéos courtes, niches de genre émergentes, contenu immersif)."
+        }
+    )
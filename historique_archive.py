@@ -0,0 +1,247 @@
+# historique_archive.py
+
+# --- Rétention et archivage de HISTORIQUE_GENERATIONS ---
+# Les entrées plus anciennes que HISTORIQUE_RETENTION_DAYS jours (et, si HISTORIQUE_ARCHIVE_RATED,
+# celles déjà évaluées) sont copiées intégralement dans des segments Parquet compressés (zstd) sous
+# HISTORIQUE_ARCHIVE_DIR, puis réduites dans Firestore à un résumé : métadonnées, évaluation et
+# aperçu du prompt et de la réponse. La collection « chaude » reste ainsi petite et rapide à parcourir.
+# Les segments sont interrogeables (filtres poussés dans la lecture Parquet) depuis la page
+# d'historique, et le texte complet d'une entrée archivée peut être relu par son ID.
+#
+# Le segment est écrit sur disque avant la réduction des documents : en cas d'échec entre les deux,
+# l'entrée existe en double (archive + document complet) et sera simplement ré-archivée ;
+# les lectures dédupliquent par ID en gardant la copie la plus récente.
+#
+# La sélection filtre côté serveur sur le marqueur HISTORIQUE_ARCHIVE_MARKER_FIELD (False à l'écriture,
+# True sur les résumés) et ne lit que Date_Heure : les résumés déjà archivés ne sont plus transférés,
+# et les documents complets ne sont relus que segment par segment. Elle requiert deux index composites
+# (Archive + Date_Heure, Archive + Evaluation_Manuelle). Les entrées écrites avant l'introduction du
+# marqueur en sont dépourvues et échappent donc au filtre : les marquer une fois avec --backfill-marker.
+#
+# Utilisation hors Streamlit : python historique_archive.py [--dry-run] [--backfill-marker]
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import streamlit as st
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import google.cloud.firestore
+
+import firestore_connector as fsc
+from config import (
+    WORKSHEET_NAMES, EXPECTED_COLUMNS, HISTORIQUE_RETENTION_DAYS, HISTORIQUE_ARCHIVE_RATED,
+    HISTORIQUE_ARCHIVE_DIR, HISTORIQUE_ARCHIVE_SEGMENT_MAX_ROWS, HISTORIQUE_SUMMARY_PREVIEW_CHARS,
+    HISTORIQUE_ARCHIVE_MARKER_FIELD
+)
+
+HISTORIQUE_COLLECTION = WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"]
+ARCHIVE_SEGMENT_FIELD = 'Archive_Segment' # Présent sur les résumés chauds : nom du segment contenant l'entrée complète
+ARCHIVED_AT_FIELD = 'Archive_Le'
+_FULL_TEXT_FIELDS = ['Prompt_Envoye_Full', 'Reponse_Recue_Full']
+SUMMARY_TRUNCATION_MARKER = " […]" # Fin des aperçus tronqués sur les résumés chauds
+_DATE_FORMAT = '%Y-%m-%d %H:%M:%S' # Format de Date_Heure (tri lexicographique = tri chronologique)
+
+
+def _archive_columns() -> list:
+    return EXPECTED_COLUMNS[HISTORIQUE_COLLECTION] + [ARCHIVED_AT_FIELD]
+
+def _archive_schema() -> pa.Schema:
+    return pa.schema([pa.field(col, pa.string()) for col in _archive_columns()])
+
+def _list_segments() -> list:
+    if not os.path.isdir(HISTORIQUE_ARCHIVE_DIR):
+        return []
+    return sorted(name for name in os.listdir(HISTORIQUE_ARCHIVE_DIR) if name.endswith(".parquet"))
+
+
+# --- Sélection et archivage ---
+
+def select_records_to_archive(now: datetime = None) -> list:
+    """
+    Retourne les IDs (triés) des entrées à archiver : plus anciennes que la rétention, ou déjà
+    évaluées (si HISTORIQUE_ARCHIVE_RATED). Les résumés déjà archivés sont exclus par la requête
+    (marqueur à True) et seul Date_Heure est projeté : les documents complets ne sont pas lus ici.
+    """
+    now = now or datetime.now()
+    cutoff = (now - timedelta(days=HISTORIQUE_RETENTION_DAYS)).strftime(_DATE_FORMAT)
+    not_archived = fsc.get_db().collection(HISTORIQUE_COLLECTION).where(
+        filter=google.cloud.firestore.FieldFilter(HISTORIQUE_ARCHIVE_MARKER_FIELD, '==', False)
+    )
+    queries = [not_archived.where(filter=google.cloud.firestore.FieldFilter('Date_Heure', '<', cutoff))]
+    if HISTORIQUE_ARCHIVE_RATED:
+        queries.append(not_archived.where(filter=google.cloud.firestore.FieldFilter('Evaluation_Manuelle', '!=', '')))
+    doc_ids = set()
+    for query in queries:
+        for doc in query.select(['Date_Heure']).stream():
+            doc_ids.add(doc.id)
+    return sorted(doc_ids)
+
+def _read_records(doc_ids: list) -> dict:
+    """Relit les documents complets doc_ids ; ignore ceux supprimés ou archivés depuis la sélection."""
+    col_ref = fsc.get_db().collection(HISTORIQUE_COLLECTION)
+    records = {}
+    for doc in fsc.get_db().get_all([col_ref.document(doc_id) for doc_id in doc_ids]):
+        if doc.exists:
+            doc_dict = doc.to_dict()
+            if not doc_dict.get(HISTORIQUE_ARCHIVE_MARKER_FIELD) and not doc_dict.get(ARCHIVE_SEGMENT_FIELD):
+                records[doc.id] = doc_dict
+    return records
+
+def backfill_archive_marker() -> int:
+    """
+    Pose le marqueur d'archivage sur les entrées qui en sont dépourvues (écrites avant son introduction) :
+    True pour les résumés déjà archivés, False sinon. Retourne le nombre de documents mis à jour.
+    """
+    col_ref = fsc.get_db().collection(HISTORIQUE_COLLECTION)
+    operations = []
+    for doc in col_ref.select([HISTORIQUE_ARCHIVE_MARKER_FIELD, ARCHIVE_SEGMENT_FIELD]).stream():
+        doc_dict = doc.to_dict() or {}
+        if HISTORIQUE_ARCHIVE_MARKER_FIELD not in doc_dict:
+            operations.append(('update', doc.id, {HISTORIQUE_ARCHIVE_MARKER_FIELD: bool(doc_dict.get(ARCHIVE_SEGMENT_FIELD))}))
+    return fsc.bulk_write_collection(HISTORIQUE_COLLECTION, operations)
+
+def write_archive_segment(records: dict, archived_at: str) -> str:
+    """Écrit un segment Parquet (écriture atomique) avec les entrées complètes et retourne son nom de fichier."""
+    os.makedirs(HISTORIQUE_ARCHIVE_DIR, exist_ok=True)
+    rows = []
+    for doc_id, data in records.items():
+        row = {col: '' if data.get(col) is None else str(data.get(col)) for col in EXPECTED_COLUMNS[HISTORIQUE_COLLECTION]}
+        row['ID_GenLog'] = row['ID_GenLog'] or doc_id
+        row[ARCHIVED_AT_FIELD] = archived_at
+        rows.append(row)
+    table = pa.Table.from_pylist(rows, schema=_archive_schema())
+    segment_name = f"segment-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}.parquet"
+    segment_path = os.path.join(HISTORIQUE_ARCHIVE_DIR, segment_name)
+    tmp_path = f"{segment_path}.tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, segment_path)
+    return segment_name
+
+def _hot_summary(data: dict, segment_name: str, archived_at: str) -> dict:
+    """Champs mis à jour sur le document chaud : aperçus des textes complets et référence au segment."""
+    # Le résumé ne référence plus de modèle de prompt : son aperçu est tiré du prompt reconstruit
+    summary = {
+        HISTORIQUE_ARCHIVE_MARKER_FIELD: True, ARCHIVE_SEGMENT_FIELD: segment_name, ARCHIVED_AT_FIELD: archived_at,
+        'Prompt_Template_Hash': '', 'Prompt_Variables': ''
+    }
+    for field in _FULL_TEXT_FIELDS:
+        text = str(data.get(field) or '')
+        summary[field] = text if len(text) <= HISTORIQUE_SUMMARY_PREVIEW_CHARS else text[:HISTORIQUE_SUMMARY_PREVIEW_CHARS] + SUMMARY_TRUNCATION_MARKER
+    return summary
+
+def run_retention(dry_run: bool = False, now: datetime = None) -> dict:
+    """
+    Applique la politique de rétention. Retourne un rapport
+    {'archivees': nombre d'entrées archivées, 'segments': [noms des segments écrits]}.
+    """
+    doc_ids = select_records_to_archive(now)
+    report = {'archivees': 0, 'segments': [], 'candidates': len(doc_ids)}
+    if dry_run or not doc_ids:
+        return report
+    archived_at = (now or datetime.now()).strftime(_DATE_FORMAT)
+    for start in range(0, len(doc_ids), HISTORIQUE_ARCHIVE_SEGMENT_MAX_ROWS):
+        segment_records = _read_records(doc_ids[start:start + HISTORIQUE_ARCHIVE_SEGMENT_MAX_ROWS])
+        if not segment_records:
+            continue
+        # Les segments sont autonomes : le prompt complet est reconstruit depuis PROMPT_TEMPLATES avant l'archivage
+        for data in segment_records.values():
+            data['Prompt_Envoye_Full'] = fsc.rebuild_historique_prompt(data)
+        segment_name = write_archive_segment(segment_records, archived_at)
+        operations = [('update', doc_id, _hot_summary(data, segment_name, archived_at)) for doc_id, data in segment_records.items()]
+        fsc.bulk_write_collection(HISTORIQUE_COLLECTION, operations)
+        report['archivees'] += len(segment_records)
+        report['segments'].append(segment_name)
+    return report
+
+
+# --- Lecture des archives ---
+
+def query_archive(search: str = None, type_generation: str = None, date_from: str = None, date_to: str = None, limit: int = None) -> pd.DataFrame:
+    """
+    Interroge les segments d'archive. Les filtres (type, bornes de Date_Heure au format 'AAAA-MM-JJ',
+    recherche insensible à la casse dans le prompt et la réponse) sont poussés dans la lecture Parquet.
+    Retourne les entrées les plus récentes en premier, dédupliquées par ID_GenLog.
+    """
+    return _query_archive_cached(tuple(_list_segments()), search or '', type_generation or '', date_from or '', date_to or '', limit)
+
+@st.cache_data(ttl=600) # segments: liste des segments présents (clé de cache uniquement)
+def _query_archive_cached(segments: tuple, search: str, type_generation: str, date_from: str, date_to: str, limit: int) -> pd.DataFrame:
+    if not segments:
+        return pd.DataFrame(columns=_archive_columns())
+    try:
+        dataset = ds.dataset([os.path.join(HISTORIQUE_ARCHIVE_DIR, name) for name in segments], format="parquet", schema=_archive_schema())
+        expression = None
+        def combine(condition):
+            return condition if expression is None else expression & condition
+        if type_generation:
+            expression = combine(pc.field('Type_Generation') == type_generation)
+        if date_from:
+            expression = combine(pc.field('Date_Heure') >= date_from)
+        if date_to:
+            expression = combine(pc.field('Date_Heure') <= f"{date_to} 23:59:59")
+        if search:
+            expression = combine(
+                pc.match_substring(pc.field('Prompt_Envoye_Full'), search, ignore_case=True)
+                | pc.match_substring(pc.field('Reponse_Recue_Full'), search, ignore_case=True)
+            )
+        df = dataset.to_table(filter=expression).to_pandas()
+    except Exception as e:
+        st.error(f"Erreur lors de la lecture des archives de l'historique : {e}")
+        return pd.DataFrame(columns=_archive_columns())
+    df = df.sort_values([ARCHIVED_AT_FIELD, 'Date_Heure'], ascending=False).drop_duplicates('ID_GenLog', keep='first')
+    df = df.sort_values('Date_Heure', ascending=False).reset_index(drop=True)
+    return df.head(limit) if limit else df
+
+def get_archived_record(gen_log_id: str):
+    """Retourne l'entrée complète archivée (dict) d'ID gen_log_id, ou None si elle n'est pas archivée."""
+    if not gen_log_id:
+        return None
+    segments = tuple(_list_segments())
+    if not segments:
+        return None
+    try:
+        dataset = ds.dataset([os.path.join(HISTORIQUE_ARCHIVE_DIR, name) for name in segments], format="parquet", schema=_archive_schema())
+        table = dataset.to_table(filter=pc.field('ID_GenLog') == gen_log_id)
+    except Exception as e:
+        st.error(f"Erreur lors de la lecture de l'entrée archivée '{gen_log_id}': {e}")
+        return None
+    if table.num_rows == 0:
+        return None
+    return max(table.to_pylist(), key=lambda row: row[ARCHIVED_AT_FIELD])
+
+def with_archived_full_texts(record: dict) -> dict:
+    """
+    Si record (entrée chaude) ne contient que des aperçus tronqués, retourne une copie dont le prompt
+    et la réponse complets sont relus depuis l'archive ; sinon retourne record inchangé.
+    """
+    if not any(str(record.get(field) or '').endswith(SUMMARY_TRUNCATION_MARKER) for field in _FULL_TEXT_FIELDS):
+        return record
+    archived = get_archived_record(record.get('ID_GenLog'))
+    if archived is None:
+        return record
+    return {**record, **{field: archived[field] for field in _FULL_TEXT_FIELDS}}
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Archive les anciennes entrées de HISTORIQUE_GENERATIONS dans des segments Parquet.")
+    parser.add_argument("--dry-run", action="store_true", help="Compter les entrées à archiver sans rien modifier")
+    parser.add_argument("--backfill-marker", action="store_true", help="Marquer d'abord les entrées antérieures au marqueur d'archivage")
+    args = parser.parse_args(argv)
+    try:
+        if args.backfill_marker and not args.dry_run:
+            print(f"{backfill_archive_marker()} entrées marquées.")
+        report = run_retention(dry_run=args.dry_run)
+    except fsc.FirestoreConnectionError as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        return 2
+    print(f"{report['candidates']} entrées éligibles, {report['archivees']} archivées dans {len(report['segments'])} segment(s).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
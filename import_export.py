@@ -0,0 +1,274 @@
+# import_export.py
+
+# --- Import / export en masse des collections (outil en ligne de commande) ---
+# Import : lit un fichier CSV ou Parquet par morceaux (sans le charger entièrement en mémoire),
+# valide chaque ligne contre EXPECTED_COLUMNS / COLUMN_TYPES et écrit les lignes valides en
+# WriteBatch parallèles (bulk_write_collection) ; la lecture du morceau suivant se fait pendant
+# l'écriture du précédent. Les lignes rejetées peuvent être enregistrées dans un fichier CSV.
+# Un import de statistiques simulées écrit les documents directement : les cumuls (STATS_ROLLUPS)
+# sont ensuite recalculés une fois, ce qui tient aussi compte des statistiques existantes remplacées.
+# Export : parcourt la collection par pages (curseurs start_after) et écrit chaque page
+# directement dans le fichier Parquet ou CSV de sortie.
+#
+# Exemples :
+#   python import_export.py import MOODS_ET_EMOTIONS moods.csv
+#   python import_export.py import THEMES_CONSTELLES themes.parquet --chunk-size 5000 --rejects rejets.csv
+#   python import_export.py export HISTORIQUE_GENERATIONS historique.parquet
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from google.cloud.firestore_v1.field_path import FieldPath
+
+import firestore_connector as fsc
+from config import WORKSHEET_NAMES, EXPECTED_COLUMNS, COLUMN_TYPES, SYNC_TIMESTAMP_FIELD
+from utils import parse_boolean_series, cast_series_to_int, cast_series_to_float
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_EXPORT_PAGE_SIZE = 1000
+
+# Conversion des types du schéma pour l'écriture (les types 'category', 'string' et 'text' restent du texte)
+_IMPORT_CASTERS = {
+    'int': cast_series_to_int,
+    'float': cast_series_to_float,
+    'bool': parse_boolean_series
+}
+_EXPORT_ARROW_TYPES = {
+    'int': pa.int64(),
+    'float': pa.float64(),
+    'bool': pa.bool_()
+}
+
+
+def resolve_collection_name(name: str) -> str:
+    """Accepte une clé de WORKSHEET_NAMES ou un nom de collection ; lève ValueError si inconnu."""
+    if name in WORKSHEET_NAMES:
+        return WORKSHEET_NAMES[name]
+    if name in WORKSHEET_NAMES.values():
+        return name
+    raise ValueError(f"Collection inconnue : '{name}'. Valeurs possibles : {', '.join(WORKSHEET_NAMES)}")
+
+
+# --- Import ---
+
+def _record_batch_to_text(record_batch: pa.RecordBatch) -> pd.DataFrame:
+    """
+    Convertit un lot Parquet (colonnes typées) en DataFrame texte, comme la lecture CSV : booléens en
+    'VRAI'/'FAUX' (format des formulaires et de parse_boolean_series), valeurs nulles vides.
+    """
+    columns = {}
+    for name, column in zip(record_batch.schema.names, record_batch.columns):
+        if pa.types.is_boolean(column.type):
+            columns[name] = pc.if_else(column, pa.scalar('VRAI'), pa.scalar('FAUX'))
+        else:
+            columns[name] = pc.cast(column, pa.string())
+    return pa.table(columns).to_pandas().fillna('')
+
+def iter_file_chunks(path: str, chunk_size: int):
+    """Produit des DataFrames successifs (toutes colonnes en texte, valeurs nulles vides) d'au plus chunk_size lignes."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        parquet_file = pq.ParquetFile(path)
+        for record_batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield _record_batch_to_text(record_batch)
+    elif extension in (".csv", ".txt"):
+        for chunk in pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False):
+            yield chunk
+    else:
+        raise ValueError(f"Format non supporté : '{extension}' (attendu : .csv ou .parquet)")
+
+def _to_python_value(value):
+    """Convertit un scalaire pandas/numpy en type Python sérialisable par Firestore."""
+    if value is pd.NA:
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+def validate_chunk(collection_name: str, chunk: pd.DataFrame, seen_ids: set) -> tuple:
+    """
+    Valide un morceau de fichier contre le schéma de la collection.
+    Retourne (documents valides, DataFrame des lignes rejetées avec leur motif).
+    Règles : ID présent et unique dans le fichier, valeurs numériques/booléennes convertibles.
+    Les colonnes absentes du fichier sont ajoutées vides ; les colonnes hors schéma sont ignorées.
+    """
+    expected_columns = EXPECTED_COLUMNS[collection_name]
+    id_field = expected_columns[0]
+    chunk = chunk.reindex(columns=expected_columns, fill_value='')
+    reasons = pd.Series('', index=chunk.index)
+
+    ids = chunk[id_field].astype(str).str.strip()
+    reasons[ids.eq('') | chunk[id_field].isna()] = f"{id_field} manquant"
+    duplicated = ids.duplicated(keep='first') | ids.isin(seen_ids)
+    reasons[reasons.eq('') & duplicated] = f"{id_field} en double"
+
+    for col, col_type in COLUMN_TYPES.get(collection_name, {}).items():
+        caster = _IMPORT_CASTERS.get(col_type)
+        if caster is None or col not in chunk.columns:
+            continue
+        raw = chunk[col]
+        converted = caster(raw)
+        blank = raw.isna() | raw.astype(str).str.strip().eq('')
+        if col_type != 'bool':
+            reasons[reasons.eq('') & converted.isna() & ~blank] = f"{col} non numérique"
+        # Les valeurs vides restent vides (comme dans les formulaires), les autres prennent le type du schéma
+        chunk[col] = converted.astype(object).where(~blank, '')
+
+    valid_mask = reasons.eq('')
+    valid = chunk[valid_mask].copy()
+    valid[id_field] = ids[valid_mask]
+    seen_ids.update(valid[id_field])
+    documents = [
+        {key: _to_python_value(value) for key, value in record.items()}
+        for record in valid.astype(object).where(valid.notna(), '').to_dict('records')
+    ]
+    rejected = chunk[~valid_mask].assign(Motif_Rejet=reasons[~valid_mask])
+    return documents, rejected
+
+def import_collection(collection_name: str, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, rejects_path: str = None, dry_run: bool = False) -> dict:
+    """
+    Importe un fichier CSV/Parquet dans une collection et retourne un rapport
+    {'lues', 'ecrites', 'rejetees', 'secondes'}. Les documents sont écrits avec leur ID métier comme ID de document.
+    Pour STATISTIQUES_ORBITALES_SIMULEES, le rapport contient aussi 'cumuls_recalcules' : nombre de
+    documents STATS_ROLLUPS réécrits par rebuild_stats_rollups après l'import (même interrompu).
+    """
+    id_field = EXPECTED_COLUMNS[collection_name][0]
+    report = {'lues': 0, 'ecrites': 0, 'rejetees': 0}
+    seen_ids = set()
+    started = time.monotonic()
+    pending_write = None
+    rejects_header_written = False
+    rebuild_rollups = collection_name == WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"] and not dry_run
+    try:
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="import_writer") as writer:
+            for chunk in iter_file_chunks(path, chunk_size):
+                documents, rejected = validate_chunk(collection_name, chunk, seen_ids)
+                report['lues'] += len(chunk)
+                report['rejetees'] += len(rejected)
+                if rejects_path and not rejected.empty:
+                    rejected.to_csv(rejects_path, mode='a' if rejects_header_written else 'w', header=not rejects_header_written, index=False)
+                    rejects_header_written = True
+                if pending_write is not None:
+                    report['ecrites'] += pending_write.result() # Une seule écriture en vol : mémoire bornée
+                    pending_write = None
+                if documents and not dry_run:
+                    operations = [('set', document[id_field], document) for document in documents]
+                    pending_write = writer.submit(fsc.bulk_write_collection, collection_name, operations)
+                print(f"  {report['lues']} lignes lues, {report['rejetees']} rejetées...")
+            if pending_write is not None:
+                report['ecrites'] += pending_write.result()
+    finally:
+        if rebuild_rollups and report['lues']:
+            report['cumuls_recalcules'] = fsc.rebuild_stats_rollups()
+    report['secondes'] = round(time.monotonic() - started, 2)
+    return report
+
+
+# --- Export ---
+
+def _export_schema(collection_name: str) -> pa.Schema:
+    """Schéma Arrow de l'export : types de COLUMN_TYPES pour les champs typés, texte pour les autres."""
+    column_types = COLUMN_TYPES.get(collection_name, {})
+    return pa.schema([
+        pa.field(col, _EXPORT_ARROW_TYPES.get(column_types.get(col), pa.string()))
+        for col in EXPECTED_COLUMNS[collection_name]
+    ])
+
+def _page_to_table(collection_name: str, documents: list, schema: pa.Schema) -> pa.Table:
+    """Convertit une page de documents en table Arrow conforme au schéma d'export."""
+    page = pd.DataFrame.from_records(documents).reindex(columns=schema.names)
+    column_types = COLUMN_TYPES.get(collection_name, {})
+    for col in schema.names:
+        caster = _IMPORT_CASTERS.get(column_types.get(col))
+        if caster is not None:
+            page[col] = caster(page[col])
+        else:
+            page[col] = page[col].astype('string').fillna('')
+    return pa.Table.from_pandas(page, schema=schema, preserve_index=False)
+
+def iter_collection_pages(collection_name: str, page_size: int = DEFAULT_EXPORT_PAGE_SIZE):
+    """Parcourt une collection par pages ordonnées par ID de document (curseurs start_after)."""
+    doc_id_path = FieldPath.document_id()
+    col_ref = fsc.get_db().collection(collection_name)
+    last_doc_id = None
+    while True:
+        query = col_ref.order_by(doc_id_path).limit(page_size)
+        if last_doc_id is not None:
+            query = query.start_after({doc_id_path: col_ref.document(last_doc_id)})
+        docs = list(query.stream())
+        if not docs:
+            return
+        yield [doc.to_dict() for doc in docs]
+        if len(docs) < page_size:
+            return
+        last_doc_id = docs[-1].id
+
+def export_collection(collection_name: str, path: str, page_size: int = DEFAULT_EXPORT_PAGE_SIZE) -> dict:
+    """Exporte une collection vers un fichier Parquet (zstd) ou CSV, page par page. Retourne {'ecrites', 'secondes'}."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in (".parquet", ".csv"):
+        raise ValueError(f"Format non supporté : '{extension}' (attendu : .csv ou .parquet)")
+    schema = _export_schema(collection_name)
+    started = time.monotonic()
+    written = 0
+    tmp_path = f"{path}.tmp"
+    if extension == ".parquet":
+        writer = pq.ParquetWriter(tmp_path, schema, compression="zstd")
+    else:
+        writer = pa_csv.CSVWriter(tmp_path, schema)
+    try:
+        for documents in iter_collection_pages(collection_name, page_size):
+            for document in documents:
+                document.pop(SYNC_TIMESTAMP_FIELD, None)
+            writer.write_table(_page_to_table(collection_name, documents, schema))
+            written += len(documents)
+            print(f"  {written} documents exportés...")
+    finally:
+        writer.close()
+    os.replace(tmp_path, path) # Le fichier final n'apparaît qu'une fois l'export complet
+    return {'ecrites': written, 'secondes': round(time.monotonic() - started, 2)}
+
+
+# --- Point d'entrée ---
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Import / export en masse des collections Firestore de L'ARCHITECTE Ω.")
+    subparsers = parser.add_subparsers(dest="commande", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Importer un fichier CSV ou Parquet dans une collection")
+    import_parser.add_argument("collection", help="Clé de WORKSHEET_NAMES (ex. MOODS_ET_EMOTIONS)")
+    import_parser.add_argument("fichier", help="Fichier .csv ou .parquet")
+    import_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Lignes lues et écrites par morceau")
+    import_parser.add_argument("--rejects", help="Fichier CSV où enregistrer les lignes rejetées et leur motif")
+    import_parser.add_argument("--dry-run", action="store_true", help="Valider le fichier sans rien écrire")
+
+    export_parser = subparsers.add_parser("export", help="Exporter une collection vers un fichier Parquet ou CSV")
+    export_parser.add_argument("collection", help="Clé de WORKSHEET_NAMES (ex. HISTORIQUE_GENERATIONS)")
+    export_parser.add_argument("fichier", help="Fichier de sortie .parquet ou .csv")
+    export_parser.add_argument("--page-size", type=int, default=DEFAULT_EXPORT_PAGE_SIZE, help="Documents lus par page")
+
+    args = parser.parse_args(argv)
+    try:
+        collection_name = resolve_collection_name(args.collection)
+        if args.commande == "import":
+            report = import_collection(collection_name, args.fichier, args.chunk_size, args.rejects, args.dry_run)
+            print(f"Import terminé dans '{collection_name}' : {report['lues']} lues, {report['ecrites']} écrites, "
+                  f"{report['rejetees']} rejetées en {report['secondes']} s.")
+            if 'cumuls_recalcules' in report:
+                print(f"Cumuls des statistiques recalculés : {report['cumuls_recalcules']} documents.")
+            return 1 if report['rejetees'] else 0
+        report = export_collection(collection_name, args.fichier, args.page_size)
+        print(f"Export de '{collection_name}' terminé : {report['ecrites']} documents en {report['secondes']} s.")
+        return 0
+    except (ValueError, OSError, fsc.FirestoreConnectionError) as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
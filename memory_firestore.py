@@ -0,0 +1,581 @@
+# memory_firestore.py
+
+# --- Backend Firestore en mémoire ---
+# Implémentation locale, sans réseau, du sous-ensemble de l'API google.cloud.firestore.Client
+# utilisé par firestore_connector : collections, documents (get/set/update/delete), requêtes
+# where/order_by/limit/select/start_after, agrégations count/sum/avg, WriteBatch, transactions
+# (transactional), get_all et listeners on_snapshot. Sélectionné via FIRESTORE_BACKEND = "memory" (config.py / variable
+# d'environnement), il permet de faire tourner l'application et les mesures de performance
+# hors ligne sur un jeu de données amorcé (fichier JSON ou jeu synthétique).
+
+import copy
+import json
+import random
+import string
+import threading
+from datetime import datetime, timezone
+from enum import Enum
+
+try:
+    from google.cloud.firestore_v1.transforms import SERVER_TIMESTAMP, DELETE_FIELD, Increment
+except ImportError: # Permet d'utiliser le backend sans la bibliothèque Firestore installée
+    class _Sentinel:
+        def __init__(self, description: str):
+            self.description = description
+        def __repr__(self):
+            return f"Sentinel: {self.description}"
+    SERVER_TIMESTAMP = _Sentinel("Horodatage serveur")
+    DELETE_FIELD = _Sentinel("Suppression de champ")
+    class Increment:
+        def __init__(self, value):
+            self.value = value
+
+try:
+    from google.api_core.exceptions import NotFound
+except ImportError:
+    class NotFound(Exception):
+        pass
+
+DOCUMENT_ID_FIELD = "__name__" # Valeur de FieldPath.document_id()
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+
+class ChangeType(Enum):
+    ADDED = 1
+    REMOVED = 2
+    MODIFIED = 3
+
+
+# --- Valeurs : copie, transformations et ordre de tri Firestore ---
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _apply_transforms(existing: dict, data: dict, timestamp: datetime) -> dict:
+    """Applique les données d'une écriture (avec SERVER_TIMESTAMP, DELETE_FIELD, Increment) au document existant."""
+    result = copy.deepcopy(existing) if existing else {}
+    for field, value in data.items():
+        if value is DELETE_FIELD:
+            result.pop(field, None)
+        elif value is SERVER_TIMESTAMP:
+            result[field] = timestamp
+        elif isinstance(value, Increment):
+            current = result.get(field)
+            result[field] = (current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0) + value.value
+        else:
+            result[field] = copy.deepcopy(value)
+    return result
+
+def _type_rank(value) -> int:
+    """Rang du type d'une valeur dans l'ordre de tri de Firestore (null < booléens < nombres < dates < texte < ...)."""
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, MemoryDocumentReference):
+        return 6
+    if isinstance(value, list):
+        return 8
+    return 9
+
+def _sort_key(value) -> tuple:
+    if isinstance(value, MemoryDocumentReference):
+        return (6, value.path)
+    if isinstance(value, datetime) and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    if isinstance(value, dict):
+        return (9, json.dumps(value, sort_keys=True, default=str))
+    return (_type_rank(value), value)
+
+def _compare(left, right) -> int:
+    left_key, right_key = _sort_key(left), _sort_key(right)
+    return (left_key > right_key) - (left_key < right_key)
+
+def _matches(value, op: str, target) -> bool:
+    """Évalue un prédicat where (mêmes opérateurs que Firestore, comparaisons limitées au même type)."""
+    if op == '==':
+        return _compare(value, target) == 0
+    if op == '!=':
+        return value is not None and _compare(value, target) != 0
+    if op in ('<', '<=', '>', '>='):
+        if _type_rank(value) != _type_rank(target):
+            return False
+        result = _compare(value, target)
+        return {'<': result < 0, '<=': result <= 0, '>': result > 0, '>=': result >= 0}[op]
+    if op == 'in':
+        return any(_compare(value, candidate) == 0 for candidate in target)
+    if op == 'not-in':
+        return value is not None and all(_compare(value, candidate) != 0 for candidate in target)
+    if op == 'array_contains':
+        return isinstance(value, list) and any(_compare(item, target) == 0 for item in value)
+    if op == 'array_contains_any':
+        return isinstance(value, list) and any(_compare(item, candidate) == 0 for item in value for candidate in target)
+    raise ValueError(f"Opérateur de requête non supporté : '{op}'")
+
+
+# --- Snapshots et références ---
+
+class MemoryDocumentSnapshot:
+    def __init__(self, reference, data: dict, read_time: datetime):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.read_time = read_time
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field: str):
+        if field == DOCUMENT_ID_FIELD:
+            return self.reference
+        return (self._data or {}).get(field)
+
+
+class _DocumentChange:
+    def __init__(self, change_type: ChangeType, document: MemoryDocumentSnapshot):
+        self.type = change_type
+        self.document = document
+
+
+class _AggregationResult:
+    def __init__(self, alias: str, value):
+        self.alias = alias
+        self.value = value
+
+
+class _Watch:
+    """Abonnement on_snapshot ; unsubscribe() arrête les notifications."""
+    def __init__(self, client, collection_name: str, callback):
+        self._client = client
+        self.collection_name = collection_name
+        self.callback = callback
+
+    def unsubscribe(self):
+        self._client._remove_watch(self)
+
+
+class MemoryQuery:
+    """Requête immuable : chaque méthode retourne une nouvelle requête."""
+    def __init__(self, client, collection_name: str, filters=None, orders=None, limit_count=None, projection=None, start_after_values=None):
+        self._client = client
+        self._collection_name = collection_name
+        self._filters = filters or []
+        self._orders = orders or []
+        self._limit = limit_count
+        self._projection = projection
+        self._start_after = start_after_values
+
+    def _copy(self, **changes):
+        params = {
+            'filters': self._filters, 'orders': self._orders, 'limit_count': self._limit,
+            'projection': self._projection, 'start_after_values': self._start_after
+        }
+        params.update(changes)
+        return MemoryQuery(self._client, self._collection_name, **params)
+
+    def where(self, field_path: str = None, op_string: str = None, value=None, *, filter=None):
+        if filter is not None: # FieldFilter de google.cloud.firestore (ou tout objet équivalent)
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + [(str(field_path), op_string, value)])
+
+    def order_by(self, field_path, direction: str = ASCENDING):
+        return self._copy(orders=self._orders + [(str(field_path), DESCENDING if str(direction).upper().endswith('DESCENDING') else ASCENDING)])
+
+    def limit(self, count: int):
+        return self._copy(limit_count=count)
+
+    def select(self, field_paths):
+        return self._copy(projection=[str(field) for field in field_paths])
+
+    def start_after(self, document_fields):
+        return self._copy(start_after_values=document_fields)
+
+    def count(self, alias: str = None):
+        return MemoryAggregationQuery(self).count(alias)
+
+    def sum(self, field_ref, alias: str = None):
+        return MemoryAggregationQuery(self).sum(field_ref, alias)
+
+    def avg(self, field_ref, alias: str = None):
+        return MemoryAggregationQuery(self).avg(field_ref, alias)
+
+    def on_snapshot(self, callback):
+        return self._client._add_watch(self._collection_name, callback)
+
+    def _field_value(self, doc_id: str, data: dict, field: str):
+        if field == DOCUMENT_ID_FIELD:
+            return self._client.collection(self._collection_name).document(doc_id)
+        return data.get(field)
+
+    def _cursor_values(self) -> list:
+        """Valeurs du curseur start_after dans l'ordre des champs de tri."""
+        cursor = self._start_after
+        if isinstance(cursor, MemoryDocumentSnapshot):
+            return [cursor.get(field) for field, _ in self._effective_orders()]
+        if isinstance(cursor, dict):
+            # Comme Firestore : le curseur ne porte que sur les premiers champs de tri qu'il fournit
+            values = []
+            for field, _ in self._effective_orders():
+                if field not in cursor:
+                    break
+                values.append(cursor[field])
+            return values
+        return list(cursor)
+
+    def _effective_orders(self) -> list:
+        orders = list(self._orders)
+        if not any(field == DOCUMENT_ID_FIELD for field, _ in orders):
+            orders.append((DOCUMENT_ID_FIELD, orders[-1][1] if orders else ASCENDING))
+        return orders
+
+    def _run(self) -> list:
+        """Retourne la liste des (doc_id, données) correspondant à la requête."""
+        documents = self._client._collection_items(self._collection_name)
+        # Firestore exclut les documents auxquels manque un champ filtré ou trié
+        required_fields = {field for field, _, _ in self._filters} | {field for field, _ in self._orders}
+        required_fields.discard(DOCUMENT_ID_FIELD)
+        results = []
+        for doc_id, data in documents:
+            if any(field not in data for field in required_fields):
+                continue
+            if all(_matches(self._field_value(doc_id, data, field), op, value) for field, op, value in self._filters):
+                results.append((doc_id, data))
+
+        orders = self._effective_orders()
+        def row_key(item):
+            return [self._field_value(item[0], item[1], field) for field, _ in orders]
+        for index in range(len(orders) - 1, -1, -1): # Tri stable, du critère le moins prioritaire au plus prioritaire
+            field, direction = orders[index]
+            results.sort(key=lambda item: _sort_key(self._field_value(item[0], item[1], field)), reverse=direction == DESCENDING)
+
+        if self._start_after is not None:
+            cursor = self._cursor_values()
+            def after_cursor(item) -> bool:
+                for (field, direction), value, cursor_value in zip(orders, row_key(item), cursor):
+                    result = _compare(value, cursor_value)
+                    if result != 0:
+                        return result > 0 if direction == ASCENDING else result < 0
+                return False
+            results = [item for item in results if after_cursor(item)]
+
+        if self._limit is not None:
+            results = results[:self._limit]
+        if self._projection is not None:
+            results = [(doc_id, {field: data[field] for field in self._projection if field in data}) for doc_id, data in results]
+        return results
+
+    def stream(self):
+        read_time = _now()
+        col_ref = self._client.collection(self._collection_name)
+        for doc_id, data in self._run():
+            yield MemoryDocumentSnapshot(col_ref.document(doc_id), data, read_time)
+
+    def get(self):
+        return list(self.stream())
+
+
+class MemoryAggregationQuery:
+    def __init__(self, query: MemoryQuery):
+        self._query = query
+        self._aggregations = []
+
+    def _add(self, function: str, field, alias: str):
+        self._aggregations.append((function, str(field) if field is not None else None, alias or f"field_{len(self._aggregations) + 1}"))
+        return self
+
+    def count(self, alias: str = None):
+        return self._add('count', None, alias)
+
+    def sum(self, field_ref, alias: str = None):
+        return self._add('sum', field_ref, alias)
+
+    def avg(self, field_ref, alias: str = None):
+        return self._add('avg', field_ref, alias)
+
+    def get(self):
+        rows = [data for _, data in self._query._run()]
+        results = []
+        for function, field, alias in self._aggregations:
+            if function == 'count':
+                value = len(rows)
+            else:
+                numbers = [row[field] for row in rows if isinstance(row.get(field), (int, float)) and not isinstance(row.get(field), bool)]
+                if function == 'sum':
+                    value = sum(numbers)
+                else:
+                    value = sum(numbers) / len(numbers) if numbers else None
+            results.append(_AggregationResult(alias, value))
+        return [results]
+
+
+class MemoryCollectionReference(MemoryQuery):
+    def __init__(self, client, collection_name: str):
+        super().__init__(client, collection_name)
+        self.id = collection_name
+
+    def document(self, document_id: str = None):
+        return MemoryDocumentReference(self._client, self._collection_name, document_id or _auto_id())
+
+    def add(self, document_data: dict, document_id: str = None):
+        doc_ref = self.document(document_id)
+        update_time = doc_ref.set(document_data)
+        return update_time, doc_ref
+
+
+class MemoryDocumentReference:
+    def __init__(self, client, collection_name: str, document_id: str):
+        self._client = client
+        self.collection_name = collection_name
+        self.id = document_id
+        self.path = f"{collection_name}/{document_id}"
+
+    def __eq__(self, other):
+        return isinstance(other, MemoryDocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def get(self, field_paths=None, transaction=None):
+        data = self._client._read_document(self.collection_name, self.id)
+        if data is not None and field_paths is not None:
+            data = {field: data[field] for field in field_paths if field in data}
+        return MemoryDocumentSnapshot(self, data, _now())
+
+    def set(self, document_data: dict, merge: bool = False):
+        return self._client._write([('set_merge' if merge else 'set', self, document_data)])
+
+    def update(self, field_updates: dict):
+        return self._client._write([('update', self, field_updates)])
+
+    def delete(self):
+        return self._client._write([('delete', self, None)])
+
+    def on_snapshot(self, callback):
+        return self._client._add_watch(self.collection_name, callback, document_id=self.id)
+
+
+class MemoryWriteBatch:
+    """WriteBatch : les opérations sont appliquées atomiquement au commit."""
+    def __init__(self, client):
+        self._client = client
+        self._operations = []
+
+    def set(self, reference, document_data: dict, merge: bool = False):
+        self._operations.append(('set_merge' if merge else 'set', reference, document_data))
+        return self
+
+    def update(self, reference, field_updates: dict):
+        self._operations.append(('update', reference, field_updates))
+        return self
+
+    def delete(self, reference):
+        self._operations.append(('delete', reference, None))
+        return self
+
+    def commit(self):
+        operations, self._operations = self._operations, []
+        self._client._write(operations)
+        return [None] * len(operations)
+
+
+class MemoryTransaction(MemoryWriteBatch):
+    """
+    Transaction : exécutée par transactional() sous le verrou du client, donc sérialisée avec toutes
+    les autres écritures ; les lectures (reference.get(transaction=...)) voient un état stable.
+    """
+    def get_all(self, references):
+        return self._client.get_all(references)
+
+
+def transactional(func):
+    """Équivalent de google.cloud.firestore.transactional pour le backend mémoire : func(transaction, ...)."""
+    def run(transaction: MemoryTransaction, *args, **kwargs):
+        client = transaction._client
+        with client._lock:
+            transaction._operations = []
+            result = func(transaction, *args, **kwargs)
+            operations, transaction._operations = transaction._operations, []
+            timestamp, changes, watches = client._apply_operations(operations)
+        client._notify(watches, changes, timestamp)
+        return result
+    return run
+
+
+def _auto_id() -> str:
+    return ''.join(random.choices(string.ascii_letters + string.digits, k=20))
+
+
+# --- Client ---
+
+class MemoryFirestoreClient:
+    """Client Firestore en mémoire, thread-safe, partagé par toutes les sessions du processus."""
+    def __init__(self, project: str = "memory"):
+        self.project = project
+        self._collections = {} # {collection: {doc_id: données}}
+        self._watches = []
+        self._lock = threading.RLock()
+
+    def collection(self, collection_name: str) -> MemoryCollectionReference:
+        return MemoryCollectionReference(self, collection_name)
+
+    def batch(self) -> MemoryWriteBatch:
+        return MemoryWriteBatch(self)
+
+    def transaction(self) -> MemoryTransaction:
+        return MemoryTransaction(self)
+
+    def get_all(self, references, field_paths=None):
+        for reference in references:
+            yield reference.get(field_paths)
+
+    def collection_names(self) -> list:
+        with self._lock:
+            return list(self._collections.keys())
+
+    def close(self):
+        with self._lock:
+            self._watches.clear()
+
+    # --- Amorçage du jeu de données ---
+
+    def seed(self, documents_by_collection: dict):
+        """Charge des documents {collection: {doc_id: données}} sans déclencher les listeners."""
+        with self._lock:
+            for collection_name, documents in documents_by_collection.items():
+                self._collections.setdefault(collection_name, {}).update(copy.deepcopy(documents))
+
+    def seed_from_file(self, path: str):
+        """Charge un fichier JSON {collection: {doc_id: données}} (dates au format {'__datetime__': iso})."""
+        def decode(value):
+            if isinstance(value, dict) and set(value) == {'__datetime__'}:
+                return datetime.fromisoformat(value['__datetime__'])
+            return value
+        with open(path, "r", encoding="utf-8") as f:
+            self.seed(json.load(f, object_hook=decode))
+
+    # --- Stockage interne ---
+
+    def _collection_items(self, collection_name: str) -> list:
+        with self._lock:
+            return [(doc_id, copy.deepcopy(data)) for doc_id, data in self._collections.get(collection_name, {}).items()]
+
+    def _read_document(self, collection_name: str, document_id: str):
+        with self._lock:
+            data = self._collections.get(collection_name, {}).get(document_id)
+            return copy.deepcopy(data) if data is not None else None
+
+    def _write(self, operations: list) -> datetime:
+        """Applique une liste d'opérations de façon atomique puis notifie les listeners concernés."""
+        with self._lock:
+            timestamp, changes, watches = self._apply_operations(operations)
+        self._notify(watches, changes, timestamp)
+        return timestamp
+
+    def _apply_operations(self, operations: list) -> tuple:
+        """Applique les opérations (appelé sous le verrou) ; retourne (horodatage, changements, listeners à notifier)."""
+        timestamp = _now()
+        changes = []
+        with self._lock:
+            # Validation préalable : un update sur un document absent fait échouer tout le lot
+            for op, reference, _ in operations:
+                if op == 'update' and reference.id not in self._collections.get(reference.collection_name, {}):
+                    raise NotFound(f"Document introuvable : {reference.path}")
+            for op, reference, data in operations:
+                documents = self._collections.setdefault(reference.collection_name, {})
+                existed = reference.id in documents
+                if op == 'delete':
+                    if existed:
+                        del documents[reference.id]
+                        changes.append((reference, ChangeType.REMOVED, None))
+                    continue
+                base = documents.get(reference.id) if op in ('update', 'set_merge') else None
+                documents[reference.id] = _apply_transforms(base, data, timestamp)
+                changes.append((reference, ChangeType.MODIFIED if existed else ChangeType.ADDED, copy.deepcopy(documents[reference.id])))
+            watches = list(self._watches)
+        return timestamp, changes, watches
+
+    # --- Listeners ---
+
+    def _add_watch(self, collection_name: str, callback, document_id: str = None) -> _Watch:
+        watch = _Watch(self, collection_name, callback)
+        watch.document_id = document_id
+        with self._lock:
+            self._watches.append(watch)
+            initial = [(doc_id, data) for doc_id, data in self._collection_items(collection_name) if document_id is None or doc_id == document_id]
+        read_time = _now()
+        col_ref = self.collection(collection_name)
+        snapshots = [MemoryDocumentSnapshot(col_ref.document(doc_id), data, read_time) for doc_id, data in initial]
+        callback(snapshots, [_DocumentChange(ChangeType.ADDED, snapshot) for snapshot in snapshots], read_time)
+        return watch
+
+    def _remove_watch(self, watch: _Watch):
+        with self._lock:
+            if watch in self._watches:
+                self._watches.remove(watch)
+
+    def _notify(self, watches: list, changes: list, read_time: datetime):
+        """Appelle chaque listener avec les changements de sa collection (hors du verrou)."""
+        for watch in watches:
+            watch_changes = [
+                _DocumentChange(change_type, MemoryDocumentSnapshot(reference, data, read_time))
+                for reference, change_type, data in changes
+                if reference.collection_name == watch.collection_name and watch.document_id in (None, reference.id)
+            ]
+            if not watch_changes:
+                continue
+            col_ref = self.collection(watch.collection_name)
+            current = [
+                MemoryDocumentSnapshot(col_ref.document(doc_id), data, read_time)
+                for doc_id, data in self._collection_items(watch.collection_name)
+                if watch.document_id in (None, doc_id)
+            ]
+            try:
+                watch.callback(current, watch_changes, read_time)
+            except Exception as e:
+                print(f"DEBUG_FIRESTORE: Erreur dans un listener du backend mémoire pour '{watch.collection_name}': {e}")
+
+
+# --- Jeu de données synthétique pour les mesures de performance ---
+
+def build_synthetic_dataset(expected_columns: dict, row_counts: dict, sync_field: str = None, seed: int = 0) -> dict:
+    """
+    Construit un jeu de données {collection: {doc_id: données}} respectant le schéma EXPECTED_COLUMNS.
+    row_counts: {collection: nombre de documents}. Les valeurs sont des textes courts déterministes
+    (graine fixe) ; les champs dont le nom évoque une quantité reçoivent des nombres.
+    sync_field: si fourni, champ d'horodatage de synchronisation ajouté à chaque document.
+    """
+    rng = random.Random(seed)
+    numeric_markers = ('Ecoutes', 'J_aimes', 'Partages', 'Revenus', 'Budget', 'Niveau', 'Evaluation_Gardien')
+    dataset = {}
+    timestamp = _now()
+    for collection_name, count in row_counts.items():
+        columns = expected_columns.get(collection_name, [])
+        documents = {}
+        for index in range(count):
+            doc_id = f"{collection_name[:3].upper()}-{index:06d}"
+            data = {}
+            for position, column in enumerate(columns):
+                if position == 0:
+                    data[column] = doc_id
+                elif any(marker in column for marker in numeric_markers):
+                    data[column] = round(rng.uniform(0, 1000), 2) if 'Revenus' in column or 'Budget' in column else rng.randint(0, 1000)
+                else:
+                    data[column] = f"{column}-{rng.randint(0, 20)}"
+            if sync_field:
+                data[sync_field] = timestamp
+            documents[doc_id] = data
+        dataset[collection_name] = documents
+    return dataset
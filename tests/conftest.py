@@ -0,0 +1,35 @@
+# tests/conftest.py
+
+# Les tests utilisent le backend Firestore en mémoire (memory_firestore.py) : pas de réseau ni de secrets.
+# Les variables d'environnement sont posées avant le premier import de config.py.
+
+import importlib
+import os
+import sys
+
+os.environ["FIRESTORE_BACKEND"] = "memory"
+os.environ["FIRESTORE_MEMORY_SEED_FILE"] = ""
+os.environ["FIRESTORE_MEMORY_SYNTHETIC_ROWS"] = ""
+os.environ["FIRESTORE_CACHE_CHANGE_LOG"] = "0"
+os.environ["FIRESTORE_REALTIME_MIRROR"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import streamlit as st
+
+import firestore_connector as fsc
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """
+    Client en mémoire vide : le connecteur est rechargé (client et caches partagés du module
+    recréés) et les caches Streamlit vidés ; un st.error fait échouer le test.
+    """
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    importlib.reload(fsc)
+    monkeypatch.setattr(fsc.st, "error", lambda message: pytest.fail(f"st.error : {message}"))
+    yield fsc.get_firestore_client()
+    if hasattr(fsc, "stop_change_log_listener"):
+        fsc.stop_change_log_listener()
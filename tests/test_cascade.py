@@ -0,0 +1,43 @@
+# tests/test_cascade.py
+
+import firestore_connector as fsc
+from config import WORKSHEET_NAMES
+
+MORCEAUX = WORKSHEET_NAMES["MORCEAUX_GENERES"]
+STATS = WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"]
+PAROLES = WORKSHEET_NAMES["PAROLES_EXISTANTES"]
+HISTORIQUE = WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"]
+
+
+def seed_morceau_with_dependents(db):
+    fsc.add_morceau_generes({'ID_Morceau': 'M1', 'Titre_Morceau': 'Un', 'ID_Album_Associe': 'A1', 'ID_Artiste_IA': 'R1'})
+    fsc.add_morceau_generes({'ID_Morceau': 'M2', 'Titre_Morceau': 'Deux', 'ID_Album_Associe': 'A1', 'ID_Artiste_IA': 'R1'})
+    fsc.add_stats_simulees_batch([
+        {'ID_Stat_Simulee': 'S1', 'ID_Morceau': 'M1', 'Ecoutes_Totales': 100},
+        {'ID_Stat_Simulee': 'S2', 'ID_Morceau': 'M1', 'Ecoutes_Totales': 20},
+        {'ID_Stat_Simulee': 'S3', 'ID_Morceau': 'M2', 'Ecoutes_Totales': 7}
+    ])
+    db.collection(PAROLES).document('M1').set({'ID_Morceau': 'M1', 'Paroles_Existantes': 'la la'})
+    db.collection(HISTORIQUE).document('L1').set({'ID_GenLog': 'L1', 'ID_Morceau_Associe': 'M1'})
+    db.collection(HISTORIQUE).document('L2').set({'ID_GenLog': 'L2', 'ID_Morceau_Associe': 'M2'})
+
+
+def test_cascade_removes_dependents_and_unlinks_history(db):
+    seed_morceau_with_dependents(db)
+
+    report = fsc.delete_morceau_cascade('M1')
+
+    assert report == {'morceau': 1, 'statistiques': 2, 'paroles': 1, 'historique_delie': 1, 'fichiers': []}
+    assert not db.collection(MORCEAUX).document('M1').get().exists
+    assert {doc.id for doc in db.collection(STATS).stream()} == {'S3'}
+    assert not db.collection(PAROLES).document('M1').get().exists
+    assert db.collection(HISTORIQUE).document('L1').get().to_dict()['ID_Morceau_Associe'] == ''
+    assert db.collection(HISTORIQUE).document('L2').get().to_dict()['ID_Morceau_Associe'] == 'M2'
+
+def test_cascade_can_delete_history(db):
+    seed_morceau_with_dependents(db)
+
+    report = fsc.delete_morceau_cascade('M1', delete_history=True)
+
+    assert report['historique_supprime'] == 1
+    assert not db.collection(HISTORIQUE).document('L1').get().exists
@@ -0,0 +1,57 @@
+# tests/test_change_log.py
+
+import google.cloud.firestore
+import pytest
+
+import firestore_connector as fsc
+from config import WORKSHEET_NAMES, CACHE_CHANGE_LOG_COLLECTION
+
+MORCEAUX = WORKSHEET_NAMES["MORCEAUX_GENERES"]
+
+
+@pytest.fixture
+def change_log(db, monkeypatch):
+    monkeypatch.setattr(fsc, "CACHE_CHANGE_LOG_ENABLED", True)
+    assert fsc.start_change_log_listener()
+    return db.collection(CACHE_CHANGE_LOG_COLLECTION)
+
+def publish_remote(change_log, doc_id, collection_name, version, deleted_ids=()):
+    """Écrit un enregistrement du journal comme le ferait un autre réplica."""
+    change_log.document(doc_id).set({
+        'Collection': collection_name, 'Version': version, 'Replica': 'autre-replica',
+        'IDs_Supprimes': list(deleted_ids), 'Reconcilier': False, 'Horodatage': google.cloud.firestore.SERVER_TIMESTAMP
+    })
+
+def test_local_write_is_published_with_deleted_ids(change_log):
+    fsc.add_morceau_generes({'ID_Morceau': 'M1', 'Titre_Morceau': 'Un'})
+    fsc.get_dataframe_from_collection(MORCEAUX)
+    version = fsc.get_collection_version(MORCEAUX)
+
+    assert fsc.delete_morceau_generes('M1')
+    fsc._change_log_executor.submit(lambda: None).result() # Attend les publications en arrière-plan
+
+    records = sorted((doc.to_dict() for doc in change_log.stream() if doc.to_dict()['Collection'] == MORCEAUX), key=lambda record: record['Version'])
+    assert records[-1]['Replica'] == fsc.REPLICA_ID
+    assert records[-1]['IDs_Supprimes'] == ['M1']
+    assert fsc.get_collection_version(MORCEAUX) == version + 1 # Le listener ignore les enregistrements du réplica
+
+def test_remote_invalidation_evicts_cache_and_deleted_documents(change_log, db):
+    db.collection(MORCEAUX).document('M1').set({'ID_Morceau': 'M1', 'Titre_Morceau': 'Un'})
+    db.collection(MORCEAUX).document('M2').set({'ID_Morceau': 'M2', 'Titre_Morceau': 'Deux'})
+    assert sorted(fsc.get_dataframe_from_collection(MORCEAUX)['ID_Morceau']) == ['M1', 'M2']
+    version = fsc.get_collection_version(MORCEAUX)
+
+    db.collection(MORCEAUX).document('M2').delete() # Suppression faite par l'autre réplica
+    publish_remote(change_log, 'C1', MORCEAUX, 7, deleted_ids=['M2'])
+
+    assert fsc.get_collection_version(MORCEAUX) == version + 1
+    assert fsc.get_dataframe_from_collection(MORCEAUX)['ID_Morceau'].tolist() == ['M1']
+
+def test_remote_invalidations_apply_out_of_order_once(change_log):
+    version = fsc.get_collection_version(MORCEAUX)
+
+    publish_remote(change_log, 'C2', MORCEAUX, 9)
+    publish_remote(change_log, 'C1', MORCEAUX, 8) # Arrivé après un enregistrement de version supérieure
+    fsc._apply_remote_invalidation('C1', change_log.document('C1').get().to_dict()) # Redélivrance
+
+    assert fsc.get_collection_version(MORCEAUX) == version + 2
@@ -0,0 +1,55 @@
+# tests/test_collection_cache.py
+
+import threading
+import time
+
+import firestore_connector as fsc
+from config import WORKSHEET_NAMES
+
+MORCEAUX = WORKSHEET_NAMES["MORCEAUX_GENERES"]
+
+
+def test_concurrent_loads_share_one_read(db, monkeypatch):
+    db.collection(MORCEAUX).document('M1').set({'ID_Morceau': 'M1', 'Titre_Morceau': 'Un'})
+    sync = fsc.sync_collection_documents
+    calls = []
+    def slow_sync(collection_name):
+        calls.append(collection_name)
+        time.sleep(0.2) # Les autres appelants arrivent pendant la lecture
+        return sync(collection_name)
+    monkeypatch.setattr(fsc, "sync_collection_documents", slow_sync)
+
+    results = [None] * 8
+    def load(i):
+        results[i] = fsc.get_dataframe_from_collection(MORCEAUX)
+    threads = [threading.Thread(target=load, args=(i,)) for i in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [MORCEAUX]
+    assert all(df['ID_Morceau'].tolist() == ['M1'] for df in results)
+
+def test_single_flight_propagates_the_error_to_every_caller():
+    started = threading.Event()
+    def failing_loader():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("lecture impossible")
+    errors = []
+    def call():
+        try:
+            fsc._single_flight(('test', 0), failing_loader)
+        except RuntimeError as e:
+            errors.append(str(e))
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=call)
+    follower.start()
+    leader.join()
+    follower.join()
+
+    assert errors == ["lecture impossible"] * 2
+    assert ('test', 0) not in fsc._collection_flights
@@ -0,0 +1,73 @@
+# tests/test_collection_sync.py
+
+from datetime import datetime, timezone
+
+import google.cloud.firestore
+
+import firestore_connector as fsc
+from config import WORKSHEET_NAMES, SYNC_TIMESTAMP_FIELD
+
+MORCEAUX = WORKSHEET_NAMES["MORCEAUX_GENERES"]
+
+
+def morceau(morceau_id, titre, **fields):
+    return {'ID_Morceau': morceau_id, 'Titre_Morceau': titre, **fields}
+
+
+# --- Invalidation par collection ---
+
+def test_write_invalidates_only_its_collection(db):
+    fsc.add_morceau_generes(morceau('M1', 'Un'))
+    albums_version = fsc.get_collection_version(WORKSHEET_NAMES["ALBUMS_PLANETAIRES"])
+    assert fsc.get_dataframe_from_collection(MORCEAUX)['Titre_Morceau'].tolist() == ['Un']
+
+    fsc.update_morceau_generes('M1', {'Titre_Morceau': 'Deux'})
+
+    assert fsc.get_dataframe_from_collection(MORCEAUX)['Titre_Morceau'].tolist() == ['Deux']
+    assert fsc.get_collection_version(WORKSHEET_NAMES["ALBUMS_PLANETAIRES"]) == albums_version
+
+
+# --- Synchronisation incrémentale (watermark Horodatage_Sync) ---
+
+def test_delta_sync_reads_only_documents_stamped_since_the_watermark(db):
+    fsc.add_morceau_generes(morceau('M1', 'Un'))
+    fsc.add_morceau_generes(morceau('M2', 'Deux'))
+    assert set(fsc.sync_collection_documents(MORCEAUX)) == {'M1', 'M2'}
+    watermark = fsc._collection_snapshots[MORCEAUX]['watermark']
+
+    # Écrit hors connecteur avec un horodatage antérieur au watermark : invisible pour le delta
+    db.collection(MORCEAUX).document('M3').set(morceau('M3', 'Trois', **{SYNC_TIMESTAMP_FIELD: datetime(2000, 1, 1, tzinfo=timezone.utc)}))
+    db.collection(MORCEAUX).document('M1').set(morceau('M1', 'Un bis', **{SYNC_TIMESTAMP_FIELD: google.cloud.firestore.SERVER_TIMESTAMP}))
+
+    docs = fsc.sync_collection_documents(MORCEAUX)
+
+    assert set(docs) == {'M1', 'M2'}
+    assert docs['M1']['Titre_Morceau'] == 'Un bis'
+    assert fsc._collection_snapshots[MORCEAUX]['watermark'] >= watermark
+
+def test_connector_writes_stamp_the_sync_field(db):
+    fsc.add_morceau_generes(morceau('M1', 'Un'))
+
+    assert isinstance(db.collection(MORCEAUX).document('M1').get().to_dict()[SYNC_TIMESTAMP_FIELD], datetime)
+
+def test_reconcile_removes_deleted_and_adds_unstamped_documents(db):
+    fsc.add_morceau_generes(morceau('M1', 'Un'))
+    fsc.add_morceau_generes(morceau('M2', 'Deux'))
+    fsc.sync_collection_documents(MORCEAUX)
+
+    db.collection(MORCEAUX).document('M1').delete() # Suppression faite ailleurs
+    db.collection(MORCEAUX).document('M3').set(morceau('M3', 'Trois')) # Écrit sans horodatage de synchronisation
+    snapshot = fsc._collection_snapshots[MORCEAUX]
+
+    assert fsc._reconcile_deleted_documents(MORCEAUX, snapshot) == 2
+    assert set(snapshot['docs']) == {'M2', 'M3'}
+
+def test_sync_reconciles_once_the_interval_has_elapsed(db, monkeypatch):
+    fsc.add_morceau_generes(morceau('M1', 'Un'))
+    fsc.sync_collection_documents(MORCEAUX)
+    db.collection(MORCEAUX).document('M1').delete()
+
+    assert set(fsc.sync_collection_documents(MORCEAUX)) == {'M1'} # Scan d'IDs pas encore dû
+
+    monkeypatch.setattr(fsc, "DELETE_RECONCILE_INTERVAL_SECONDS", 0)
+    assert fsc.sync_collection_documents(MORCEAUX) == {}
@@ -0,0 +1,70 @@
+# tests/test_firestore_metrics.py
+
+import json
+
+import pytest
+
+import firestore_connector as fsc
+import firestore_metrics as fsm
+from config import WORKSHEET_NAMES
+
+MORCEAUX = WORKSHEET_NAMES["MORCEAUX_GENERES"]
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """Compteurs vides ; retourne une fonction qui change la session Streamlit « courante »."""
+    fsm.reset_metrics()
+    current = {'id': 's1'}
+    monkeypatch.setattr(fsm, "_current_session_id", lambda: current['id'])
+    def switch(session_id):
+        current['id'] = session_id
+    yield switch
+    fsm.reset_metrics()
+
+def documents_read(scope):
+    return int(fsm.get_metrics(scope)['documents'].sum())
+
+
+def test_reads_are_counted_per_scope(db, session):
+    for doc_id in ('M1', 'M2'):
+        db.collection(MORCEAUX).document(doc_id).set({'ID_Morceau': doc_id})
+    fsc.get_dataframe_from_collection(MORCEAUX)
+    session('s2')
+    fsm.begin_rerun()
+
+    assert documents_read('rerun') == 0
+    session('s1')
+    assert documents_read('rerun') == documents_read('session') == documents_read('processus') == 2
+
+def test_byte_sizing_is_opt_in(monkeypatch):
+    assert fsm.estimate_size({'Titre': 'x' * 100}) == 0
+
+    monkeypatch.setattr(fsm, "FIRESTORE_METRICS_BYTES", True)
+    assert fsm.estimate_size({'Titre': 'x' * 100}) > 100
+
+def test_session_reset_leaves_other_sessions(session):
+    fsm.record_writes(MORCEAUX, 'ajout', [{'ID_Morceau': 'M1'}])
+    session('s2')
+    fsm.record_writes(MORCEAUX, 'ajout', [{'ID_Morceau': 'M2'}])
+
+    fsm.reset_session_metrics()
+
+    assert fsm.get_metrics('session').empty
+    assert int(fsm.get_metrics('processus')['ecritures'].sum()) == 2
+    session('s1')
+    assert int(fsm.get_metrics('session')['ecritures'].sum()) == 1
+
+def test_export_includes_process_scope_only_on_request(session):
+    fsm.record_writes(MORCEAUX, 'ajout', [{'ID_Morceau': 'M1'}])
+
+    assert 'processus' not in json.loads(fsm.export_metrics())['portees']
+    assert 'processus' in json.loads(fsm.export_metrics(include_process=True))['portees']
+
+def test_idle_and_excess_sessions_are_evicted(session, monkeypatch):
+    monkeypatch.setattr(fsm, "METRICS_MAX_SESSIONS", 2)
+    for session_id in ('s1', 's2', 's3'):
+        session(session_id)
+        fsm.record_writes(MORCEAUX, 'ajout', [{}])
+
+    assert list(fsm._session_stats) == ['s2', 's3']
@@ -0,0 +1,57 @@
+# tests/test_historique_archive.py
+
+from datetime import datetime
+
+import pytest
+
+import historique_archive
+from config import WORKSHEET_NAMES, HISTORIQUE_ARCHIVE_MARKER_FIELD
+
+HISTORIQUE = WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"]
+NOW = datetime(2026, 6, 30, 12, 0, 0)
+
+
+@pytest.fixture
+def archive(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(historique_archive, "HISTORIQUE_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(historique_archive, "HISTORIQUE_RETENTION_DAYS", 30)
+    monkeypatch.setattr(historique_archive, "HISTORIQUE_ARCHIVE_RATED", True)
+    return db.collection(HISTORIQUE)
+
+def entry(archive, gen_log_id, date_heure, evaluation='', **fields):
+    archive.document(gen_log_id).set({
+        'ID_GenLog': gen_log_id, 'Date_Heure': date_heure, 'Type_Generation': 'Paroles', 'Evaluation_Manuelle': evaluation,
+        'Prompt_Envoye_Full': f"prompt {gen_log_id} " * 50, 'Reponse_Recue_Full': f"réponse {gen_log_id}",
+        HISTORIQUE_ARCHIVE_MARKER_FIELD: False, **fields
+    })
+
+
+def test_selection_keeps_old_or_rated_entries_not_yet_archived(archive):
+    entry(archive, 'L1', '2026-05-01 10:00:00') # Plus ancienne que la rétention
+    entry(archive, 'L2', '2026-06-29 10:00:00') # Récente, non évaluée
+    entry(archive, 'L3', '2026-06-29 11:00:00', evaluation='5') # Récente, évaluée
+    entry(archive, 'L4', '2026-04-01 10:00:00', **{HISTORIQUE_ARCHIVE_MARKER_FIELD: True}) # Déjà archivée
+    entry(archive, 'L5', '2026-05-31 12:00:01') # Juste après la limite
+
+    assert historique_archive.select_records_to_archive(NOW) == ['L1', 'L3']
+
+def test_selection_ignores_rated_entries_when_disabled(archive, monkeypatch):
+    monkeypatch.setattr(historique_archive, "HISTORIQUE_ARCHIVE_RATED", False)
+    entry(archive, 'L1', '2026-05-01 10:00:00')
+    entry(archive, 'L3', '2026-06-29 11:00:00', evaluation='5')
+
+    assert historique_archive.select_records_to_archive(NOW) == ['L1']
+
+def test_retention_writes_segment_and_summarizes_hot_documents(archive):
+    entry(archive, 'L1', '2026-05-01 10:00:00')
+    entry(archive, 'L2', '2026-06-29 10:00:00')
+
+    report = historique_archive.run_retention(now=NOW)
+
+    assert report['archivees'] == 1 and len(report['segments']) == 1
+    summary = archive.document('L1').get().to_dict()
+    assert summary[HISTORIQUE_ARCHIVE_MARKER_FIELD] is True
+    assert summary['Prompt_Envoye_Full'].endswith(historique_archive.SUMMARY_TRUNCATION_MARKER)
+    assert historique_archive.with_archived_full_texts(summary)['Prompt_Envoye_Full'] == "prompt L1 " * 50
+    assert historique_archive.query_archive(search='réponse L1')['ID_GenLog'].tolist() == ['L1']
+    assert historique_archive.select_records_to_archive(NOW) == [] # Un second passage n'a plus rien à archiver
@@ -0,0 +1,31 @@
+# tests/test_id_index.py
+
+import firestore_connector as fsc
+from config import WORKSHEET_NAMES
+
+MOODS = WORKSHEET_NAMES["MOODS_ET_EMOTIONS"]
+
+
+def seed(db):
+    db.collection(MOODS).document('MO1').set({'ID_Mood': 'MO1', 'Nom_Mood': 'Calme', 'Niveau_Intensite': '3'})
+    db.collection(MOODS).document('MO2').set({'ID_Mood': 'MO2', 'Nom_Mood': 'Sombre', 'Niveau_Intensite': ''})
+
+
+def test_records_are_copies_of_the_shared_index(db):
+    seed(db)
+    fsc.get_by_id(MOODS, 'MO1')['Nom_Mood'] = 'Modifié'
+    fsc.get_many_by_ids(MOODS, 'MO1, MO2')['MO1']['Nom_Mood'] = 'Modifié'
+
+    assert fsc.get_by_id(MOODS, 'MO1')['Nom_Mood'] == 'Calme'
+
+def test_get_many_by_ids_keeps_the_requested_order(db):
+    seed(db)
+
+    assert list(fsc.get_many_by_ids(MOODS, ['MO2', 'MO9', 'MO1'])) == ['MO2', 'MO1']
+
+def test_lookup_field_maps_missing_values_to_default(db):
+    seed(db)
+
+    assert fsc.lookup_field(MOODS, 'MO1', 'Niveau_Intensite', 'non précisé') == 3
+    assert fsc.lookup_field(MOODS, 'MO2', 'Niveau_Intensite', 'non précisé') == 'non précisé' # <NA> de la colonne Int64
+    assert fsc.lookup_field(MOODS, 'MO9', 'Nom_Mood', 'inconnu') == 'inconnu'
@@ -0,0 +1,68 @@
+# tests/test_import_export.py
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import import_export
+from config import WORKSHEET_NAMES
+
+STATS = WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"]
+REGLES = WORKSHEET_NAMES["REGLES_DE_GENERATION_ORACLE"]
+
+
+def test_validate_chunk_rejects_and_converts_rows():
+    chunk = pd.DataFrame({
+        'ID_Stat_Simulee': ['S1', ' S2 ', '', 'S1', 'S3', 'S4'],
+        'Ecoutes_Totales': ['10', '2,9', '1', '1', 'beaucoup', ''],
+        'Revenus_Simules_Streaming': ['0,5', '', '', '', '', '1.25'],
+        'Colonne_Inconnue': ['x'] * 6
+    })
+    seen_ids = {'S4'}
+
+    documents, rejected = import_export.validate_chunk(STATS, chunk, seen_ids)
+
+    assert [document['ID_Stat_Simulee'] for document in documents] == ['S1', 'S2']
+    assert documents[0]['Ecoutes_Totales'] == 10 and documents[0]['Revenus_Simules_Streaming'] == 0.5
+    assert documents[1]['Ecoutes_Totales'] == 2 and documents[1]['Revenus_Simules_Streaming'] == '' # Vide reste vide
+    assert documents[0]['Mois_Annee_Stat'] == '' and 'Colonne_Inconnue' not in documents[0]
+    assert rejected['Motif_Rejet'].tolist() == [
+        'ID_Stat_Simulee manquant', 'ID_Stat_Simulee en double', 'Ecoutes_Totales non numérique', 'ID_Stat_Simulee en double'
+    ]
+    assert seen_ids == {'S1', 'S2', 'S4'}
+
+def test_parquet_chunks_are_read_as_text_like_csv(tmp_path):
+    table = pa.table({
+        'ID_Regle': ['R1', 'R2', 'R3'],
+        'Type_Regle': ['Ton', None, 'Style'],
+        'Statut_Actif': pa.array([True, False, None], type=pa.bool_())
+    })
+    parquet_path = tmp_path / "regles.parquet"
+    pq.write_table(table, parquet_path)
+    csv_path = tmp_path / "regles.csv"
+    csv_path.write_text("ID_Regle,Type_Regle,Statut_Actif\nR1,Ton,VRAI\nR2,,FAUX\nR3,Style,\n", encoding="utf-8")
+
+    parquet_chunk = next(import_export.iter_file_chunks(str(parquet_path), 10))
+    csv_chunk = next(import_export.iter_file_chunks(str(csv_path), 10))
+
+    assert parquet_chunk.to_dict('records') == csv_chunk.to_dict('records')
+    parquet_documents, _ = import_export.validate_chunk(REGLES, parquet_chunk, set())
+    csv_documents, _ = import_export.validate_chunk(REGLES, csv_chunk, set())
+    assert parquet_documents == csv_documents
+    assert [document['Type_Regle'] for document in parquet_documents] == ['Ton', '', 'Style'] # Jamais 'None'
+    assert [document['Statut_Actif'] for document in parquet_documents] == [True, False, '']
+
+def test_import_then_export_round_trip(db, tmp_path):
+    csv_path = tmp_path / "regles.csv"
+    csv_path.write_text("ID_Regle,Type_Regle,Statut_Actif\nR1,Ton,VRAI\nR2,Style,FAUX\nR2,Doublon,VRAI\n", encoding="utf-8")
+
+    report = import_export.import_collection(REGLES, str(csv_path), chunk_size=2)
+
+    assert (report['lues'], report['ecrites'], report['rejetees']) == (3, 2, 1)
+    assert db.collection(REGLES).document('R1').get().to_dict()['Statut_Actif'] is True
+
+    export_path = tmp_path / "export.parquet"
+    assert import_export.export_collection(REGLES, str(export_path), page_size=1)['ecrites'] == 2
+    exported = pq.read_table(export_path).to_pandas()
+    assert exported['ID_Regle'].tolist() == ['R1', 'R2']
+    assert exported['Statut_Actif'].tolist() == [True, False]
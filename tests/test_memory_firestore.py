@@ -0,0 +1,71 @@
+# tests/test_memory_firestore.py
+
+from datetime import datetime
+
+import google.cloud.firestore
+import pytest
+
+from memory_firestore import MemoryFirestoreClient, SERVER_TIMESTAMP, DELETE_FIELD, Increment, NotFound
+
+
+@pytest.fixture
+def client():
+    client = MemoryFirestoreClient(project="tests")
+    for doc_id, data in {'a': {'n': 3, 'g': 'x'}, 'b': {'n': 1, 'g': 'y'}, 'c': {'n': 2}, 'd': {'n': 'texte'}}.items():
+        client.collection('C').document(doc_id).set(data)
+    return client
+
+
+def ids(query):
+    return [doc.id for doc in query.stream()]
+
+
+def test_filters_exclude_documents_missing_the_field(client):
+    assert ids(client.collection('C').where(filter=google.cloud.firestore.FieldFilter('g', '!=', 'x'))) == ['b']
+
+def test_order_by_follows_firestore_type_ordering(client):
+    assert ids(client.collection('C').order_by('n')) == ['b', 'c', 'a', 'd'] # Nombres avant chaînes
+    assert ids(client.collection('C').order_by('n', direction='DESCENDING').limit(2)) == ['d', 'a']
+
+def test_start_after_and_projection(client):
+    query = client.collection('C').order_by('n').start_after({'n': 1}).select(['n'])
+
+    assert [doc.to_dict() for doc in query.stream()] == [{'n': 2}, {'n': 3}, {'n': 'texte'}]
+
+def test_write_sentinels(client):
+    ref = client.collection('C').document('a')
+    ref.set({'n': Increment(2), 'g': DELETE_FIELD, 'ts': SERVER_TIMESTAMP}, merge=True)
+
+    data = ref.get().to_dict()
+    assert data['n'] == 5 and 'g' not in data
+    assert isinstance(data['ts'], datetime)
+
+def test_update_of_missing_document_raises(client):
+    with pytest.raises(NotFound):
+        client.collection('C').document('z').update({'n': 1})
+
+def test_batch_is_applied_at_commit(client):
+    batch = client.batch()
+    batch.delete(client.collection('C').document('a'))
+    batch.set(client.collection('C').document('e'), {'n': 9})
+    assert 'e' not in ids(client.collection('C'))
+
+    batch.commit()
+
+    assert ids(client.collection('C')) == ['b', 'c', 'd', 'e']
+
+def test_aggregations(client):
+    results = client.collection('C').where(filter=google.cloud.firestore.FieldFilter('n', '>=', 1)).count(alias='total').get()
+
+    assert results[0][0].value == 3
+
+def test_collection_listener_receives_changes(client):
+    received = []
+    watch = client.collection('C').on_snapshot(lambda docs, changes, read_time: received.extend((change.type.name, change.document.id) for change in changes))
+    client.collection('C').document('e').set({'n': 4})
+    client.collection('C').document('b').delete()
+    watch.unsubscribe()
+    client.collection('C').document('f').set({'n': 5})
+
+    assert received[-2:] == [('ADDED', 'e'), ('REMOVED', 'b')]
+    assert ('ADDED', 'f') not in received
@@ -0,0 +1,60 @@
+# tests/test_pagination.py
+
+import pytest
+
+import firestore_connector as fsc
+from config import WORKSHEET_NAMES
+
+MORCEAUX = WORKSHEET_NAMES["MORCEAUX_GENERES"]
+
+
+def seed(db, statuts):
+    for i, statut in enumerate(statuts, start=1):
+        db.collection(MORCEAUX).document(f"M{i}").set({'ID_Morceau': f"M{i}", 'Titre_Morceau': f"Titre {i}", 'Statut_Production': statut})
+
+def read_all_pages(page_size, **kwargs):
+    pages, cursor = [], None
+    while True:
+        df, cursor = fsc.get_collection_page(MORCEAUX, page_size=page_size, cursor=cursor, **kwargs)
+        pages.append(df['ID_Morceau'].tolist())
+        if cursor is None:
+            return pages
+
+
+def test_pages_by_document_id_cover_the_collection_once(db):
+    seed(db, ['Idée'] * 5)
+
+    assert read_all_pages(2) == [['M1', 'M2'], ['M3', 'M4'], ['M5']]
+
+def test_last_full_page_has_no_next_cursor(db):
+    seed(db, ['Idée'] * 4)
+
+    assert read_all_pages(2) == [['M1', 'M2'], ['M3', 'M4']] # Pas de page vide après une page pleine
+
+def test_cursor_breaks_ties_on_the_sort_field(db):
+    seed(db, ['Publié', 'Idée', 'Publié', 'Idée', 'Publié'])
+
+    assert read_all_pages(2, order_by='Statut_Production') == [['M2', 'M4'], ['M1', 'M3'], ['M5']]
+    assert read_all_pages(2, order_by='Statut_Production', descending=True) == [['M5', 'M3'], ['M1', 'M4'], ['M2']]
+
+def test_empty_collection_is_a_single_empty_page(db):
+    assert read_all_pages(3) == [[]]
+
+
+# --- Valeurs distinctes (options des filtres) ---
+
+def test_distinct_values_page_through_the_collection(db, monkeypatch):
+    monkeypatch.setattr(fsc, "DISTINCT_VALUES_PAGE_SIZE", 2)
+    seed(db, ['Publié', 'Idée', '', 'Idée', 'Publié'])
+
+    assert fsc.get_distinct_values(MORCEAUX, ['Statut_Production']) == {'Statut_Production': ['Idée', 'Publié']}
+
+    fsc.add_morceau_generes({'ID_Morceau': 'M6', 'Titre_Morceau': 'Titre 6', 'Statut_Production': 'Finalisé'})
+    assert fsc.get_distinct_values(MORCEAUX, ['Statut_Production'])['Statut_Production'] == ['Finalisé', 'Idée', 'Publié']
+
+def test_distinct_values_use_a_loaded_collection(db, monkeypatch):
+    seed(db, ['Publié', 'Idée'])
+    fsc.get_dataframe_from_collection(MORCEAUX)
+    monkeypatch.setattr(fsc, "_fetch_collection_page", lambda *args: pytest.fail("lecture paginée inutile"))
+
+    assert fsc.get_distinct_values(MORCEAUX, ['Statut_Production']) == {'Statut_Production': ['Idée', 'Publié']}
@@ -0,0 +1,48 @@
+# tests/test_prompt_templates.py
+
+import json
+
+import firestore_connector as fsc
+from config import WORKSHEET_NAMES
+
+HISTORIQUE = WORKSHEET_NAMES["HISTORIQUE_GENERATIONS"]
+TEMPLATES = WORKSHEET_NAMES["PROMPT_TEMPLATES"]
+TEMPLATE = "Préambule de sécurité.\nÉcris une chanson {style} sur {theme}."
+
+
+def templated_record(variables, template=TEMPLATE, **fields):
+    return {
+        'ID_GenLog': 'L1', 'Prompt_Template_Hash': fsc.prompt_template_hash(template),
+        'Prompt_Variables': json.dumps(variables), 'Prompt_Envoye_Full': '', **fields
+    }
+
+
+def test_rebuild_from_registered_template(db):
+    fsc.register_prompt_template(TEMPLATE)
+
+    assert fsc.rebuild_historique_prompt(templated_record({'style': 'pop', 'theme': 'la mer'})) == \
+        "Préambule de sécurité.\nÉcris une chanson pop sur la mer."
+
+def test_rebuild_reads_template_stored_by_another_process(db):
+    template_hash = fsc.prompt_template_hash(TEMPLATE)
+    db.collection(TEMPLATES).document(template_hash).set({'ID_Template': template_hash, 'Corps_Template': TEMPLATE})
+
+    assert fsc.rebuild_historique_prompt(templated_record({'style': 'rock', 'theme': 'Mars'})).endswith("rock sur Mars.")
+
+def test_rebuild_falls_back_to_the_stored_prompt(db):
+    fsc.register_prompt_template(TEMPLATE)
+
+    assert fsc.rebuild_historique_prompt({'Prompt_Envoye_Full': 'ancien prompt complet'}) == 'ancien prompt complet'
+    assert fsc.rebuild_historique_prompt(templated_record({}, template="Modèle inconnu {x}", Prompt_Envoye_Full='aperçu')) == 'aperçu'
+    assert fsc.rebuild_historique_prompt(templated_record({'style': 'pop'}, Prompt_Envoye_Full='aperçu')) == 'aperçu' # Variable manquante
+
+def test_template_is_written_once_with_the_first_entry(db):
+    first_id = fsc.enqueue_historique_generation({'Type_Generation': 'Paroles', 'Prompt_Variables': json.dumps({'style': 'pop', 'theme': 'A'})}, prompt_template=TEMPLATE)
+    fsc.flush_historique_queue()
+    fsc.enqueue_historique_generation({'Type_Generation': 'Paroles', 'Prompt_Variables': json.dumps({'style': 'jazz', 'theme': 'B'})}, prompt_template=TEMPLATE)
+    fsc.flush_historique_queue()
+
+    assert [doc.to_dict()['Corps_Template'] for doc in db.collection(TEMPLATES).stream()] == [TEMPLATE]
+    stored = db.collection(HISTORIQUE).document(first_id).get().to_dict()
+    assert '_Corps_Template' not in stored
+    assert fsc.rebuild_historique_prompt(stored).endswith("pop sur A.")
@@ -0,0 +1,153 @@
+# tests/test_stats_rollups.py
+
+import pytest
+
+import firestore_connector as fsc
+import import_export
+from config import WORKSHEET_NAMES
+
+STATS = WORKSHEET_NAMES["STATISTIQUES_ORBITALES_SIMULEES"]
+ROLLUPS = WORKSHEET_NAMES["STATS_ROLLUPS"]
+
+
+def rollup(db, level, entity_id):
+    doc = db.collection(ROLLUPS).document(fsc.rollup_doc_id(level, entity_id)).get()
+    return doc.to_dict() if doc.exists else None
+
+def stat(stat_id, morceau_id, ecoutes, revenus=0.0):
+    return {
+        'ID_Stat_Simulee': stat_id, 'ID_Morceau': morceau_id, 'Mois_Annee_Stat': '2026-01',
+        'Ecoutes_Totales': ecoutes, 'J_aimes_Recus': 1, 'Partages_Simules': 0, 'Revenus_Simules_Streaming': revenus
+    }
+
+def add_morceau(morceau_id, album_id, artiste_id):
+    assert fsc.add_morceau_generes({'ID_Morceau': morceau_id, 'Titre_Morceau': morceau_id, 'ID_Album_Associe': album_id, 'ID_Artiste_IA': artiste_id})
+
+
+def test_add_stats_increments_every_level(db):
+    add_morceau('M1', 'A1', 'R1')
+    add_morceau('M2', 'A1', 'R2')
+    assert fsc.add_stat_simulee(stat('S1', 'M1', 100, 1.5))
+    assert fsc.add_stats_simulees_batch([stat('S2', 'M1', 50), stat('S3', 'M2', 10)])
+
+    assert rollup(db, 'MORCEAU', 'M1')['Ecoutes_Totales'] == 150
+    assert rollup(db, 'MORCEAU', 'M1')['Nb_Stats'] == 2
+    assert rollup(db, 'ALBUM', 'A1')['Ecoutes_Totales'] == 160
+    assert rollup(db, 'ALBUM', 'A1')['Revenus_Simules_Streaming'] == 1.5
+    assert rollup(db, 'ARTISTE', 'R2')['J_aimes_Recus'] == 1
+
+def test_update_and_delete_stat_report_the_difference(db):
+    add_morceau('M1', 'A1', 'R1')
+    fsc.add_stat_simulee(stat('S1', 'M1', 100))
+    fsc.add_stat_simulee(stat('S2', 'M1', 40))
+
+    assert fsc.update_stat_simulee('S1', {'Ecoutes_Totales': 70})
+    assert rollup(db, 'ALBUM', 'A1')['Ecoutes_Totales'] == 110
+
+    assert fsc.delete_stat_simulee('S2')
+    assert rollup(db, 'ALBUM', 'A1')['Ecoutes_Totales'] == 70
+    assert rollup(db, 'ALBUM', 'A1')['Nb_Stats'] == 1
+    assert not db.collection(STATS).document('S2').get().exists
+
+def test_moving_a_track_moves_its_totals(db):
+    add_morceau('M1', 'A1', 'R1')
+    fsc.add_stat_simulee(stat('S1', 'M1', 100))
+
+    assert fsc.update_morceau_generes('M1', {'ID_Album_Associe': 'A2'})
+    assert rollup(db, 'ALBUM', 'A1')['Ecoutes_Totales'] == 0
+    assert rollup(db, 'ALBUM', 'A2')['Ecoutes_Totales'] == 100
+    assert rollup(db, 'ARTISTE', 'R1')['Ecoutes_Totales'] == 100
+
+def test_rebuild_matches_incremental_rollups(db):
+    add_morceau('M1', 'A1', 'R1')
+    add_morceau('M2', 'A2', 'R1')
+    fsc.add_stats_simulees_batch([stat('S1', 'M1', 100, 2.0), stat('S2', 'M2', 30), stat('S3', 'M2', 5)])
+    fsc.delete_stat_simulee('S3')
+    incremental = {doc.id: doc.to_dict() for doc in db.collection(ROLLUPS).stream()}
+
+    assert fsc.rebuild_stats_rollups() == len(incremental)
+    for doc_id, data in incremental.items():
+        rebuilt = db.collection(ROLLUPS).document(doc_id).get().to_dict()
+        for field in ('Nb_Stats', 'Ecoutes_Totales', 'J_aimes_Recus', 'Partages_Simules', 'Revenus_Simules_Streaming'):
+            assert rebuilt[field] == data.get(field, 0), (doc_id, field) # Les cumuls incrémentaux omettent les totaux nuls
+
+def test_cascade_withdraws_rollups_once(db):
+    add_morceau('M1', 'A1', 'R1')
+    add_morceau('M2', 'A1', 'R1')
+    fsc.add_stats_simulees_batch([stat('S1', 'M1', 100), stat('S2', 'M1', 20), stat('S3', 'M2', 7)])
+
+    fsc.delete_morceau_cascade('M1')
+    fsc.delete_morceau_cascade('M1') # Nouvel essai : les cumuls ne sont pas retirés deux fois
+
+    assert rollup(db, 'MORCEAU', 'M1') is None
+    assert rollup(db, 'ALBUM', 'A1')['Ecoutes_Totales'] == 7
+    assert rollup(db, 'ALBUM', 'A1')['Nb_Stats'] == 1
+
+
+# --- Un groupe de statistiques = un seul WriteBatch ---
+
+def test_groups_over_the_byte_limit_are_never_split(db, monkeypatch):
+    for i in range(4):
+        add_morceau(f"M{i}", f"A{i % 2}", 'R1')
+    stats = [{**stat(f"S{i}", f"M{i % 4}", 10), 'Audience_Cible_Demographique': 'x' * 300} for i in range(12)]
+    monkeypatch.setattr(fsc, "FIRESTORE_BATCH_MAX_BYTES", 2000) # Quelques statistiques et leurs cumuls par batch
+    committed = []
+    commit = fsc._commit_operations_batch
+    def spy(operations):
+        assert len(fsc._chunk_write_operations(operations)) == 1
+        commit(operations)
+        committed.append(operations)
+    monkeypatch.setattr(fsc, "_commit_operations_batch", spy)
+
+    assert fsc.add_stats_simulees_batch(stats)
+
+    assert len(committed) > 1
+    for operations in committed: # Chaque batch porte les Increment de ses propres statistiques
+        batch_stats = [data for collection_name, _, _, data in operations if collection_name == STATS]
+        increments = {doc_id: data['Ecoutes_Totales'].value for collection_name, _, doc_id, data in operations if collection_name == ROLLUPS}
+        assert increments[fsc.rollup_doc_id('ARTISTE', 'R1')] == sum(data['Ecoutes_Totales'] for data in batch_stats)
+    assert rollup(db, 'ARTISTE', 'R1')['Ecoutes_Totales'] == 120
+    assert rollup(db, 'ALBUM', 'A0')['Nb_Stats'] == 6
+
+def test_failed_group_writes_neither_stats_nor_rollups(db, monkeypatch):
+    add_morceau('M1', 'A1', 'R1')
+    stats = [{**stat(f"S{i}", 'M1', 10), 'Audience_Cible_Demographique': 'x' * 300} for i in range(6)]
+    monkeypatch.setattr(fsc, "FIRESTORE_BATCH_MAX_BYTES", 2000)
+    monkeypatch.setattr(fsc.st, "error", lambda message: None)
+    commit = fsc._commit_operations_batch
+    calls = []
+    def fail_second(operations):
+        calls.append(operations)
+        if len(calls) == 2:
+            raise RuntimeError("commit refusé")
+        commit(operations)
+    monkeypatch.setattr(fsc, "_commit_operations_batch", fail_second)
+
+    assert not fsc.add_stats_simulees_batch(stats)
+
+    written = len(list(db.collection(STATS).stream()))
+    assert 0 < written < len(stats)
+    assert rollup(db, 'MORCEAU', 'M1')['Ecoutes_Totales'] == 10 * written
+    assert rollup(db, 'MORCEAU', 'M1')['Nb_Stats'] == written
+
+def test_oversized_operations_raise_instead_of_splitting(db, monkeypatch):
+    monkeypatch.setattr(fsc, "FIRESTORE_BATCH_MAX_BYTES", 100)
+
+    with pytest.raises(ValueError):
+        fsc._commit_operations_batch([(STATS, 'set', f"S{i}", stat(f"S{i}", 'M1', 1)) for i in range(3)])
+    assert list(db.collection(STATS).stream()) == []
+
+
+# --- Import de statistiques ---
+
+def test_stats_import_rebuilds_rollups(db, tmp_path):
+    add_morceau('M1', 'A1', 'R1')
+    fsc.add_stat_simulee(stat('S1', 'M1', 100))
+    csv_path = tmp_path / "stats.csv"
+    csv_path.write_text("ID_Stat_Simulee,ID_Morceau,Ecoutes_Totales\nS1,M1,40\nS2,M1,5\n", encoding="utf-8") # S1 remplacée
+
+    report = import_export.import_collection(STATS, str(csv_path))
+
+    assert report['cumuls_recalcules'] == 3
+    assert rollup(db, 'MORCEAU', 'M1')['Ecoutes_Totales'] == 45
+    assert rollup(db, 'ARTISTE', 'R1')['Nb_Stats'] == 2
@@ -0,0 +1,30 @@
+# tests/test_type_coercion.py
+
+import numpy as np
+import pandas as pd
+
+from utils import cast_series_to_int, parse_boolean_series, parse_boolean_string, safe_cast_to_int
+
+
+def test_cast_series_to_int_truncates_like_the_scalar_cast():
+    values = ['12', '3,7', ' -4.9 ', 7, 2.5]
+    converted = cast_series_to_int(pd.Series(values, dtype=object))
+
+    assert str(converted.dtype) == 'Int64'
+    assert converted.tolist() == [safe_cast_to_int(value) for value in values] == [12, 3, -4, 7, 2]
+
+def test_cast_series_to_int_failures_are_missing():
+    converted = cast_series_to_int(pd.Series(['', 'abc', None, np.nan, float('inf')], dtype=object))
+
+    assert converted.isna().all()
+
+def test_cast_series_to_int_keeps_numeric_columns():
+    assert cast_series_to_int(pd.Series([1.9, -1.9, np.nan])).tolist()[:2] == [1, -1]
+
+def test_parse_boolean_series_matches_scalar_parse():
+    values = ['VRAI', ' vrai ', 'FAUX', 'oui', '', True, False, 1, 0]
+
+    assert parse_boolean_series(pd.Series(values, dtype=object)).tolist() == [parse_boolean_string(value) for value in values]
+
+def test_parse_boolean_series_missing_values_are_false():
+    assert parse_boolean_series(pd.Series(['VRAI', None, np.nan], dtype=object)).tolist() == [True, False, False]
@@ -1,8 +1,10 @@
 # utils.py
 
+import json
 import os
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime
 
 def generate_unique_id(prefix="ID", length=8):
@@ -47,7 +49,7 @@ def format_dataframe_for_display(df: pd.DataFrame) -> pd.DataFrame:
     df_display = df.copy()
     for col in df_display.columns:
         # Formatage des dates
-        if 'Date' in col and not df_display[col].empty and pd.api.types.is_object_dtype(df_display[col]):
+        if 'Date' in col and not df_display[col].empty and (pd.api.types.is_object_dtype(df_display[col]) or pd.api.types.is_string_dtype(df_display[col])):
             try:
                 df_display[col] = pd.to_datetime(df_display[col], errors='coerce').dt.strftime('%Y-%m-%d').fillna('')
             except:
@@ -84,4 +86,49 @@ def safe_cast_to_float(value):
             value = value.replace(',', '.')
         return float(value)
     except (ValueError, TypeError):
-        return None
\ No newline at end of file
+        return None
+
+# --- Conversions vectorisées (colonnes entières de DataFrame) ---
+# Équivalents par colonne de parse_boolean_string / safe_cast_to_int / safe_cast_to_float,
+# sans appel Python par cellule.
+
+def parse_boolean_series(series: pd.Series) -> pd.Series:
+    """Convertit une colonne en booléens : les chaînes valent True si 'VRAI', les autres valeurs selon leur vérité."""
+    text_mask = series.map(type).eq(str)
+    text_values = series.where(text_mask, '').astype(str).str.strip().str.upper().eq('VRAI')
+    other_values = series.where(~text_mask & series.notna(), False).astype(bool)
+    return text_values.where(text_mask, other_values)
+
+def _to_numeric_series(series: pd.Series) -> pd.Series:
+    """Convertit une colonne en float64 (NaN si échec), en acceptant la virgule décimale française."""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.astype('float64')
+    return pd.to_numeric(series.astype('string').str.replace(',', '.', regex=False).str.strip(), errors='coerce').astype('float64')
+
+def cast_series_to_int(series: pd.Series) -> pd.Series:
+    """Convertit une colonne en entiers nullables (Int64), tronqués comme int(float(x)) ; <NA> si échec."""
+    numeric = _to_numeric_series(series)
+    numeric = numeric.where(np.isfinite(numeric))
+    return np.trunc(numeric).astype('Int64')
+
+def cast_series_to_float(series: pd.Series) -> pd.Series:
+    """Convertit une colonne en float64 ; NaN si échec."""
+    return _to_numeric_series(series)
+
+def cast_series_to_category(series: pd.Series) -> pd.Series:
+    """Convertit une colonne énumérée en dtype category (valeurs manquantes -> chaîne vide)."""
+    return series.where(series.notna(), '').astype(str).astype('category')
+
+def cast_series_to_string(series: pd.Series) -> pd.Series:
+    """Convertit une colonne d'identifiants ou de valeurs éditables en dtype string (valeurs manquantes -> chaîne vide)."""
+    return series.where(series.notna(), '').astype(str).astype('string')
+
+def cast_series_to_text(series: pd.Series) -> pd.Series:
+    """Convertit une colonne de texte libre en string[pyarrow] (valeurs manquantes -> chaîne vide)."""
+    return series.where(series.notna(), '').astype(str).astype('string[pyarrow]')
+
+def estimate_document_size(document_data) -> int:
+    """Estimation de la taille d'un document en octets (sérialisation JSON) ; 0 pour un document vide ou absent."""
+    if not document_data:
+        return 0
+    return len(json.dumps(document_data, default=str).encode('utf-8'))